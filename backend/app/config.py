@@ -19,9 +19,65 @@ class Settings(BaseSettings):
     # データベース (開発: SQLite / 本番: PostgreSQL)
     DATABASE_URL: str = "sqlite+aiosqlite:///./poi_app.db"
 
+    # ポイント残高の取得元
+    # materialized: 集計済みテーブル（user_point_balances）
+    # checkpoint: 最新チェックポイント + それ以降の取引の合計
+    POINT_BALANCE_SOURCE: str = "materialized"
+
     # ファイルストレージ
-    UPLOAD_DIR: str = "./uploads"
+    UPLOAD_DIR: str = "./uploads"  # local の保存先（s3 でも受信・変換の作業ディレクトリとして使う）
     MAX_UPLOAD_SIZE: int = 5 * 1024 * 1024  # 5MB
+    STORAGE_BACKEND: str = "local"  # local / s3（S3 互換ストレージ。boto3 が必要）
+    STORAGE_PUBLIC_BASE_URL: str = ""  # 画像の配信URL（CDN 等）。空なら local は /uploads、s3 は署名付きURL
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: str = ""  # MinIO 等の S3 互換ストレージ（空なら AWS）
+    S3_REGION: str = "ap-northeast-1"
+    S3_ACCESS_KEY_ID: str = ""  # 空なら環境変数・IAM ロール等の既定の認証情報
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_PRESIGNED_URL_EXPIRE_SECONDS: int = 3600
+
+    # レシート画像の正規化（EXIF 回転・縮小・再圧縮。webp / jpeg）
+    RECEIPT_IMAGE_FORMAT: str = "webp"
+    RECEIPT_IMAGE_MAX_SIDE: int = 2048  # 長辺の最大ピクセル数
+    RECEIPT_IMAGE_QUALITY: int = 80
+    RECEIPT_THUMBNAIL_SIDE: int = 320
+    IMAGE_PROCESS_WORKERS: int = 2  # 画像処理のプロセス数（ワーカープロセスごと）
+    RECEIPT_NEAR_DUPLICATE_DISTANCE: int = 6  # 類似画像とみなす dHash のハミング距離（64bit 中）
+
+    # アップロード後のレシート処理ジョブ
+    RECEIPT_JOB_WORKERS: int = 2  # API プロセス内のワーカー数（0 で無効にし、run-receipt-worker を別プロセスで動かす）
+    RECEIPT_JOB_BATCH_SIZE: int = 10  # 1回に取得するジョブ数
+    RECEIPT_JOB_POLL_SECONDS: float = 2.0  # ジョブが無いときの待ち時間
+    RECEIPT_JOB_LEASE_SECONDS: int = 300  # 実行中ジョブのリース（過ぎたら別のワーカーが再実行）
+    RECEIPT_JOB_MAX_ATTEMPTS: int = 5
+    RECEIPT_JOB_RETRY_BASE_SECONDS: int = 10  # 再試行の待ち時間（10秒, 20秒, 40秒...）
+
+    # レシート審査の担当（複数の管理者で同じレシートを審査しないよう、取得したレシートを一定時間確保する）
+    RECEIPT_REVIEW_LEASE_SECONDS: int = 900
+
+    # 審査待ちレシートの自動審査ルール（JSON ファイル。auto-review-receipts で使う。例: auto_review_rules.example.json）
+    RECEIPT_AUTO_REVIEW_RULES_FILE: str = ""
+
+    # アーカイブしたポイント取引の出力先
+    ARCHIVE_DIR: str = "./archives"
+
+    # 冪等キー（Idempotency-Key ヘッダー）
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_CACHE_SIZE: int = 10000  # プロセス内 LRU の最大件数
+
+    # bcrypt（パスワードハッシュ）の同時実行数（ワーカープロセスごと）
+    PASSWORD_HASH_CONCURRENCY: int = 2
+
+    # true: アクセストークンのクレーム（is_active / is_admin）を信用し、認証で DB を参照しない
+    # 無効化したユーザーのトークンは失効リストで拒否する（ワーカー間の同期は PostgreSQL のみ）
+    AUTH_STATELESS: bool = False
+
+    # 検証済みアクセストークンのキャッシュ（ワーカープロセスごとの最大件数）
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # 認証ユーザーのキャッシュ（PostgreSQL では更新時に全ワーカーへ無効化を通知）
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60  # 通知が届かない環境で古い値が残る最大時間
 
     # 管理者メール（このアドレスで登録したユーザーを管理者にする）
     # 管理画面にアクセスするにはこのメールで登録するか、.env で指定
@@ -0,0 +1,70 @@
+"""複数キーワードの同時検索（Aho-Corasick 法）
+
+キーワードをまとめて1つのオートマトンにしておき、文字列を1回走査するだけで
+含まれるすべてのキーワードを見つける（計算量は文字列の長さ + 一致数。キーワード数によらない）。
+"""
+from collections import deque
+from typing import Dict, Generic, Hashable, Iterable, Iterator, List, Set, Tuple, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+class AhoCorasick(Generic[T]):
+    """(キーワード, 値) の組から作るオートマトン。同じキーワードに複数の値を登録できる"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, T]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[T]] = [[]]
+        for pattern, value in patterns:
+            if pattern:
+                self._add(pattern, value)
+        self._build()
+
+    def _add(self, pattern: str, value: T) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        if value not in self._out[node]:
+            self._out[node].append(value)
+
+    def _build(self) -> None:
+        """失敗遷移を幅優先で計算し、接尾辞に当たるキーワードの値を出力に含める"""
+        queue = deque(self._goto[0].values())  # ルート直下の失敗遷移はルート
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                for value in self._out[self._fail[child]]:
+                    if value not in self._out[child]:
+                        self._out[child].append(value)
+
+    def __len__(self) -> int:
+        """状態数（ルートを除く）"""
+        return len(self._goto) - 1
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, T]]:
+        """text に含まれるキーワードの (終了位置, 値) を順に返す"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for value in out[node]:
+                yield i, value
+
+    def find(self, text: str) -> Set[T]:
+        """text に含まれるキーワードの値の集合"""
+        return {value for _, value in self.iter_matches(text)}
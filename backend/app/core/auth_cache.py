@@ -0,0 +1,161 @@
+"""認証ユーザーのキャッシュ・アクセストークンの失効リスト
+
+リクエストごとの users テーブル参照を省くため、認証に必要な項目だけを
+ワーカープロセス内にキャッシュする。
+PostgreSQL では LISTEN/NOTIFY で他のワーカーのキャッシュも無効化する。
+SQLite など通知が使えない環境では TTL で古い値が入れ替わる。
+
+AUTH_STATELESS ではトークンのクレームを信用するため、無効化したユーザーの
+発行済みトークンを失効リストで拒否する（トークンの有効期限が過ぎたら削除）。
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import get_settings
+from app.core.cache import TTLCache
+from app.database import AsyncSessionLocal, engine, is_postgresql
+from app.models.user import User
+
+settings = get_settings()
+
+INVALIDATION_CHANNEL = "auth_user_invalidated"
+REVOCATION_CHANNEL = "auth_user_revoked"
+
+_cache = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL_SECONDS,
+)
+_listener: Optional[AsyncConnection] = None
+# user_id -> 失効時刻（UNIX 時刻）。この時刻以前に発行されたアクセストークンを拒否する
+_revoked: Dict[int, float] = {}
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """認証済みユーザー（認証・認可に使う項目のみ）"""
+    id: int
+    is_active: bool
+    is_admin: bool
+
+
+def get_cached_user(user_id: int) -> Optional[AuthUser]:
+    return _cache.get(user_id)
+
+
+def cache_user(user) -> AuthUser:
+    """User（または同じ属性を持つ行）をキャッシュに保存"""
+    auth_user = AuthUser(id=user.id, is_active=user.is_active, is_admin=user.is_admin)
+    _cache.set(auth_user.id, auth_user)
+    return auth_user
+
+
+def _pop_after_commit(db: AsyncSession, user_id: int) -> None:
+    """
+    db のコミット後にもう一度キャッシュから削除する（コミット前に別のリクエストが
+    更新前の行を読み込んでキャッシュした場合に、TTL まで古い値が残らないようにする）
+    """
+    event.listen(db.sync_session, "after_commit", lambda session: _cache.pop(user_id), once=True)
+
+
+async def invalidate_user(db: AsyncSession, user_id: int) -> None:
+    """
+    キャッシュを無効化（db のコミット後にも無効化する）。
+    PostgreSQL では db のトランザクションのコミット時に全ワーカーへ通知される。
+    """
+    _cache.pop(user_id)
+    _pop_after_commit(db, user_id)
+    if is_postgresql():
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": INVALIDATION_CHANNEL, "payload": str(user_id)},
+        )
+
+
+def _token_lifetime() -> float:
+    return settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def _remember_revocation(user_id: int, revoked_at: float) -> None:
+    now = time.time()
+    for expired in [uid for uid, at in _revoked.items() if at + _token_lifetime() <= now]:
+        del _revoked[expired]
+    if revoked_at + _token_lifetime() > now:
+        _revoked[user_id] = max(revoked_at, _revoked.get(user_id, 0.0))
+
+
+def is_token_revoked(user_id: int, issued_at: float) -> bool:
+    """issued_at（トークンの iat）に発行されたトークンが失効済みか"""
+    revoked_at = _revoked.get(user_id)
+    return revoked_at is not None and issued_at <= revoked_at
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int) -> None:
+    """
+    ユーザーの発行済みアクセストークンを失効させる（アカウント無効化時）。
+    PostgreSQL では db のトランザクションのコミット時に全ワーカーへ通知される。
+    """
+    revoked_at = time.time()
+    _remember_revocation(user_id, revoked_at)
+    _cache.pop(user_id)
+    _pop_after_commit(db, user_id)
+    if is_postgresql():
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": REVOCATION_CHANNEL, "payload": f"{user_id}:{revoked_at}"},
+        )
+
+
+async def load_revocations() -> None:
+    """起動時に、トークンの有効期間内に無効化されたユーザーを失効リストへ読み込む"""
+    since = datetime.utcnow() - timedelta(seconds=_token_lifetime())
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id, User.updated_at).where(User.is_active == False, User.updated_at >= since)  # noqa: E712
+        )
+        for user_id, updated_at in result.all():
+            _remember_revocation(user_id, updated_at.replace(tzinfo=timezone.utc).timestamp())
+
+
+def _on_notify(connection, pid, channel, payload) -> None:
+    _cache.pop(int(payload))
+
+
+def _on_revoke(connection, pid, channel, payload) -> None:
+    user_id, revoked_at = payload.split(":")
+    _remember_revocation(int(user_id), float(revoked_at))
+    _cache.pop(int(user_id))
+
+
+def _on_terminate(connection) -> None:
+    # 通知を受け取れなくなるため、以降は TTL まかせにせず全件破棄する
+    _cache.clear()
+
+
+async def start_invalidation_listener() -> None:
+    """他のワーカーからの無効化・失効通知の受信を開始（PostgreSQL のみ）"""
+    global _listener
+    if not is_postgresql() or _listener is not None:
+        return
+    conn = await engine.connect()
+    raw = (await conn.get_raw_connection()).driver_connection
+    await raw.add_listener(INVALIDATION_CHANNEL, _on_notify)
+    await raw.add_listener(REVOCATION_CHANNEL, _on_revoke)
+    raw.add_termination_listener(_on_terminate)
+    _listener = conn
+
+
+async def stop_invalidation_listener() -> None:
+    global _listener
+    if _listener is None:
+        return
+    conn, _listener = _listener, None
+    raw = (await conn.get_raw_connection()).driver_connection
+    raw.remove_termination_listener(_on_terminate)
+    await raw.remove_listener(INVALIDATION_CHANNEL, _on_notify)
+    await raw.remove_listener(REVOCATION_CHANNEL, _on_revoke)
+    await conn.close()
@@ -9,11 +9,14 @@ from sqlalchemy import select
 from app.database import get_db
 from app.models.user import User
 from app.core.security import decode_token
+from app.config import get_settings
+from app.core.auth_cache import AuthUser, get_cached_user, cache_user, is_token_revoked
 
-async def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    db: AsyncSession = Depends(get_db),
-) -> User:
+settings = get_settings()
+
+
+def _access_token_payload(credentials: Optional[HTTPAuthorizationCredentials]) -> dict:
+    """アクセストークンを検証してペイロードを返す"""
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -42,10 +45,10 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="トークンが無効です",
         )
+    return payload
 
-    result = await db.execute(select(User).where(User.id == int(user_id)))
-    user = result.scalar_one_or_none()
 
+def _check_user(user) -> None:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -58,12 +61,52 @@ async def get_current_user(
             detail="アカウントが無効です",
         )
 
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """ログインユーザー（プロフィールなど User の全項目が必要な場合）"""
+    payload = _access_token_payload(credentials)
+    result = await db.execute(select(User).where(User.id == int(payload["sub"])))
+    user = result.scalar_one_or_none()
+    if user is not None:
+        cache_user(user)
+    _check_user(user)
+    return user
+
+
+async def get_auth_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: AsyncSession = Depends(get_db),
+) -> AuthUser:
+    """
+    ログインユーザー（ID・権限のみ。キャッシュにあれば DB を参照しない）。
+    AUTH_STATELESS ではトークンのクレームを使い、DB を参照しない。
+    """
+    payload = _access_token_payload(credentials)
+    user_id = int(payload["sub"])
+    if settings.AUTH_STATELESS and "is_active" in payload and "iat" in payload:
+        user = AuthUser(
+            id=user_id,
+            is_active=bool(payload["is_active"]) and not is_token_revoked(user_id, payload["iat"]),
+            is_admin=bool(payload.get("is_admin")),
+        )
+    else:
+        user = get_cached_user(user_id)
+    if user is None:
+        result = await db.execute(
+            select(User.id, User.is_active, User.is_admin).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        user = cache_user(row) if row is not None else None
+    _check_user(user)
     return user
 
 
 async def get_current_admin(
-    user: User = Depends(get_current_user),
-) -> User:
+    user: AuthUser = Depends(get_auth_user),
+) -> AuthUser:
     """管理者のみ許可"""
     if not user.is_admin:
         raise HTTPException(
@@ -0,0 +1,186 @@
+"""Idempotency-Key ヘッダーによる再送リクエストの重複実行防止
+
+同じキーの再送には保存済みのレスポンスを返す。キーにはリクエスト内容（メソッド・パス・クエリ・本文）の
+ハッシュを記録し、同じキーで内容の異なるリクエストは 422 とする。
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional, Type
+
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import UploadFile
+
+from app.config import get_settings
+from app.core.cache import TTLCache
+from app.core.auth_cache import AuthUser
+from app.core.deps import get_auth_user
+from app.core.storage import KEEP_STORAGE_REFS
+from app.core.uploads import UPLOAD_CHUNK_SIZE
+from app.database import get_db
+from app.services.idempotency_service import get_stored_response, save_response
+
+settings = get_settings()
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# DB の前段に置くプロセス内キャッシュ（キー: (user_id, Idempotency-Key)）
+_cache = TTLCache(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.IDEMPOTENCY_KEY_TTL_HOURS * 3600,
+)
+
+
+@dataclass
+class StoredResponse:
+    endpoint: str
+    request_hash: Optional[str]
+    status_code: int
+    body: Any
+
+
+class IdempotentRequest:
+    """
+    Idempotency-Key 付きリクエストの処理。
+    replay() で保存済みレスポンスを確認し、処理後は commit() でレスポンスを
+    処理結果と同じトランザクションに保存してコミットする。
+    ヘッダーが無い場合は通常のコミットのみ行う。
+    response_model を指定すると、保存先の参照（/uploads/...）のまま保存し、返すたびに配信用の URL に変換する。
+    """
+
+    def __init__(
+        self, db: AsyncSession, user_id: int, key: Optional[str], endpoint: str, request_hash: Optional[str] = None
+    ):
+        self.db = db
+        self.user_id = user_id
+        self.key = key
+        self.endpoint = endpoint
+        self.request_hash = request_hash
+
+    async def _lookup(self) -> Optional[StoredResponse]:
+        stored = _cache.get((self.user_id, self.key))
+        if stored is not None:
+            return stored
+        record = await get_stored_response(self.db, self.user_id, self.key)
+        if record is None:
+            return None
+        stored = StoredResponse(
+            record.endpoint, record.request_hash, record.status_code, json.loads(record.response_body)
+        )
+        self._remember(stored, record.expires_at)
+        return stored
+
+    def _remember(self, stored: StoredResponse, expires_at: datetime) -> None:
+        _cache.set((self.user_id, self.key), stored, ttl=(expires_at - datetime.utcnow()).total_seconds())
+
+    async def replay(self, response_model: Optional[Type[BaseModel]] = None) -> Optional[JSONResponse]:
+        """同じキーで処理済みなら保存済みレスポンスを返す（内容の異なるリクエストに使われたキーは 422）"""
+        if not self.key:
+            return None
+        stored = await self._lookup()
+        if stored is None:
+            return None
+        # request_hash の無いキーは記録を始める前に保存したもの（エンドポイントのみ照合する）
+        if stored.endpoint != self.endpoint or (
+            stored.request_hash is not None and stored.request_hash != self.request_hash
+        ):
+            raise HTTPException(
+                status_code=422,
+                detail="この Idempotency-Key は別のリクエストで使用されています",
+            )
+        body = stored.body
+        if response_model is not None:
+            body = jsonable_encoder(response_model.model_validate(body))
+        return JSONResponse(
+            content=body,
+            status_code=stored.status_code,
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    async def commit(
+        self, payload: Any, status_code: int = 200, response_model: Optional[Type[BaseModel]] = None
+    ) -> Any:
+        """
+        レスポンスを保存してコミット。
+        response_model: payload（ORM オブジェクト等）を変換するスキーマ。replay() にも同じものを指定する
+        """
+        if response_model is not None:
+            stored_payload = response_model.model_validate(payload, context={KEEP_STORAGE_REFS: True})
+            payload = response_model.model_validate(payload)
+        else:
+            stored_payload = payload
+        if not self.key:
+            await self.db.commit()
+            return payload
+
+        body = jsonable_encoder(stored_payload)
+        expires_at = datetime.utcnow() + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        try:
+            # 一意制約の違反は INSERT（flush）時点で発生する（PostgreSQL では先の処理のコミットを待ってから）
+            await save_response(
+                self.db,
+                self.user_id,
+                self.key,
+                self.endpoint,
+                status_code,
+                json.dumps(body, ensure_ascii=False),
+                expires_at,
+                request_hash=self.request_hash,
+            )
+            await self.db.commit()
+        except IntegrityError:
+            # 同じキーの並行リクエストが先に完了していた場合、今回の処理（ポイントの増減を含む）は破棄してその結果を返す
+            await self.db.rollback()
+            replayed = await self.replay(response_model)
+            if replayed is None:
+                raise
+            return replayed
+        self._remember(StoredResponse(self.endpoint, self.request_hash, status_code, body), expires_at)
+        return payload
+
+
+async def _request_hash(request: Request) -> str:
+    """
+    リクエスト内容の SHA-256（メソッド・パス・クエリと本文。フォームは項目名と値・ファイルの内容）。
+    本文・フォームは FastAPI が読み込み済みのものを使う
+    """
+    digest = hashlib.sha256(f"{request.method} {request.url.path}?{request.url.query}\n".encode())
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+        digest.update(await request.body())
+        return digest.hexdigest()
+    form = await request.form()
+    for name, value in sorted(form.multi_items(), key=lambda item: item[0]):
+        digest.update(name.encode() + b"\0")
+        if isinstance(value, UploadFile):
+            await value.seek(0)
+            while chunk := await value.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+            await value.seek(0)
+        else:
+            digest.update(value.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def idempotent_request(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    current_user: AuthUser = Depends(get_auth_user),
+    db: AsyncSession = Depends(get_db),
+) -> IdempotentRequest:
+    key = idempotency_key.strip() if idempotency_key and idempotency_key.strip() else None
+    return IdempotentRequest(
+        db,
+        current_user.id,
+        key,
+        f"{request.method} {request.url.path}",
+        request_hash=await _request_hash(request) if key else None,
+    )
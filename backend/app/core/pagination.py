@@ -0,0 +1,48 @@
+"""カーソル（キーセット）ページング"""
+import base64
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """(作成日時, id) を不透明なカーソル文字列に変換"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """カーソル文字列を (作成日時, id) に戻す。不正な場合は ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("カーソルが不正です") from e
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """クエリパラメータのカーソルを解釈（不正なら 400）"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def keyset_before(created_column, id_column, position: Tuple[datetime, int]):
+    """(作成日時, id) の降順で position より後ろの行を絞り込む条件"""
+    return tuple_(created_column, id_column) < tuple_(*position)
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int, created_attr: str = "created_at") -> None:
+    """取得件数が limit に達していれば次ページのカーソルをヘッダーに設定"""
+    if len(rows) < limit:
+        return
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, created_attr), last.id)
@@ -1,4 +1,8 @@
 """セキュリティ・認証ユーティリティ"""
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -6,12 +10,24 @@ import bcrypt
 from jose import JWTError, jwt
 
 from app.config import get_settings
+from app.core.cache import TTLCache
 
 settings = get_settings()
 
 # bcrypt の 72 バイト制限
 MAX_PASSWORD_BYTES = 72
 
+# bcrypt はイベントループを 100ms 以上止めるため専用スレッドで実行する（GIL は解放される）
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_CONCURRENCY,
+    thread_name_prefix="password-hash",
+)
+_password_jobs = 0  # 実行中 + 実行待ち
+
+# 検証済みトークンのキャッシュ（キー: トークンの SHA-256、値: ペイロード。exp で失効）
+_token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+_token_cache_key_fingerprint: Optional[str] = None
+
 
 def _truncate_password(password: str) -> bytes:
     """bcrypt の 72 バイト制限に対応してパスワードを切り詰め"""
@@ -35,10 +51,40 @@ def get_password_hash(password: str) -> str:
     ).decode("utf-8")
 
 
+async def _run_password_job(func, *args):
+    global _password_jobs
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password を専用スレッドで実行"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash を専用スレッドで実行"""
+    return await _run_password_job(get_password_hash, password)
+
+
+def password_hash_stats() -> dict:
+    """パスワードハッシュ処理の混雑状況（queued が続けて大きい場合は同時実行数を見直す）"""
+    running = min(_password_jobs, settings.PASSWORD_HASH_CONCURRENCY)
+    return {
+        "concurrency": settings.PASSWORD_HASH_CONCURRENCY,
+        "running": running,
+        "queued": _password_jobs - running,
+    }
+
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "type": "access"})
+    # iat は失効リストとの比較に使うため秒未満まで含める
+    to_encode.update({"exp": expire, "iat": time.time(), "type": "access"})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
@@ -49,9 +95,28 @@ def create_refresh_token(data: dict) -> str:
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
+def _key_fingerprint() -> str:
+    return hashlib.sha256(f"{settings.ALGORITHM}:{settings.SECRET_KEY}".encode("utf-8")).hexdigest()
+
+
 def decode_token(token: str) -> Optional[dict]:
+    """トークンを検証してペイロードを返す（検証済みのトークンは exp までキャッシュ）"""
+    global _token_cache_key_fingerprint
+    fingerprint = _key_fingerprint()
+    if fingerprint != _token_cache_key_fingerprint:
+        # SECRET_KEY が変わったら旧キーで検証した結果は使わない
+        _token_cache.clear()
+        _token_cache_key_fingerprint = fingerprint
+
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = _token_cache.get(digest)
+    if payload is not None:
+        return dict(payload)
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        _token_cache.set(digest, payload, ttl=exp - time.time())
+    return dict(payload)
@@ -0,0 +1,227 @@
+"""画像ファイルの保存先
+
+レシート画像は DB に "/uploads/<キー>" の形で記録し、実際の保存先は STORAGE_BACKEND で切り替える
+（local: UPLOAD_DIR / s3: S3 互換ストレージ）。レスポンスでは public_url で配信用の URL に変換するため、
+S3 では画像を API のワーカーを通さず、署名付き URL や CDN（STORAGE_PUBLIC_BASE_URL）から直接配信できる。
+"""
+import asyncio
+import mimetypes
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.config import get_settings
+from app.core.uploads import UPLOAD_TMP_DIR
+
+settings = get_settings()
+
+STORAGE_PREFIX = "/uploads/"
+# スキーマの model_validate の context に True で指定すると、配信用の URL に変換せず参照（/uploads/<キー>）のまま残す
+# （保存したレスポンスを後で返す場合。署名付き URL は期限があるため返すときに変換する）
+KEEP_STORAGE_REFS = "keep_storage_refs"
+
+
+def storage_ref(key: str) -> str:
+    """保存先のキーを DB に記録する形（/uploads/<キー>）に変換"""
+    return f"{STORAGE_PREFIX}{key}"
+
+
+def storage_key(ref: str) -> Optional[str]:
+    """DB に記録した /uploads/<キー> からキーを取り出す（それ以外は None）"""
+    if not ref.startswith(STORAGE_PREFIX):
+        return None
+    return ref[len(STORAGE_PREFIX):]
+
+
+def _unlink_if_exists(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class Storage:
+    """保存先の共通インターフェース"""
+
+    async def put_file(self, path: str, key: str) -> None:
+        """ローカルのファイルを key に保存（path のファイルは移動・削除される）"""
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """key を削除（無ければ何もしない）"""
+        raise NotImplementedError
+
+    def open_local(self, key: str):
+        """key の内容をローカルのファイルとして読む（async with で使う。無ければ FileNotFoundError）"""
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        """配信用の URL"""
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """UPLOAD_DIR に保存し、API の /uploads（または STORAGE_PUBLIC_BASE_URL）から配信"""
+
+    def __init__(self, root: str, public_base_url: str = ""):
+        self.root = root
+        self.public_base_url = public_base_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def put_file(self, path: str, key: str) -> None:
+        dest = self._path(key)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(dest), exist_ok=True)
+        await asyncio.to_thread(os.replace, path, dest)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._path(key))
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(_unlink_if_exists, self._path(key))
+
+    @asynccontextmanager
+    async def open_local(self, key: str) -> AsyncIterator[str]:
+        path = self._path(key)
+        if not await asyncio.to_thread(os.path.exists, path):
+            raise FileNotFoundError(key)
+        yield path
+
+    def url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        return storage_ref(key)
+
+
+class S3Storage(Storage):
+    """S3 互換ストレージ（AWS S3 / MinIO 等）に保存し、署名付き URL（または STORAGE_PUBLIC_BASE_URL）で配信"""
+
+    def __init__(
+        self,
+        bucket: str,
+        tmp_dir: str,
+        endpoint_url: str = "",
+        region: str = "",
+        access_key_id: str = "",
+        secret_access_key: str = "",
+        public_base_url: str = "",
+        presigned_url_expire_seconds: int = 3600,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 には boto3 が必要です（pip install boto3）") from e
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 では S3_BUCKET を指定してください")
+        self.bucket = bucket
+        self.tmp_dir = tmp_dir
+        self.public_base_url = public_base_url.rstrip("/")
+        self.presigned_url_expire_seconds = presigned_url_expire_seconds
+        # 認証情報が空なら boto3 の既定（環境変数・IAM ロール等）を使う
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path" if endpoint_url else "auto"}),
+        )
+
+    @staticmethod
+    def _is_not_found(e: Exception) -> bool:
+        code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    async def put_file(self, path: str, key: str) -> None:
+        content_type = mimetypes.guess_type(key)[0]
+        extra = {"ContentType": content_type} if content_type else {}
+        await asyncio.to_thread(self._client.upload_file, path, self.bucket, key, ExtraArgs=extra)
+        await asyncio.to_thread(os.unlink, path)
+
+    async def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            await asyncio.to_thread(self._client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._is_not_found(e):
+                return False
+            raise
+        return True
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._client.delete_object, Bucket=self.bucket, Key=key)
+
+    @asynccontextmanager
+    async def open_local(self, key: str) -> AsyncIterator[str]:
+        from botocore.exceptions import ClientError
+
+        await asyncio.to_thread(os.makedirs, self.tmp_dir, exist_ok=True)
+        fd, path = await asyncio.to_thread(tempfile.mkstemp, suffix=os.path.splitext(key)[1], dir=self.tmp_dir)
+        os.close(fd)
+        try:
+            try:
+                await asyncio.to_thread(self._client.download_file, self.bucket, key, path)
+            except ClientError as e:
+                if self._is_not_found(e):
+                    raise FileNotFoundError(key) from e
+                raise
+            yield path
+        finally:
+            await asyncio.to_thread(_unlink_if_exists, path)
+
+    def url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        # 署名はローカルで計算する（ストレージへの通信なし）
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.presigned_url_expire_seconds,
+        )
+
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    """設定（STORAGE_BACKEND）に応じた保存先"""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "s3":
+            _storage = S3Storage(
+                bucket=settings.S3_BUCKET,
+                tmp_dir=os.path.join(settings.UPLOAD_DIR, UPLOAD_TMP_DIR),
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region=settings.S3_REGION,
+                access_key_id=settings.S3_ACCESS_KEY_ID,
+                secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+                public_base_url=settings.STORAGE_PUBLIC_BASE_URL,
+                presigned_url_expire_seconds=settings.S3_PRESIGNED_URL_EXPIRE_SECONDS,
+            )
+        else:
+            _storage = LocalStorage(settings.UPLOAD_DIR, public_base_url=settings.STORAGE_PUBLIC_BASE_URL)
+    return _storage
+
+
+def public_url(ref: Optional[str]) -> Optional[str]:
+    """DB に記録した /uploads/<キー> を配信用の URL に変換（それ以外の値はそのまま）"""
+    if ref is None:
+        return None
+    key = storage_key(ref)
+    return get_storage().url(key) if key is not None else ref
+
+
+def work_path(suffix: str = "") -> str:
+    """変換などの作業用の一時ファイルパス（UPLOAD_DIR/.tmp。保存時は put_file で移動する）"""
+    tmp_dir = os.path.join(settings.UPLOAD_DIR, UPLOAD_TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=tmp_dir)
+    os.close(fd)
+    return path
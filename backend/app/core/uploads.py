@@ -0,0 +1,121 @@
+"""画像アップロードの受信
+
+アップロードを一定サイズのチャンクで一時ファイルへ書き出し（書き込みはスレッドで実行）、
+上限を超えた時点で打ち切る。メモリ使用量はファイルサイズによらず一定。
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+UPLOAD_CHUNK_SIZE = 256 * 1024
+UPLOAD_TMP_DIR = ".tmp"  # 保存先と同じファイルシステムに置き、確定時は rename のみ
+FORM_OVERHEAD = 64 * 1024  # マルチパートの区切り・テキスト項目の分
+
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    """先頭バイト（マジックナンバー）から画像形式を判定し、拡張子を返す"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return ".heic"
+    return None
+
+
+def too_large_detail(max_size: int) -> str:
+    return f"ファイルサイズは{max_size // (1024 * 1024)}MB以下にしてください"
+
+
+@dataclass
+class ReceivedUpload:
+    """一時ファイルに受信したアップロード"""
+    path: str
+    ext: str
+    sha256: str  # 受信した内容の SHA-256（16進）
+    size: int
+
+
+def _write_chunk(f, digest, chunk: bytes) -> None:
+    f.write(chunk)
+    digest.update(chunk)
+
+
+async def receive_image_upload(upload: UploadFile, max_size: int, upload_dir: str) -> ReceivedUpload:
+    """
+    画像アップロードを一時ファイルに保存（書き込みと同時に SHA-256 を計算）。
+    画像でない場合は 400、上限超過は 413
+    """
+    head = await upload.read(UPLOAD_CHUNK_SIZE)
+    ext = detect_image_type(head)
+    if ext is None:
+        raise HTTPException(status_code=400, detail="JPEG / PNG / WebP / HEIC の画像を選択してください")
+
+    tmp_dir = Path(upload_dir) / UPLOAD_TMP_DIR
+    await asyncio.to_thread(tmp_dir.mkdir, parents=True, exist_ok=True)
+    fd, tmp_path = await asyncio.to_thread(tempfile.mkstemp, suffix=ext, dir=tmp_dir)
+    f = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        chunk = head
+        while chunk:
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=too_large_detail(max_size))
+            await asyncio.to_thread(_write_chunk, f, digest, chunk)
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        await asyncio.to_thread(f.close)
+    except BaseException:
+        f.close()
+        await asyncio.to_thread(os.unlink, tmp_path)
+        raise
+    return ReceivedUpload(path=tmp_path, ext=ext, sha256=digest.hexdigest(), size=size)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    指定パスへのリクエストボディを上限で打ち切る ASGI ミドルウェア。
+    マルチパートの解析（一時ファイルへの展開）より前に、上限を超えた時点で 413 を返す。
+    """
+
+    def __init__(self, app, max_size: int, path_prefixes: Sequence[str]):
+        self.app = app
+        self.max_size = max_size
+        self.max_body_size = max_size + FORM_OVERHEAD
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse({"detail": too_large_detail(self.max_size)}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            # Content-Length の無い（chunked）リクエストは受信量で判定する。
+            # HTTPException はボディ解析中でもそのまま 413 のレスポンスになる
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(status_code=413, detail=too_large_detail(self.max_size))
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,10 +1,15 @@
 """データベース接続"""
+import logging
+
+from sqlalchemy import delete, func, inspect, select, text, update
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 engine = create_async_engine(
     settings.DATABASE_URL,
@@ -24,6 +29,20 @@ class Base(DeclarativeBase):
     pass
 
 
+def is_postgresql() -> bool:
+    """接続先が PostgreSQL か"""
+    return engine.dialect.name == "postgresql"
+
+
+def dialect_insert(table):
+    """接続先の方言に応じた INSERT（ON CONFLICT 句が使える）"""
+    if is_postgresql():
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
@@ -35,7 +54,61 @@ async def get_db():
             await session.close()
 
 
+def _add_missing_columns_and_indexes(conn) -> None:
+    """
+    既存テーブルに後から追加したカラム・インデックスを作成（create_all は既存テーブルを変更しないため）。
+    追加するカラムは NULL 許可にしておくこと。
+    一意インデックスを後から追加するテーブルは info={"merge_max_on_unique_index": [カラム名, ...]} を指定すると、
+    キーが重複する行を先に1行にまとめる（指定したカラムは重複行の最大値にする）
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            merge_columns = table.info.get("merge_max_on_unique_index")
+            if index.unique and index.name not in existing_indexes and merge_columns is not None:
+                _merge_duplicate_rows(conn, index, merge_columns)
+            index.create(conn, checkfirst=True)
+
+
+def _merge_duplicate_rows(conn, index, merge_columns) -> None:
+    """
+    後から追加する一意インデックスのキーが重複する行を、最後に登録した行（id 最大）にまとめる。
+    残す行の merge_columns は重複行の最大値に更新してから、他の行を削除する
+    """
+    table = index.table
+    dup = table.alias("dup")
+    keep_ids = (
+        select(func.max(table.c.id)).group_by(*index.columns).having(func.count() > 1).scalar_subquery()
+    )
+    same_key = [dup.c[c.name] == table.c[c.name] for c in index.columns]
+    if merge_columns:
+        conn.execute(
+            update(table)
+            .where(table.c.id.in_(keep_ids))
+            .values({
+                name: select(func.max(dup.c[name])).where(*same_key).scalar_subquery()
+                for name in merge_columns
+            })
+        )
+    result = conn.execute(
+        delete(table).where(table.c.id.not_in(select(func.max(table.c.id)).group_by(*index.columns)))
+    )
+    if result.rowcount:
+        logger.warning(
+            "%s: %s の作成前に重複する行をまとめました（削除 %d 行）", table.name, index.name, result.rowcount
+        )
+
+
 async def init_db():
     """テーブル作成"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns_and_indexes)
@@ -10,6 +10,11 @@ from app.config import get_settings
 from app.database import init_db
 from app.routers import auth, users, receipts, fitness, surveys, points, referrals, campaigns, shopping, admin, announcements
 from app.seed import seed_surveys, seed_campaigns, seed_admin
+from app.core.auth_cache import start_invalidation_listener, stop_invalidation_listener, load_revocations
+from app.core.security import password_hash_stats
+from app.core.uploads import UploadSizeLimitMiddleware
+from app.services.image_service import shutdown_image_executor
+from app.services.receipt_job_service import start_receipt_workers, stop_receipt_workers
 
 settings = get_settings()
 
@@ -23,8 +28,14 @@ async def lifespan(app: FastAPI):
     await seed_admin()
     # アップロードディレクトリ作成
     Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    await start_invalidation_listener()
+    await load_revocations()
+    start_receipt_workers()
     yield
     # 終了時のクリーンアップ
+    await stop_receipt_workers()
+    await stop_invalidation_listener()
+    shutdown_image_executor()
 
 
 app = FastAPI(
@@ -36,6 +47,13 @@ app = FastAPI(
     redoc_url="/api/redoc",
 )
 
+# レシート画像のアップロードは上限を超えた時点で打ち切る（413 にも CORS ヘッダーが付くよう CORS より内側に置く）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_size=settings.MAX_UPLOAD_SIZE,
+    path_prefixes=["/api/v1/receipts"],
+)
+
 # CORS (allow_credentials=True のときは allow_origins に "*" は使えない)
 # Flutter Web はランダムポートを使うため、localhost/127.0.0.1 の任意ポートを正規表現で許可
 _origins = [x.strip().rstrip("/") for x in settings.CORS_ORIGINS.split(",") if x.strip()]
@@ -49,9 +67,10 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-# 静的ファイル（アップロード画像）
+# 静的ファイル（アップロード画像。STORAGE_BACKEND=s3 ではストレージから直接配信する）
 Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+if settings.STORAGE_BACKEND == "local":
+    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 # APIルーター
 app.include_router(auth.router, prefix="/api/v1")
@@ -74,4 +93,4 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "password_hash": password_hash_stats()}
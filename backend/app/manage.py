@@ -0,0 +1,281 @@
+"""運用コマンド
+
+使い方: python -m app.manage <コマンド>
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+import app.models  # noqa: F401  テーブル定義の登録
+from app.config import get_settings
+from app.database import AsyncSessionLocal, init_db
+
+
+async def cmd_rebuild_balances(args: argparse.Namespace) -> None:
+    """集計済みポイント残高を台帳から再計算"""
+    from app.services.point_service import rebuild_balances
+
+    async with AsyncSessionLocal() as db:
+        count = await rebuild_balances(db)
+    print(f"{count}人分のポイント残高を再計算しました")
+
+
+async def cmd_create_checkpoints(args: argparse.Namespace) -> int:
+    """ポイント残高のチェックポイントを作成"""
+    from app.services.point_service import create_checkpoints
+
+    as_of = datetime.fromisoformat(args.as_of) if args.as_of else None
+    try:
+        async with AsyncSessionLocal() as db:
+            count = await create_checkpoints(db, as_of=as_of)
+    except ValueError as e:
+        print(e)
+        return 1
+    print(f"{count}件のチェックポイントを作成しました")
+    return 0
+
+
+async def cmd_purge_idempotency_keys(args: argparse.Namespace) -> None:
+    """期限切れの冪等キーを削除"""
+    from app.services.idempotency_service import purge_expired_keys
+
+    async with AsyncSessionLocal() as db:
+        count = await purge_expired_keys(db)
+    print(f"{count}件の期限切れ冪等キーを削除しました")
+
+
+async def cmd_partition_point_transactions(args: argparse.Namespace) -> None:
+    """ポイント取引の月次パーティション化・先の月のパーティション作成"""
+    from app.services.ledger_archive_service import partition_point_transactions
+
+    async with AsyncSessionLocal() as db:
+        done = await partition_point_transactions(db, months_ahead=args.months_ahead)
+    print("パーティションを更新しました" if done else "PostgreSQL 以外では単一テーブルのまま利用します")
+
+
+async def cmd_archive_point_transactions(args: argparse.Namespace) -> None:
+    """古い月のポイント取引をアーカイブ"""
+    from app.services.ledger_archive_service import archive_partitions
+
+    async with AsyncSessionLocal() as db:
+        archived = await archive_partitions(
+            db,
+            older_than_months=args.older_than_months,
+            archive_dir=args.archive_dir or get_settings().ARCHIVE_DIR,
+        )
+    for name, count, path in archived:
+        print(f"{name}: {count}件 -> {path}")
+    print(f"{len(archived)}個のパーティションをアーカイブしました")
+
+
+async def cmd_grant_points_bulk(args: argparse.Namespace) -> int:
+    """ファイルからポイントを一括付与"""
+    from app.services.admin_service import bulk_grant_points, parse_point_grant_file
+
+    with open(args.file, "rb") as f:
+        rows, errors = parse_point_grant_file(f.read(), args.file)
+
+    def on_progress(done: int, total: int) -> None:
+        print(f"{done}/{total}件 処理済み", flush=True)
+
+    async with AsyncSessionLocal() as db:
+        report = await bulk_grant_points(
+            db, rows, chunk_size=args.chunk_size, on_progress=on_progress, errors=errors
+        )
+    for error in report["errors"]:
+        print(f"  {error['row']}行目 user={error['user_id']}: {error['detail']}")
+    print(
+        f"{report['granted_count']}件・{report['granted_amount']}ptを付与しました"
+        f"（エラー {report['error_count']}件）"
+    )
+    return 1 if report["error_count"] else 0
+
+
+async def cmd_reconcile_ledger(args: argparse.Namespace) -> int:
+    """ポイント台帳の整合性チェック（問題があれば終了コード 1）"""
+    from app.services.reconciliation_service import reconcile_ledger
+
+    async with AsyncSessionLocal() as db:
+        report = await reconcile_ledger(db, chunk_size=args.chunk_size)
+    print(f"取引 {report['rows_scanned']}件 / ユーザー {report['users_checked']}人を検証しました")
+    print(f"残高マイナス: {report['negative_balance_count']}人")
+    for item in report["negative_balances"][:10]:
+        print(f"  user={item['user_id']} transaction={item['transaction_id']} balance={item['balance']}")
+    print(f"集計済み残高の不一致: {report['balance_mismatch_count']}人")
+    for item in report["balance_mismatches"][:10]:
+        print(f"  user={item['user_id']} materialized={item['materialized']} ledger={item['ledger']}")
+    print(f"チェックポイントの不一致: {report['checkpoint_mismatch_count']}件")
+    for item in report["checkpoint_mismatches"][:10]:
+        print(f"  user={item['user_id']} as_of={item['as_of']} checkpoint={item['checkpoint']} ledger={item['ledger']}")
+    for tx_type, item in report["dangling_references"].items():
+        if item["count"]:
+            print(f"参照先のない {tx_type} 取引: {item['count']}件 (例: {item['transaction_ids'][:10]})")
+    if report["missing_balance_rows"]:
+        print(f"集計済み残高の行がないユーザー: {report['missing_balance_rows']}人（rebuild-balances で作成）")
+    print("問題はありません" if report["ok"] else "不整合が見つかりました")
+    return 0 if report["ok"] else 1
+
+
+async def cmd_index_receipt_images(args: argparse.Namespace) -> None:
+    """dHash 未計算のレシート画像を類似検索の索引に登録"""
+    from app.services.receipt_similarity_service import index_missing_receipt_images
+
+    async with AsyncSessionLocal() as db:
+        result = await index_missing_receipt_images(db, batch_size=args.batch_size)
+    print(
+        f"{result['indexed']}件を索引に登録しました"
+        f"（類似画像あり {result['near_duplicates']}件 / 画像を読めず {result['skipped']}件）"
+    )
+
+
+async def cmd_backfill_receipt_items(args: argparse.Namespace) -> None:
+    """receipts.items の JSON を商品明細テーブルに移行"""
+    from app.services.receipt_item_service import backfill_receipt_items
+
+    async with AsyncSessionLocal() as db:
+        result = await backfill_receipt_items(db, batch_size=args.batch_size)
+    print(
+        f"{result['receipts']}件のレシートから{result['items']}件の商品明細を作成しました"
+        f"（JSON を読めず {result['invalid']}件）"
+    )
+
+
+async def cmd_match_buy_back_targets(args: argparse.Namespace) -> None:
+    """登録済みのレシートを買取対象と照合し直す"""
+    from app.services.buy_back_service import match_buy_back_receipts
+
+    async with AsyncSessionLocal() as db:
+        result = await match_buy_back_receipts(db, batch_size=args.batch_size, days=args.days)
+    print(f"{result['receipts']}件のレシートを照合しました（買取対象との一致 {result['matches']}件）")
+
+
+async def cmd_auto_review_receipts(args: argparse.Namespace) -> int:
+    """審査待ちレシートをルールで自動審査"""
+    from app.services.receipt_auto_review_service import auto_review_receipts, load_rules
+
+    path = args.rules or get_settings().RECEIPT_AUTO_REVIEW_RULES_FILE
+    if not path:
+        print("ルールファイルを --rules または RECEIPT_AUTO_REVIEW_RULES_FILE で指定してください")
+        return 1
+    try:
+        rules = load_rules(path)
+    except (OSError, ValueError) as e:
+        print(f"ルールファイルを読み込めません: {e}")
+        return 1
+    async with AsyncSessionLocal() as db:
+        result = await auto_review_receipts(db, rules, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(
+        f"{result['scanned']}件のレシートを判定しました"
+        f"（承認 {result['approved']}件 / 却下 {result['rejected']}件 / 審査待ちのまま {result['held']}件）"
+        + ("（--dry-run のため審査していません）" if args.dry_run else "")
+    )
+    for reason, count in sorted(result["held_reasons"].items()):
+        print(f"  {reason}: {count}件")
+    if result["error_count"]:
+        print(f"審査できなかったレシート: {result['error_count']}件")
+        for error in result["errors"][:10]:
+            print(f"  receipt={error['receipt_id']}: {error['detail']}")
+    print(f"付与ポイント: {result['awarded_points']}pt")
+    return 0
+
+
+async def cmd_run_receipt_worker(args: argparse.Namespace) -> None:
+    """レシート処理ジョブのワーカー（--once は実行可能なジョブが無くなったら終了）"""
+    from app.services.image_service import shutdown_image_executor
+    from app.services.receipt_job_service import process_receipt_jobs, start_receipt_workers, stop_receipt_workers
+
+    try:
+        if args.once:
+            total = 0
+            while processed := await process_receipt_jobs():
+                total += processed
+            print(f"{total}件のジョブを処理しました")
+            return
+        start_receipt_workers(args.workers)
+        print("レシート処理ジョブのワーカーを起動しました（Ctrl+C で終了）")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await stop_receipt_workers()
+    finally:
+        shutdown_image_executor()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.manage", description="ポイ活アプリ 運用コマンド")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-balances", help="集計済みポイント残高を台帳から再計算")
+    p.set_defaults(func=cmd_rebuild_balances)
+
+    p = sub.add_parser("create-checkpoints", help="ポイント残高のチェックポイントを作成（月次バッチ）")
+    p.add_argument("--as-of", help="この月初（1日 0時 UTC）より前の取引を反映（既定: 当月1日）")
+    p.set_defaults(func=cmd_create_checkpoints)
+
+    p = sub.add_parser("purge-idempotency-keys", help="期限切れの冪等キーを削除")
+    p.set_defaults(func=cmd_purge_idempotency_keys)
+
+    p = sub.add_parser(
+        "partition-point-transactions",
+        help="ポイント取引を月次パーティション化し、先の月のパーティションを作成（PostgreSQL・毎月実行）",
+    )
+    p.add_argument("--months-ahead", type=int, default=3, help="何か月先まで作成するか")
+    p.set_defaults(func=cmd_partition_point_transactions)
+
+    p = sub.add_parser(
+        "archive-point-transactions",
+        help="古い月のパーティションを圧縮ファイルに書き出して切り離す（PostgreSQL）",
+    )
+    p.add_argument("--older-than-months", type=int, required=True, help="何か月より前をアーカイブするか")
+    p.add_argument("--archive-dir", help="出力先（既定: ARCHIVE_DIR）")
+    p.set_defaults(func=cmd_archive_point_transactions)
+
+    p = sub.add_parser("grant-points-bulk", help="CSV / NDJSON ファイルからポイントを一括付与")
+    p.add_argument("file", help="user_id,amount,description のCSV または NDJSON")
+    p.add_argument("--chunk-size", type=int, default=5000, help="1トランザクションで付与する件数")
+    p.set_defaults(func=cmd_grant_points_bulk)
+
+    p = sub.add_parser("reconcile-ledger", help="ポイント台帳の整合性チェック（夜間バッチ）")
+    p.add_argument("--chunk-size", type=int, default=200_000, help="一度に読み込む取引の件数")
+    p.set_defaults(func=cmd_reconcile_ledger)
+
+    p = sub.add_parser("index-receipt-images", help="レシート画像の類似検索用ハッシュを計算（未計算分のみ）")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.set_defaults(func=cmd_index_receipt_images)
+
+    p = sub.add_parser("backfill-receipt-items", help="レシートの商品明細（JSON）を receipt_items に移行（未移行分のみ）")
+    p.add_argument("--batch-size", type=int, default=1000, help="1トランザクションで移行するレシート数")
+    p.set_defaults(func=cmd_backfill_receipt_items)
+
+    p = sub.add_parser("match-buy-back-targets", help="登録済みのレシートを買取対象と照合し直す（買取キャンペーンの追加・変更後）")
+    p.add_argument("--batch-size", type=int, default=1000, help="1トランザクションで照合するレシート数")
+    p.add_argument("--days", type=int, help="直近 N 日に登録されたレシートのみ")
+    p.set_defaults(func=cmd_match_buy_back_targets)
+
+    p = sub.add_parser("auto-review-receipts", help="審査待ちのレシートをルールで自動審査（定期実行）")
+    p.add_argument("--rules", help="ルールファイル（JSON。既定: RECEIPT_AUTO_REVIEW_RULES_FILE）")
+    p.add_argument("--batch-size", type=int, default=2000, help="1トランザクションで審査するレシート数")
+    p.add_argument("--dry-run", action="store_true", help="判定結果の件数だけ表示し、審査しない")
+    p.set_defaults(func=cmd_auto_review_receipts)
+
+    p = sub.add_parser("run-receipt-worker", help="レシート処理ジョブのワーカーを起動（API と別プロセスで動かす場合）")
+    p.add_argument("--workers", type=int, default=2, help="ワーカー数")
+    p.add_argument("--once", action="store_true", help="実行可能なジョブを処理したら終了")
+    p.set_defaults(func=cmd_run_receipt_worker)
+
+    return parser
+
+
+async def run(args: argparse.Namespace):
+    await init_db()
+    return await args.func(args)
+
+
+def main(argv=None) -> None:
+    args = build_parser().parse_args(argv)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
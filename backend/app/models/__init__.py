@@ -1,18 +1,28 @@
 from app.models.user import User
-from app.models.receipt import Receipt
-from app.models.point_transaction import PointTransaction
+from app.models.receipt import Receipt, ReceiptImageHashBand, ReceiptLineItem
+from app.models.receipt_job import ReceiptJob, ReceiptJobStatus
+from app.models.point_transaction import PointTransaction, PointTransactionRollup
+from app.models.point_balance import UserPointBalance, PointBalanceCheckpoint
 from app.models.fitness_log import FitnessLog, BottleConsumption
 from app.models.survey import Survey, SurveyAnswer
 from app.models.exchange import Exchange, ExchangeStatus
 from app.models.referral import Referral
-from app.models.campaign import Campaign, CampaignType
+from app.models.campaign import Campaign, CampaignType, QuestProgress, ReceiptBuyBackMatch
 from app.models.shopping_track import ShoppingTrack
 from app.models.announcement import Announcement
+from app.models.idempotency_key import IdempotencyKey
 
 __all__ = [
     "User",
     "Receipt",
+    "ReceiptImageHashBand",
+    "ReceiptLineItem",
+    "ReceiptJob",
+    "ReceiptJobStatus",
     "PointTransaction",
+    "PointTransactionRollup",
+    "UserPointBalance",
+    "PointBalanceCheckpoint",
     "FitnessLog",
     "BottleConsumption",
     "Survey",
@@ -22,6 +32,9 @@ __all__ = [
     "Referral",
     "Campaign",
     "CampaignType",
+    "ReceiptBuyBackMatch",
+    "QuestProgress",
     "ShoppingTrack",
     "Announcement",
+    "IdempotencyKey",
 ]
@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Integer, DateTime, Text, Boolean
+from sqlalchemy import String, Integer, DateTime, Text, Boolean, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -23,8 +23,41 @@ class Campaign(Base):
     campaign_type: Mapped[str] = mapped_column(String(20), default=CampaignType.GENERAL)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     points: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # 付与ポイント
+    keywords: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # 対象商品名・キーワード（改行・カンマ区切り）
+    required_quantity: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # クエスト達成に必要な購入数（未設定は1）
     start_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     end_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ReceiptBuyBackMatch(Base):
+    """レシートに含まれていた買取対象（買取キャンペーン）。レシート処理ジョブ・一括照合で作成"""
+    __tablename__ = "receipt_buy_back_matches"
+    __table_args__ = (
+        UniqueConstraint("receipt_id", "campaign_id", name="uq_receipt_buy_back_matches_receipt_campaign"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    receipt_id: Mapped[int] = mapped_column(ForeignKey("receipts.id"), nullable=False)
+    campaign_id: Mapped[int] = mapped_column(ForeignKey("campaigns.id"), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)  # receipts.user_id と同じ
+    matched_text: Mapped[str] = mapped_column(String(200), nullable=False)  # 一致した商品名（または店舗名）
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class QuestProgress(Base):
+    """ユーザーごとのクエストの進捗（対象商品の購入数）。レシートの承認時に加算し、達成時に1回だけポイントを付与"""
+    __tablename__ = "quest_progress"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "user_id", name="uq_quest_progress_campaign_user"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    campaign_id: Mapped[int] = mapped_column(ForeignKey("campaigns.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # 承認済みレシートの対象商品の購入数
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # 達成日時（ポイント付与済み）
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -2,7 +2,7 @@
 from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import Integer, Date, DateTime, ForeignKey
+from sqlalchemy import Integer, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -10,6 +10,11 @@ from app.database import Base
 
 class FitnessLog(Base):
     __tablename__ = "fitness_logs"
+    __table_args__ = (
+        Index("uq_fitness_logs_user_date", "user_id", "log_date", unique=True),  # 1ユーザー1日1行（歩数の upsert 先）
+        # 既存のデータベースでは同じ日の重複行を1行にまとめ（歩数は最大値）、それ以外を削除してからインデックスを作成する
+        {"info": {"merge_max_on_unique_index": ["steps"]}},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,30 @@
+"""ポイント残高（集計済み）モデル"""
+from datetime import datetime
+
+from sqlalchemy import Integer, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class UserPointBalance(Base):
+    """ユーザーごとのポイント残高。PointTransaction の追加と同じトランザクションで更新する"""
+    __tablename__ = "user_point_balances"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    balance: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PointBalanceCheckpoint(Base):
+    """ポイント残高のチェックポイント（as_of より前の取引をすべて反映した残高）"""
+    __tablename__ = "point_balance_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("user_id", "as_of", name="uq_point_balance_checkpoints_user_as_of"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    as_of: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    balance: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
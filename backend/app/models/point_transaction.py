@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Integer, DateTime, ForeignKey
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -10,6 +10,9 @@ from app.database import Base
 
 class PointTransaction(Base):
     __tablename__ = "point_transactions"
+    __table_args__ = (
+        Index("ix_point_transactions_user_created", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -21,3 +24,19 @@ class PointTransaction(Base):
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="point_transactions")
+
+
+class PointTransactionRollup(Base):
+    """アーカイブ済み（削除済み）のポイント取引をユーザー・月ごとに集計したもの"""
+    __tablename__ = "point_transaction_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "period_start", name="uq_point_transaction_rollups_user_period"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    period_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # 対象月の1日 0時
+    amount_total: Mapped[int] = mapped_column(Integer, nullable=False)  # 増減の合計
+    granted_total: Mapped[int] = mapped_column(Integer, nullable=False)  # 付与（正の取引）の合計
+    transaction_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import String, Integer, BigInteger, SmallInteger, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 
@@ -17,10 +17,23 @@ class ReceiptStatus(str, enum.Enum):
 
 class Receipt(Base):
     __tablename__ = "receipts"
+    __table_args__ = (
+        Index("ix_receipts_user_created", "user_id", "created_at", "id"),
+        Index("ix_receipts_status_created", "status", "created_at", "id"),  # 審査待ちを古い順に取得
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     image_url: Mapped[str] = mapped_column(String(500), nullable=False)
+    thumbnail_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)  # 審査画面用の縮小画像
+    image_sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)  # 元画像の内容ハッシュ
+    duplicate_of_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("receipts.id"), nullable=True, index=True
+    )  # 同じ画像で先に登録されたレシート
+    image_phash: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # 画像の dHash（符号付き64bit）
+    near_duplicate_of_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("receipts.id"), nullable=True, index=True
+    )  # 見た目が近い画像で先に登録されたレシート
     store_name: Mapped[str] = mapped_column(String(200), nullable=False, default="")
     amount: Mapped[int] = mapped_column(Integer, nullable=False)  # 合計金額（円）
     items: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON文字列で商品リスト
@@ -28,8 +41,48 @@ class Receipt(Base):
     status: Mapped[str] = mapped_column(String(20), default=ReceiptStatus.PENDING.value)
     points_awarded: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # 付与ポイント
     rejection_reason: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    review_claimed_by: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"), nullable=True)  # 審査の担当者
+    review_claimed_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # 担当の期限（過ぎたら他の担当者が取得できる）
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # アップロード後の処理の完了日時
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    user: Mapped["User"] = relationship("User", back_populates="receipts")
+    user: Mapped["User"] = relationship("User", back_populates="receipts", foreign_keys=[user_id])
+
+
+class ReceiptImageHashBand(Base):
+    """
+    dHash を 16bit ずつ 4 つに分けた索引（マルチインデックスハッシュ）。
+    ハミング距離 d 以内の画像は、少なくとも 1 つの区間で距離 d // 4 以内に収まる。
+    候補の絞り込みがインデックスだけで済むよう、ハッシュ全体もインデックスに含める
+    """
+    __tablename__ = "receipt_image_hash_bands"
+    __table_args__ = (
+        Index("ix_receipt_image_hash_bands_lookup", "band", "value", "phash", "receipt_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    receipt_id: Mapped[int] = mapped_column(ForeignKey("receipts.id"), nullable=False, index=True)
+    band: Mapped[int] = mapped_column(SmallInteger, nullable=False)  # 0〜3（上位ビットから）
+    value: Mapped[int] = mapped_column(Integer, nullable=False)  # 16bit の値
+    phash: Mapped[int] = mapped_column(BigInteger, nullable=False)  # dHash 全体（receipts.image_phash と同じ）
+
+
+class ReceiptLineItem(Base):
+    """
+    レシートの商品明細（receipts.items の JSON を1商品1行にしたもの）。
+    商品名で購入者を引けるよう、正規化した商品名とユーザーIDをインデックスに持つ
+    """
+    __tablename__ = "receipt_items"
+    __table_args__ = (
+        Index("ix_receipt_items_normalized_name_user", "normalized_name", "user_id", "quantity"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    receipt_id: Mapped[int] = mapped_column(ForeignKey("receipts.id"), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)  # receipts.user_id と同じ
+    name: Mapped[str] = mapped_column(String(200), nullable=False)
+    normalized_name: Mapped[str] = mapped_column(String(200), nullable=False)  # NFKC・小文字・空白を詰めた商品名
+    price: Mapped[int] = mapped_column(Integer, nullable=False)  # 単価（円）
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
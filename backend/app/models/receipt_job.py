@@ -0,0 +1,34 @@
+"""レシート処理ジョブモデル"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+import enum
+
+from app.database import Base
+
+
+class ReceiptJobStatus(str, enum.Enum):
+    QUEUED = "queued"  # 実行待ち（失敗後の再試行待ちを含む）
+    RUNNING = "running"  # 実行中（locked_until を過ぎたらワーカー停止とみなして再実行）
+    DONE = "done"
+    FAILED = "failed"  # 再試行の上限に達した
+
+
+class ReceiptJob(Base):
+    """アップロード後のレシート処理（画像の正規化・ハッシュ計算・重複チェック等）"""
+    __tablename__ = "receipt_jobs"
+    __table_args__ = (
+        Index("ix_receipt_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    receipt_id: Mapped[int] = mapped_column(ForeignKey("receipts.id"), nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default=ReceiptJobStatus.QUEUED.value)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    run_after: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)  # 再試行の待ち合わせ
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # 実行中ジョブのリース期限
+    last_error: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
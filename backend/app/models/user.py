@@ -24,7 +24,7 @@ class User(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    receipts: Mapped[List["Receipt"]] = relationship("Receipt", back_populates="user")
+    receipts: Mapped[List["Receipt"]] = relationship("Receipt", back_populates="user", foreign_keys="Receipt.user_id")
     point_transactions: Mapped[List["PointTransaction"]] = relationship(
         "PointTransaction", back_populates="user"
     )
@@ -1,19 +1,25 @@
 """管理者API"""
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.models.campaign import Campaign
 from app.models.survey import Survey
 from app.models.announcement import Announcement
+from app.models.receipt import ReceiptStatus
 from app.schemas.admin import (
     UserListItem,
     UserUpdateActive,
     PointGrantCreate,
+    BulkPointGrantCreate,
+    BulkPointGrantResponse,
     ReceiptReviewUpdate,
+    BulkReceiptReviewCreate,
+    ReceiptClaimRelease,
+    ReceiptItemBuyer,
+    BulkReceiptReviewResponse,
     AnalyticsResponse,
     AnnouncementCreate,
     AnnouncementUpdate,
@@ -23,14 +29,33 @@ from app.schemas.admin import (
     SurveyCreate,
     SurveyUpdate,
 )
-from app.schemas.receipt import ReceiptResponse
-from app.schemas.campaign import CampaignResponse
+from app.schemas.receipt import ReceiptResponse, SimilarReceiptResponse
+from app.schemas.campaign import CampaignResponse, BuyBackMatchResponse
 from app.schemas.survey import SurveyResponse
-from app.services.admin_service import list_users, update_user_active, grant_points, get_analytics
-from app.services.receipt_service import get_all_receipts, get_receipt_by_id_any, update_receipt_status
+from app.services.admin_service import (
+    list_users,
+    update_user_active,
+    DESCRIPTION_MAX_LENGTH,
+    grant_points,
+    bulk_grant_points,
+    parse_point_grant_file,
+    get_analytics,
+)
+from app.services.receipt_service import (
+    get_all_receipts,
+    get_receipt_by_id_any,
+    update_receipt_status,
+    bulk_review_receipts,
+    claim_pending_receipts,
+    release_receipt_claims,
+)
+from app.services.buy_back_service import list_buy_back_matches
+from app.services.receipt_item_service import find_item_buyers
+from app.services.receipt_similarity_service import find_similar_receipts
 from app.services.campaign_service import list_campaigns, get_campaign_by_id, create_campaign, update_campaign
 from app.services.survey_service import list_all_surveys, create_survey, update_survey, get_survey_by_id_admin
 from app.core.deps import get_current_admin
+from app.core.auth_cache import AuthUser
 from sqlalchemy import select
 
 router = APIRouter(prefix="/admin", tags=["管理者"])
@@ -38,7 +63,7 @@ router = APIRouter(prefix="/admin", tags=["管理者"])
 
 @router.get("/analytics", response_model=AnalyticsResponse)
 async def get_admin_analytics(
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """分析ダッシュボード"""
@@ -50,7 +75,7 @@ async def admin_list_users(
     search: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """ユーザー一覧"""
@@ -62,7 +87,7 @@ async def admin_list_users(
 async def admin_update_user(
     user_id: int,
     data: UserUpdateActive,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """ユーザー有効/無効"""
@@ -78,10 +103,12 @@ async def admin_update_user(
 @router.post("/points/grant")
 async def admin_grant_points(
     data: PointGrantCreate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """ポイント手動付与"""
+    if len(data.description) > DESCRIPTION_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"description は{DESCRIPTION_MAX_LENGTH}文字以内で指定してください")
     tx = await grant_points(db, data.user_id, data.amount, data.description)
     if not tx:
         raise HTTPException(status_code=400, detail="付与に失敗しました")
@@ -89,23 +116,80 @@ async def admin_grant_points(
     return {"message": "付与しました", "transaction_id": tx.id}
 
 
+@router.post("/points/grant/bulk", response_model=BulkPointGrantResponse)
+async def admin_bulk_grant_points(
+    data: BulkPointGrantCreate,
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """ポイント一括付与（チャンクごとにコミット。エラー行は付与せず結果に含める）"""
+    rows = [
+        (i, item.user_id, item.amount, item.description)
+        for i, item in enumerate(data.items, start=1)
+    ]
+    return await bulk_grant_points(db, rows)
+
+
+@router.post("/points/grant/bulk/upload", response_model=BulkPointGrantResponse)
+async def admin_bulk_grant_points_upload(
+    file: UploadFile = File(...),
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """ポイント一括付与（CSV: user_id,amount,description / NDJSON のアップロード）"""
+    content = await file.read()
+    try:
+        rows, errors = parse_point_grant_file(content, file.filename or "")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="ファイルは UTF-8 で作成してください")
+    return await bulk_grant_points(db, rows, errors=errors)
+
+
 @router.get("/receipts", response_model=List[ReceiptResponse])
 async def admin_list_receipts(
     status: Optional[str] = Query(None),
+    include_claimed: bool = Query(False, description="審査待ちの一覧に他の管理者が担当中のレシートも含める"),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    """レシート一覧（審査用）"""
-    receipts = await get_all_receipts(db, status=status, skip=skip, limit=limit)
+    """レシート一覧（審査用。審査待ちの一覧は他の管理者が担当中のレシートを除く）"""
+    exclude_claimed_for = admin.id if status == ReceiptStatus.PENDING.value and not include_claimed else None
+    receipts = await get_all_receipts(
+        db, status=status, skip=skip, limit=limit, exclude_claimed_for=exclude_claimed_for
+    )
     return [ReceiptResponse.model_validate(r) for r in receipts]
 
 
+@router.post("/receipts/claim", response_model=List[ReceiptResponse])
+async def admin_claim_receipts(
+    limit: int = Query(10, ge=1, le=100),
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """審査待ちのレシートを古い順に取得して担当する（他の管理者には RECEIPT_REVIEW_LEASE_SECONDS の間渡さない）"""
+    receipts = await claim_pending_receipts(db, admin.id, limit)
+    await db.commit()
+    return [ReceiptResponse.model_validate(r) for r in receipts]
+
+
+@router.post("/receipts/claim/release")
+async def admin_release_receipt_claims(
+    data: ReceiptClaimRelease,
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """担当中のレシートを解放（審査しないまま他の管理者に回す）"""
+    released = await release_receipt_claims(db, admin.id, data.receipt_ids)
+    await db.commit()
+    return {"released": released}
+
+
 @router.get("/receipts/{receipt_id}", response_model=ReceiptResponse)
 async def admin_get_receipt(
     receipt_id: int,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """レシート詳細"""
@@ -115,21 +199,62 @@ async def admin_get_receipt(
     return ReceiptResponse.model_validate(receipt)
 
 
+@router.get("/receipts/{receipt_id}/similar", response_model=List[SimilarReceiptResponse])
+async def admin_similar_receipts(
+    receipt_id: int,
+    max_distance: Optional[int] = Query(None, ge=0, le=16, description="dHash のハミング距離（省略時は設定値）"),
+    limit: int = Query(20, ge=1, le=100),
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """見た目が近いレシート（撮り直し・トリミングによる重複申請の確認用）"""
+    receipt = await get_receipt_by_id_any(db, receipt_id)
+    if not receipt:
+        raise HTTPException(status_code=404, detail="レシートが見つかりません")
+    if receipt.image_phash is None:
+        return []
+    matches = await find_similar_receipts(
+        db, receipt.image_phash, max_distance=max_distance, exclude_ids=[receipt.id], limit=limit
+    )
+    return [
+        SimilarReceiptResponse(receipt=ReceiptResponse.model_validate(r), distance=distance)
+        for r, distance in matches
+    ]
+
+
+@router.post("/receipts/review/bulk", response_model=BulkReceiptReviewResponse)
+async def admin_bulk_review_receipts(
+    data: BulkReceiptReviewCreate,
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """レシート一括審査（チャンクごとにコミット。エラー行は更新せず結果に含める）"""
+    rows = [
+        (i, item.receipt_id, item.status, item.points_awarded, item.rejection_reason)
+        for i, item in enumerate(data.items, start=1)
+    ]
+    return await bulk_review_receipts(db, rows, reviewer_id=admin.id)
+
+
 @router.patch("/receipts/{receipt_id}", response_model=ReceiptResponse)
 async def admin_review_receipt(
     receipt_id: int,
     data: ReceiptReviewUpdate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    """レシート審査（承認/却下）"""
-    receipt = await update_receipt_status(
-        db,
-        receipt_id,
-        data.status,
-        points_awarded=data.points_awarded,
-        rejection_reason=data.rejection_reason,
-    )
+    """レシート審査（承認/却下）。他の管理者が担当中のレシートは 409"""
+    try:
+        receipt = await update_receipt_status(
+            db,
+            receipt_id,
+            data.status,
+            points_awarded=data.points_awarded,
+            rejection_reason=data.rejection_reason,
+            reviewer_id=admin.id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not receipt:
         raise HTTPException(status_code=404, detail="レシートが見つかりません")
     await db.commit()
@@ -137,11 +262,26 @@ async def admin_review_receipt(
     return ReceiptResponse.model_validate(receipt)
 
 
+@router.get("/receipt-items/buyers", response_model=List[ReceiptItemBuyer])
+async def admin_receipt_item_buyers(
+    name: str = Query(..., min_length=1, description="商品名（表記ゆれを正規化して完全一致）"),
+    approved_only: bool = Query(False, description="承認済みのレシートのみ"),
+    after_user_id: Optional[int] = Query(None, description="前ページの最後の user_id"),
+    limit: int = Query(100, ge=1, le=1000),
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """商品を購入したユーザー一覧（ユーザーID順）"""
+    return await find_item_buyers(
+        db, name, approved_only=approved_only, after_user_id=after_user_id, limit=limit
+    )
+
+
 # キャンペーン管理
 @router.get("/campaigns", response_model=List[CampaignResponse])
 async def admin_list_campaigns(
     active_only: bool = Query(False),
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """キャンペーン一覧"""
@@ -152,7 +292,7 @@ async def admin_list_campaigns(
 @router.post("/campaigns", response_model=CampaignResponse)
 async def admin_create_campaign(
     data: CampaignCreate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """キャンペーン作成"""
@@ -162,6 +302,8 @@ async def admin_create_campaign(
         campaign_type=data.campaign_type,
         description=data.description,
         points=data.points,
+        keywords=data.keywords,
+        required_quantity=data.required_quantity,
         is_active=data.is_active,
     )
     await db.commit()
@@ -172,7 +314,7 @@ async def admin_create_campaign(
 async def admin_update_campaign(
     campaign_id: int,
     data: CampaignUpdate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """キャンペーン更新"""
@@ -186,12 +328,25 @@ async def admin_update_campaign(
     return CampaignResponse.model_validate(campaign)
 
 
+@router.get("/campaigns/{campaign_id}/buy-back-matches", response_model=List[BuyBackMatchResponse])
+async def admin_buy_back_matches(
+    campaign_id: int,
+    before_id: Optional[int] = Query(None, description="前ページの最後の id"),
+    limit: int = Query(50, ge=1, le=200),
+    admin: AuthUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """買取キャンペーンの対象商品を含むレシート（新しい順）"""
+    matches = await list_buy_back_matches(db, campaign_id, before_id=before_id, limit=limit)
+    return [BuyBackMatchResponse.model_validate(m) for m in matches]
+
+
 # アンケート管理
 @router.get("/surveys", response_model=List[SurveyResponse])
 async def admin_list_surveys(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """アンケート一覧"""
@@ -202,7 +357,7 @@ async def admin_list_surveys(
 @router.post("/surveys", response_model=SurveyResponse)
 async def admin_create_survey(
     data: SurveyCreate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """アンケート作成"""
@@ -229,7 +384,7 @@ async def admin_create_survey(
 async def admin_update_survey(
     survey_id: int,
     data: SurveyUpdate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """アンケート更新"""
@@ -250,7 +405,7 @@ async def admin_update_survey(
 # お知らせ管理
 @router.get("/announcements", response_model=List[AnnouncementResponse])
 async def admin_list_announcements(
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """お知らせ一覧"""
@@ -264,7 +419,7 @@ async def admin_list_announcements(
 @router.post("/announcements", response_model=AnnouncementResponse)
 async def admin_create_announcement(
     data: AnnouncementCreate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """お知らせ作成"""
@@ -280,7 +435,7 @@ async def admin_create_announcement(
 async def admin_update_announcement(
     announcement_id: int,
     data: AnnouncementUpdate,
-    admin: User = Depends(get_current_admin),
+    admin: AuthUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """お知らせ更新"""
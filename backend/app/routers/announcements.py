@@ -6,17 +6,17 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.models.announcement import Announcement
 from app.schemas.admin import AnnouncementResponse
-from app.core.deps import get_current_user
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
 
 router = APIRouter(prefix="/announcements", tags=["お知らせ"])
 
 
 @router.get("", response_model=List[AnnouncementResponse])
 async def list_announcements(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """お知らせ一覧（公開中のみ）"""
@@ -5,10 +5,11 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.schemas.campaign import CampaignResponse
+from app.schemas.campaign import CampaignResponse, QuestResponse
 from app.services.campaign_service import list_campaigns
-from app.core.deps import get_current_user
-from app.models.user import User
+from app.services.quest_service import list_user_quests
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
 
 router = APIRouter(prefix="/campaigns", tags=["キャンペーン"])
 
@@ -16,9 +17,24 @@ router = APIRouter(prefix="/campaigns", tags=["キャンペーン"])
 @router.get("", response_model=List[CampaignResponse])
 async def list_active_campaigns(
     active_only: bool = Query(True),
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """キャンペーン一覧"""
     campaigns = await list_campaigns(db, active_only=active_only)
     return [CampaignResponse.model_validate(c) for c in campaigns]
+
+
+@router.get("/quests", response_model=List[QuestResponse])
+async def list_my_quests(
+    current_user: AuthUser = Depends(get_auth_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """開催中のクエストと自分の進捗（承認済みレシートの対象商品の購入数）"""
+    quests = await list_user_quests(db, current_user.id)
+    return [
+        QuestResponse.model_validate(c).model_copy(
+            update={"progress_quantity": quantity, "completed_at": completed_at}
+        )
+        for c, quantity, completed_at in quests
+    ]
@@ -6,15 +6,16 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.schemas.fitness import (
     FitnessStepsCreate,
+    FitnessStepsBulkCreate,
     FitnessStepsResponse,
     FitnessPointsResponse,
     BottleConsumeCreate,
 )
 from app.services.fitness_service import (
     upsert_steps,
+    upsert_steps_bulk,
     get_total_steps,
     get_consumed_bottles,
     consume_bottles,
@@ -23,7 +24,9 @@ from app.services.fitness_service import (
     POINTS_PER_BOTTLE,
 )
 from app.services.point_service import get_balance
-from app.core.deps import get_current_user
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
+from app.core.idempotency import IdempotentRequest, idempotent_request
 
 router = APIRouter(prefix="/fitness", tags=["歩数・フィットネス"])
 
@@ -32,7 +35,7 @@ router = APIRouter(prefix="/fitness", tags=["歩数・フィットネス"])
 async def register_steps(
     data: FitnessStepsCreate,
     target_date: Optional[date] = Query(None),
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """歩数データを登録"""
@@ -41,9 +44,21 @@ async def register_steps(
     return FitnessStepsResponse(date=log.log_date, steps=log.steps)
 
 
+@router.post("/steps/bulk", response_model=List[FitnessStepsResponse])
+async def register_steps_bulk(
+    data: FitnessStepsBulkCreate,
+    current_user: AuthUser = Depends(get_auth_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """複数日の歩数データをまとめて登録（同じ日付が複数ある場合は後の値）"""
+    logs = await upsert_steps_bulk(db, current_user.id, {item.date: item.steps for item in data.items})
+    await db.commit()
+    return [FitnessStepsResponse(date=log.log_date, steps=log.steps) for log in logs]
+
+
 @router.get("/points", response_model=FitnessPointsResponse)
 async def get_fitness_points(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """ボトル・ポイント状況"""
@@ -67,26 +82,29 @@ async def get_fitness_points(
 @router.post("/consume")
 async def consume_bottles_endpoint(
     data: BottleConsumeCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotent_request),
 ):
-    """ボトルを消費してポイント獲得"""
+    """ボトルを消費してポイント獲得（Idempotency-Key ヘッダー対応）"""
+    replayed = await idem.replay()
+    if replayed is not None:
+        return replayed
     consumption, error = await consume_bottles(
         db, current_user.id, data.bottles, STEPS_PER_BOTTLE, POINTS_PER_BOTTLE
     )
     if error:
         raise HTTPException(status_code=400, detail=error)
-    await db.commit()
-    return {
+    return await idem.commit({
         "bottles_consumed": consumption.bottles,
         "points_awarded": consumption.points_awarded,
-    }
+    })
 
 
 @router.get("/steps/history")
 async def get_steps_history(
     days: int = Query(7, ge=1, le=90),
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """歩数履歴"""
@@ -1,11 +1,10 @@
 """ポイントAPI"""
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.schemas.point import (
     PointBalanceResponse,
     PointTransactionResponse,
@@ -19,14 +18,17 @@ from app.services.point_service import (
     create_exchange,
     get_exchange_options,
 )
-from app.core.deps import get_current_user
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
+from app.core.pagination import parse_cursor, set_next_cursor
+from app.core.idempotency import IdempotentRequest, idempotent_request
 
 router = APIRouter(prefix="/points", tags=["ポイント"])
 
 
 @router.get("/balance", response_model=PointBalanceResponse)
 async def get_point_balance(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """ポイント残高"""
@@ -36,19 +38,24 @@ async def get_point_balance(
 
 @router.get("/history", response_model=List[PointTransactionResponse])
 async def get_history(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="前ページの X-Next-Cursor ヘッダーの値"),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """ポイント履歴"""
-    transactions = await get_point_history(db, current_user.id, skip, limit)
+    transactions = await get_point_history(
+        db, current_user.id, skip, limit, cursor=parse_cursor(cursor)
+    )
+    set_next_cursor(response, transactions, limit)
     return transactions
 
 
 @router.get("/exchange-options", response_model=List[ExchangeOptionResponse])
 async def list_exchange_options(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
 ):
     """交換先一覧"""
     options = get_exchange_options()
@@ -58,10 +65,14 @@ async def list_exchange_options(
 @router.post("/exchange", response_model=ExchangeResponse)
 async def request_exchange(
     data: ExchangeCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotent_request),
 ):
-    """ポイント交換申請"""
+    """ポイント交換申請（Idempotency-Key ヘッダー対応）"""
+    replayed = await idem.replay()
+    if replayed is not None:
+        return replayed
     exchange, error = await create_exchange(
         db,
         current_user.id,
@@ -71,5 +82,4 @@ async def request_exchange(
     )
     if error:
         raise HTTPException(status_code=400, detail=error)
-    await db.commit()
-    return exchange
+    return await idem.commit(ExchangeResponse.model_validate(exchange))
@@ -1,14 +1,20 @@
 """レシートAPI"""
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.schemas.receipt import ReceiptCreate, ReceiptResponse, ReceiptItem
 from app.services.receipt_service import create_receipt, get_user_receipts, get_receipt_by_id, save_upload_file
-from app.core.deps import get_current_user
+from app.schemas.campaign import BuyBackTargetResponse, BuyBackTargetsResponse
+from app.services.buy_back_service import list_buy_back_targets
+from app.services.receipt_job_service import wake_receipt_workers
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
+from app.core.pagination import parse_cursor, set_next_cursor
+from app.core.idempotency import IdempotentRequest, idempotent_request
+from app.core.uploads import receive_image_upload
 from app.config import get_settings
 
 router = APIRouter(prefix="/receipts", tags=["レシート"])
@@ -17,22 +23,21 @@ settings = get_settings()
 
 @router.post("", response_model=ReceiptResponse)
 async def register_receipt(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
     image: UploadFile = File(...),
     store_name: str = Form(""),
     amount: int = Form(...),
     purchased_at: Optional[str] = Form(None),
+    idem: IdempotentRequest = Depends(idempotent_request),
 ):
-    """レシート登録（画像アップロード）"""
-    content = await image.read()
-    if len(content) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"ファイルサイズは{settings.MAX_UPLOAD_SIZE // (1024*1024)}MB以下にしてください",
-        )
+    """レシート登録（画像アップロード・Idempotency-Key ヘッダー対応。画像の正規化等は登録後にバックグラウンドで実行）"""
+    replayed = await idem.replay(ReceiptResponse)
+    if replayed is not None:
+        return replayed
+    upload = await receive_image_upload(image, settings.MAX_UPLOAD_SIZE, settings.UPLOAD_DIR)
 
-    image_path = save_upload_file(content, image.filename or "receipt.jpg", settings.UPLOAD_DIR)
+    image_path = await save_upload_file(upload)
 
     from datetime import datetime as dt
     purchased_dt = None
@@ -47,52 +52,59 @@ async def register_receipt(
         amount=amount,
         purchased_at=purchased_dt,
     )
-    receipt = await create_receipt(db, current_user.id, image_path, data)
-    await db.commit()
-    await db.refresh(receipt)
-    return receipt
+    receipt = await create_receipt(db, current_user.id, image_path, data, image_sha256=upload.sha256)
+    response = await idem.commit(receipt, response_model=ReceiptResponse)
+    wake_receipt_workers()
+    return response
 
 
 @router.post("/json", response_model=ReceiptResponse)
 async def register_receipt_json(
     data: ReceiptCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
     image: UploadFile = File(...),
+    idem: IdempotentRequest = Depends(idempotent_request),
 ):
-    """レシート登録（JSON + 画像）"""
-    content = await image.read()
-    if len(content) > settings.MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"ファイルサイズは{settings.MAX_UPLOAD_SIZE // (1024*1024)}MB以下にしてください",
-        )
-    image_path = save_upload_file(content, image.filename or "receipt.jpg", settings.UPLOAD_DIR)
-    receipt = await create_receipt(db, current_user.id, image_path, data)
-    await db.commit()
-    await db.refresh(receipt)
-    return receipt
+    """レシート登録（JSON + 画像・Idempotency-Key ヘッダー対応）"""
+    replayed = await idem.replay(ReceiptResponse)
+    if replayed is not None:
+        return replayed
+    upload = await receive_image_upload(image, settings.MAX_UPLOAD_SIZE, settings.UPLOAD_DIR)
+    image_path = await save_upload_file(upload)
+    receipt = await create_receipt(db, current_user.id, image_path, data, image_sha256=upload.sha256)
+    response = await idem.commit(receipt, response_model=ReceiptResponse)
+    wake_receipt_workers()
+    return response
 
 
 @router.get("", response_model=List[ReceiptResponse])
 async def list_receipts(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="前ページの X-Next-Cursor ヘッダーの値"),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """レシート一覧"""
-    receipts = await get_user_receipts(db, current_user.id, skip, limit)
+    receipts = await get_user_receipts(db, current_user.id, skip, limit, cursor=parse_cursor(cursor))
+    set_next_cursor(response, receipts, limit)
     return receipts
 
 
-@router.get("/buy-back-targets")
+@router.get("/buy-back-targets", response_model=BuyBackTargetsResponse)
 async def get_buy_back_targets(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
+    db: AsyncSession = Depends(get_db),
 ):
-    """買取対象商品一覧（Phase 1: スタブ）"""
+    """買取対象商品一覧（有効な買取キャンペーン。登録したレシートのうち対象商品を含む件数付き）"""
+    targets = await list_buy_back_targets(db, current_user.id)
     return {
-        "items": [],
+        "items": [
+            BuyBackTargetResponse.model_validate(c).model_copy(update={"matched_receipt_count": count})
+            for c, count in targets
+        ],
         "message": "買取対象は随時更新されます",
     }
 
@@ -100,7 +112,7 @@ async def get_buy_back_targets(
 @router.get("/{receipt_id}", response_model=ReceiptResponse)
 async def get_receipt(
     receipt_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """レシート詳細"""
@@ -5,17 +5,17 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.schemas.referral import ReferralCodeResponse, ReferralHistoryItem
 from app.services.referral_service import get_or_create_referral_code, get_referral_history
-from app.core.deps import get_current_user
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
 
 router = APIRouter(prefix="/referrals", tags=["友達紹介"])
 
 
 @router.get("/my-code", response_model=ReferralCodeResponse)
 async def get_my_referral_code(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """自分の紹介コード取得"""
@@ -29,7 +29,7 @@ async def get_my_referral_code(
 
 @router.get("/history", response_model=List[ReferralHistoryItem])
 async def get_my_referral_history(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """紹介履歴"""
@@ -1,14 +1,15 @@
 """ショッピング・EC購入トラッキングAPI"""
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.schemas.shopping import ShoppingTrackCreate, ShoppingTrackResponse
 from app.services.shopping_service import track_purchase, get_track_history
-from app.core.deps import get_current_user
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
+from app.core.pagination import parse_cursor, set_next_cursor
 
 router = APIRouter(prefix="/shopping", tags=["ショッピング"])
 
@@ -16,7 +17,7 @@ router = APIRouter(prefix="/shopping", tags=["ショッピング"])
 @router.post("/track", response_model=ShoppingTrackResponse)
 async def track_purchase_endpoint(
     data: ShoppingTrackCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """EC購入をトラッキング"""
@@ -33,9 +34,13 @@ async def track_purchase_endpoint(
 
 @router.get("/history", response_model=List[ShoppingTrackResponse])
 async def get_my_track_history(
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="前ページの X-Next-Cursor ヘッダーの値"),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """トラッキング履歴"""
-    tracks = await get_track_history(db, current_user.id)
+    tracks = await get_track_history(db, current_user.id, limit, cursor=parse_cursor(cursor))
+    set_next_cursor(response, tracks, limit, created_attr="tracked_at")
     return [ShoppingTrackResponse.model_validate(t) for t in tracks]
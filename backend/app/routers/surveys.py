@@ -5,7 +5,6 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.user import User
 from app.schemas.survey import SurveyResponse, SurveyAnswerCreate
 from app.services.survey_service import (
     get_active_surveys,
@@ -13,7 +12,9 @@ from app.services.survey_service import (
     has_answered,
     submit_answer,
 )
-from app.core.deps import get_current_user
+from app.core.deps import get_auth_user
+from app.core.auth_cache import AuthUser
+from app.core.idempotency import IdempotentRequest, idempotent_request
 
 router = APIRouter(prefix="/surveys", tags=["アンケート"])
 
@@ -22,7 +23,7 @@ router = APIRouter(prefix="/surveys", tags=["アンケート"])
 async def list_surveys(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """アンケート一覧"""
@@ -33,7 +34,7 @@ async def list_surveys(
 @router.get("/{survey_id}", response_model=SurveyResponse)
 async def get_survey(
     survey_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """アンケート詳細"""
@@ -50,7 +51,7 @@ async def get_survey(
 @router.get("/{survey_id}/answered")
 async def check_answered(
     survey_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
 ):
     """回答済みか確認"""
@@ -62,20 +63,23 @@ async def check_answered(
 async def submit_survey_answer(
     survey_id: int,
     data: SurveyAnswerCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_auth_user),
     db: AsyncSession = Depends(get_db),
+    idem: IdempotentRequest = Depends(idempotent_request),
 ):
-    """アンケート回答送信"""
+    """アンケート回答送信（Idempotency-Key ヘッダー対応）"""
+    replayed = await idem.replay()
+    if replayed is not None:
+        return replayed
     answer, error = await submit_answer(
         db, current_user.id, survey_id, data.answers
     )
     if error:
         raise HTTPException(status_code=400, detail=error)
-    await db.commit()
 
     survey = await get_survey_by_id(db, survey_id)
-    return {
+    return await idem.commit({
         "id": answer.id,
         "survey_id": survey_id,
         "points_awarded": survey.points,
-    }
+    })
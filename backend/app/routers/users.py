@@ -6,6 +6,7 @@ from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserResponse, UserUpdate
 from app.core.deps import get_current_user
+from app.core.auth_cache import invalidate_user
 
 router = APIRouter(prefix="/users", tags=["ユーザー"])
 
@@ -27,6 +28,7 @@ async def update_me(
         current_user.name = data.name
     if data.nickname is not None:
         current_user.nickname = data.nickname
+    await invalidate_user(db, current_user.id)
     await db.commit()
     await db.refresh(current_user)
     return current_user
@@ -1,7 +1,7 @@
 """管理者用スキーマ"""
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class UserListItem(BaseModel):
@@ -26,12 +26,63 @@ class PointGrantCreate(BaseModel):
     description: str = "管理者による手動付与"
 
 
+class BulkPointGrantCreate(BaseModel):
+    items: List[PointGrantCreate]
+
+
+class BulkPointGrantError(BaseModel):
+    row: int  # 1始まり（items の順番 / ファイルのデータ行）
+    user_id: Optional[int] = None
+    detail: str
+
+
+class BulkPointGrantResponse(BaseModel):
+    total_rows: int
+    granted_count: int
+    granted_amount: int
+    error_count: int
+    errors: List[BulkPointGrantError]
+
+
 class ReceiptReviewUpdate(BaseModel):
     status: str  # approved / rejected
     points_awarded: Optional[int] = None
     rejection_reason: Optional[str] = None
 
 
+class ReceiptClaimRelease(BaseModel):
+    receipt_ids: Optional[List[int]] = None  # 省略時は確保中のすべて
+
+
+class BulkReceiptReviewItem(ReceiptReviewUpdate):
+    receipt_id: int
+
+
+class BulkReceiptReviewCreate(BaseModel):
+    items: List[BulkReceiptReviewItem]
+
+
+class BulkReceiptReviewError(BaseModel):
+    row: int  # 1始まり（items の順番）
+    receipt_id: int
+    detail: str
+
+
+class BulkReceiptReviewResponse(BaseModel):
+    total_rows: int
+    reviewed_count: int
+    awarded_count: int  # ポイントを付与したレシート数（審査待ちからの承認のみ）
+    awarded_points: int
+    error_count: int
+    errors: List[BulkReceiptReviewError]
+
+
+class ReceiptItemBuyer(BaseModel):
+    user_id: int
+    purchase_count: int  # その商品を含む明細の行数
+    quantity: int  # 購入数量の合計
+
+
 class AnalyticsResponse(BaseModel):
     total_users: int
     new_users_week: int
@@ -67,6 +118,8 @@ class CampaignCreate(BaseModel):
     campaign_type: str = "general"
     description: Optional[str] = None
     points: Optional[int] = None
+    keywords: Optional[str] = None  # 買取・クエストの対象商品名（改行・カンマ区切り）
+    required_quantity: Optional[int] = Field(None, ge=1)  # クエスト達成に必要な購入数
     is_active: bool = True
 
 
@@ -75,6 +128,8 @@ class CampaignUpdate(BaseModel):
     campaign_type: Optional[str] = None
     description: Optional[str] = None
     points: Optional[int] = None
+    keywords: Optional[str] = None
+    required_quantity: Optional[int] = Field(None, ge=1)
     is_active: Optional[bool] = None
 
 
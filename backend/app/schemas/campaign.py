@@ -1,6 +1,6 @@
 """キャンペーンスキーマ"""
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -10,9 +10,39 @@ class CampaignResponse(BaseModel):
     campaign_type: str
     description: Optional[str] = None
     points: Optional[int] = None
+    keywords: Optional[str] = None
+    required_quantity: Optional[int] = None
     start_at: Optional[datetime] = None
     end_at: Optional[datetime] = None
     is_active: bool
 
     class Config:
         from_attributes = True
+
+
+class BuyBackTargetResponse(CampaignResponse):
+    """買取対象（matched_receipt_count は自分のレシートのうち対象商品を含むものの件数）"""
+    matched_receipt_count: int = 0
+
+
+class BuyBackTargetsResponse(BaseModel):
+    items: List[BuyBackTargetResponse]
+    message: str
+
+
+class QuestResponse(CampaignResponse):
+    """クエストと自分の進捗（progress_quantity は承認済みレシートの対象商品の購入数）"""
+    progress_quantity: int = 0
+    completed_at: Optional[datetime] = None
+
+
+class BuyBackMatchResponse(BaseModel):
+    id: int
+    receipt_id: int
+    campaign_id: int
+    user_id: int
+    matched_text: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,6 @@
 """フィットネス・歩数スキーマ"""
 from datetime import date
+from typing import List
 from pydantic import BaseModel, Field
 
 
@@ -7,6 +8,14 @@ class FitnessStepsCreate(BaseModel):
     steps: int = Field(..., ge=0, le=1000000, description="歩数")
 
 
+class FitnessStepsBulkItem(FitnessStepsCreate):
+    date: date
+
+
+class FitnessStepsBulkCreate(BaseModel):
+    items: List[FitnessStepsBulkItem] = Field(..., min_length=1, max_length=90, description="日ごとの歩数（最大90日分）")
+
+
 class FitnessStepsResponse(BaseModel):
     date: date
     steps: int
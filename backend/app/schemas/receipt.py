@@ -2,7 +2,9 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationInfo, field_validator
+
+from app.core.storage import KEEP_STORAGE_REFS, public_url
 
 
 class ReceiptItem(BaseModel):
@@ -28,6 +30,9 @@ class ReceiptResponse(BaseModel):
     id: int
     user_id: int
     image_url: str
+    thumbnail_url: Optional[str] = None
+    duplicate_of_id: Optional[int] = None
+    near_duplicate_of_id: Optional[int] = None
     store_name: str
     amount: int
     items: Optional[str] = None
@@ -35,7 +40,24 @@ class ReceiptResponse(BaseModel):
     status: str
     points_awarded: Optional[int] = None
     rejection_reason: Optional[str] = None
+    review_claimed_by: Optional[int] = None  # 審査の担当者（review_claimed_until まで）
+    review_claimed_until: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
     created_at: datetime
 
+    @field_validator("image_url", "thumbnail_url")
+    @classmethod
+    def to_public_url(cls, v: Optional[str], info: ValidationInfo) -> Optional[str]:
+        """保存先の参照（/uploads/...）を配信用の URL に変換（S3 では署名付き URL 等）"""
+        if info.context and info.context.get(KEEP_STORAGE_REFS):
+            return v
+        return public_url(v)
+
     class Config:
         from_attributes = True
+
+
+class SimilarReceiptResponse(BaseModel):
+    """見た目が近いレシート（distance は dHash のハミング距離。0 に近いほど似ている）"""
+    receipt: ReceiptResponse
+    distance: int
@@ -6,6 +6,7 @@ from app.config import get_settings
 from app.models.user import User
 from app.models.survey import Survey
 from app.models.campaign import Campaign, CampaignType
+from app.core.auth_cache import invalidate_user
 
 
 async def seed_surveys():
@@ -85,4 +86,5 @@ async def seed_admin():
         user = result.scalar_one_or_none()
         if user and not user.is_admin:
             user.is_admin = True
+            await invalidate_user(db, user.id)
             await db.commit()
@@ -1,14 +1,26 @@
 """管理者サービス"""
+import csv
+import io
+import json
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
 from app.models.user import User
-from app.models.point_transaction import PointTransaction
+from app.models.point_transaction import PointTransaction, PointTransactionRollup
 from app.models.exchange import Exchange
 from app.models.receipt import Receipt
+from app.services.point_service import add_point_transaction, add_point_transactions
+from app.core.auth_cache import invalidate_user, revoke_user_tokens
+
+DEFAULT_GRANT_DESCRIPTION = "管理者による手動付与"
+DESCRIPTION_MAX_LENGTH = 500  # point_transactions.description の長さ
+BULK_GRANT_CHUNK_SIZE = 5000
+
+# (行番号, user_id, amount, description)
+GrantRow = Tuple[int, int, int, str]
 
 
 async def list_users(
@@ -35,6 +47,10 @@ async def update_user_active(db: AsyncSession, user_id: int, is_active: bool) ->
         return None
     user.is_active = is_active
     await db.flush()
+    if is_active:
+        await invalidate_user(db, user_id)
+    else:
+        await revoke_user_tokens(db, user_id)
     await db.refresh(user)
     return user
 
@@ -43,21 +59,126 @@ async def grant_points(
     db: AsyncSession,
     user_id: int,
     amount: int,
-    description: str = "管理者による手動付与",
+    description: str = DEFAULT_GRANT_DESCRIPTION,
 ) -> Optional[PointTransaction]:
     """ポイントを手動付与"""
-    tx = PointTransaction(
-        user_id=user_id,
-        amount=amount,
-        type="admin_grant",
-        description=description,
-    )
-    db.add(tx)
-    await db.flush()
+    tx = await add_point_transaction(db, user_id, amount, "admin_grant", description=description)
     await db.refresh(tx)
     return tx
 
 
+def _grant_row(row: int, record: dict) -> GrantRow:
+    try:
+        user_id = int(record["user_id"])
+        amount = int(record["amount"])
+    except KeyError as e:
+        raise ValueError(f"{e.args[0]} がありません")
+    except (TypeError, ValueError):
+        raise ValueError("user_id と amount は整数で指定してください")
+    description = record.get("description") or DEFAULT_GRANT_DESCRIPTION
+    return row, user_id, amount, str(description)
+
+
+def parse_point_grant_file(content: bytes, filename: str = "") -> Tuple[List[GrantRow], List[dict]]:
+    """
+    一括付与ファイル（CSV: user_id,amount,description のヘッダー付き / NDJSON: 1行1件）を解析。
+    戻り値: (付与行, 行ごとのエラー)
+    """
+    text = content.decode("utf-8-sig")
+    is_ndjson = filename.lower().endswith((".ndjson", ".jsonl")) or text.lstrip().startswith("{")
+    rows: List[GrantRow] = []
+    errors: List[dict] = []
+    if is_ndjson:
+        records = (
+            (i, line) for i, line in enumerate(text.splitlines(), start=1) if line.strip()
+        )
+        for i, line in records:
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("JSON オブジェクトで指定してください")
+                rows.append(_grant_row(i, record))
+            except ValueError as e:
+                errors.append({"row": i, "user_id": None, "detail": str(e)})
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        for i, record in enumerate(reader, start=1):
+            try:
+                rows.append(_grant_row(i, record))
+            except ValueError as e:
+                errors.append({"row": i, "user_id": None, "detail": str(e)})
+    return rows, errors
+
+
+async def _grant_chunk(db: AsyncSession, chunk: List[GrantRow]) -> Tuple[int, int, List[dict]]:
+    """1チャンク分を付与（ユーザー確認1回・複数行 INSERT・残高更新）"""
+    user_ids = {user_id for _, user_id, _, _ in chunk}
+    result = await db.execute(select(User.id).where(User.id.in_(user_ids)))
+    existing = set(result.scalars().all())
+
+    errors = []
+    valid = []
+    for row, user_id, amount, description in chunk:
+        if user_id not in existing:
+            errors.append({"row": row, "user_id": user_id, "detail": "ユーザーが見つかりません"})
+        elif amount == 0:
+            errors.append({"row": row, "user_id": user_id, "detail": "amount は0以外を指定してください"})
+        elif len(description) > DESCRIPTION_MAX_LENGTH:
+            errors.append({
+                "row": row,
+                "user_id": user_id,
+                "detail": f"description は{DESCRIPTION_MAX_LENGTH}文字以内で指定してください",
+            })
+        else:
+            valid.append((user_id, amount, description))
+    if not valid:
+        return 0, 0, errors
+
+    await add_point_transactions(
+        db,
+        [
+            {"user_id": user_id, "amount": amount, "type": "admin_grant", "description": description}
+            for user_id, amount, description in valid
+        ],
+    )
+    return len(valid), sum(amount for _, amount, _ in valid), errors
+
+
+async def bulk_grant_points(
+    db: AsyncSession,
+    rows: List[GrantRow],
+    chunk_size: int = BULK_GRANT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    errors: Optional[List[dict]] = None,
+) -> dict:
+    """
+    ポイントを一括付与（チャンクごとにコミット）。
+    途中で失敗した場合もコミット済みのチャンクは付与済みとなる。
+    on_progress: チャンクのコミットごとに (処理済み行数, 全行数) で呼ばれる
+    errors: ファイル解析時のエラー（結果にまとめて返す）
+    """
+    granted = 0
+    granted_amount = 0
+    errors = list(errors or [])
+    total_rows = len(rows) + len(errors)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        count, amount, chunk_errors = await _grant_chunk(db, chunk)
+        await db.commit()
+        granted += count
+        granted_amount += amount
+        errors.extend(chunk_errors)
+        if on_progress:
+            on_progress(start + len(chunk), len(rows))
+    return {
+        "total_rows": total_rows,
+        "granted_count": granted,
+        "granted_amount": granted_amount,
+        "error_count": len(errors),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+    }
+
+
 async def get_analytics(db: AsyncSession) -> dict:
     """分析ダッシュボード用集計"""
     now = datetime.utcnow()
@@ -72,7 +193,7 @@ async def get_analytics(db: AsyncSession) -> dict:
         )
     ).scalar() or 0
 
-    # ポイント総付与
+    # ポイント総付与（アーカイブ済みの月次集計を含む）
     total_points = (
         await db.execute(
             select(func.coalesce(func.sum(PointTransaction.amount), 0)).where(
@@ -80,6 +201,9 @@ async def get_analytics(db: AsyncSession) -> dict:
             )
         )
     ).scalar() or 0
+    total_points += (
+        await db.execute(select(func.coalesce(func.sum(PointTransactionRollup.granted_total), 0)))
+    ).scalar() or 0
 
     # 交換総数
     exchange_result = await db.execute(
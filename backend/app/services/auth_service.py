@@ -6,8 +6,15 @@ from sqlalchemy import select
 
 from app.config import get_settings
 from app.models.user import User
+from app.models.point_balance import UserPointBalance
 from app.schemas.auth import UserRegister
-from app.core.security import get_password_hash, verify_password, create_access_token, create_refresh_token, decode_token
+from app.core.security import (
+    get_password_hash_async,
+    verify_password_async,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+)
 
 
 async def register_user(db: AsyncSession, data: UserRegister) -> User:
@@ -18,7 +25,7 @@ async def register_user(db: AsyncSession, data: UserRegister) -> User:
 
     user = User(
         email=data.email,
-        password_hash=get_password_hash(data.password),
+        password_hash=await get_password_hash_async(data.password),
         name=data.name or data.email.split("@")[0],
     )
     settings = get_settings()
@@ -27,6 +34,8 @@ async def register_user(db: AsyncSession, data: UserRegister) -> User:
     db.add(user)
     await db.flush()
     await db.refresh(user)
+    db.add(UserPointBalance(user_id=user.id, balance=0))
+    await db.flush()
 
     # 友達紹介処理
     from app.services.referral_service import process_referral_on_register
@@ -39,7 +48,7 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
     """メール・パスワードで認証"""
     result = await db.execute(select(User).where(User.email == email))
     user = result.scalar_one_or_none()
-    if user and verify_password(password, user.password_hash):
+    if user and await verify_password_async(password, user.password_hash):
         return user
     return None
 
@@ -47,8 +56,10 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
 def create_tokens(user: User) -> dict:
     """アクセス・リフレッシュトークン生成"""
     data = {"sub": str(user.id), "email": user.email}
+    # AUTH_STATELESS では認可にアクセストークンのクレームを使う
+    claims = {"is_active": user.is_active, "is_admin": user.is_admin}
     return {
-        "access_token": create_access_token(data),
+        "access_token": create_access_token({**data, **claims}),
         "refresh_token": create_refresh_token(data),
     }
 
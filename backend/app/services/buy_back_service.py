@@ -0,0 +1,150 @@
+"""買取対象の照合（買取キャンペーンの対象商品をレシートの商品名・店舗名から見つける）
+
+有効な買取キャンペーン（campaign_type=buyback）のキーワードを1つの Aho-Corasick オートマトンにまとめ、
+レシートの商品名・店舗名を1回ずつ走査して対象を見つける（キーワード数によらず文字数に比例）。
+オートマトンは campaign_service.get_keyword_matcher がワーカープロセス内に保持し、キャンペーンの変更時だけ作り直す。
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.aho_corasick import AhoCorasick
+from app.models.campaign import Campaign, CampaignType, ReceiptBuyBackMatch
+from app.models.receipt import Receipt, ReceiptLineItem
+from app.services.campaign_service import get_keyword_matcher, list_campaigns
+from app.services.receipt_item_service import ITEM_NAME_MAX_LENGTH, normalize_item_name
+
+
+def match_texts(matcher: AhoCorasick[int], texts: Iterable[str]) -> Dict[int, str]:
+    """texts（商品名・店舗名）に含まれる買取対象。戻り値: {キャンペーンID: 最初に一致したテキスト}"""
+    matched: Dict[int, str] = {}
+    for text in texts:
+        if not text:
+            continue
+        for campaign_id in matcher.find(normalize_item_name(text)):
+            matched.setdefault(campaign_id, text[:ITEM_NAME_MAX_LENGTH])
+    return matched
+
+
+async def _replace_matches(
+    db: AsyncSession,
+    receipts: List[Tuple[int, int, Dict[int, str]]],
+    campaign_ids: List[int],
+) -> int:
+    """
+    レシートの照合結果を保存（有効なキャンペーンの分だけ置き換え、終了したキャンペーンの結果は残す）。
+    receipts: [(レシートID, ユーザーID, {キャンペーンID: 一致したテキスト}), ...]
+    """
+    if not campaign_ids or not receipts:
+        return 0
+    await db.execute(
+        delete(ReceiptBuyBackMatch).where(
+            ReceiptBuyBackMatch.receipt_id.in_([receipt_id for receipt_id, _, _ in receipts]),
+            ReceiptBuyBackMatch.campaign_id.in_(campaign_ids),
+        )
+    )
+    rows = [
+        {"receipt_id": receipt_id, "campaign_id": campaign_id, "user_id": user_id, "matched_text": text}
+        for receipt_id, user_id, matched in receipts
+        for campaign_id, text in matched.items()
+    ]
+    if rows:
+        await db.execute(insert(ReceiptBuyBackMatch), rows)
+    return len(rows)
+
+
+async def match_receipt_buy_back(db: AsyncSession, receipt: Receipt) -> int:
+    """レシートの商品名・店舗名を買取対象と照合（レシート処理ジョブから呼ぶ）。戻り値: 一致した対象数"""
+    matcher, campaign_ids = await get_keyword_matcher(db, CampaignType.BUYBACK)
+    if not campaign_ids:
+        return 0
+    result = await db.execute(select(ReceiptLineItem.name).where(ReceiptLineItem.receipt_id == receipt.id))
+    matched = match_texts(matcher, [*result.scalars().all(), receipt.store_name])
+    return await _replace_matches(db, [(receipt.id, receipt.user_id, matched)], campaign_ids)
+
+
+async def match_buy_back_receipts(
+    db: AsyncSession,
+    batch_size: int = 1000,
+    days: Optional[int] = None,
+) -> dict:
+    """
+    登録済みのレシートを買取対象と照合し直す（キャンペーンの追加・変更後の一括照合。チャンクごとにコミット）。
+    days: 直近 days 日に登録されたレシートのみ
+    """
+    matcher, campaign_ids = await get_keyword_matcher(db, CampaignType.BUYBACK)
+    scanned = 0
+    matched_count = 0
+    if not campaign_ids:
+        return {"receipts": 0, "matches": 0}
+    last_id = 0
+    while True:
+        q = (
+            select(Receipt.id, Receipt.user_id, Receipt.store_name)
+            .where(Receipt.id > last_id)
+            .order_by(Receipt.id)
+            .limit(batch_size)
+        )
+        if days is not None:
+            q = q.where(Receipt.created_at >= datetime.utcnow() - timedelta(days=days))
+        receipts = (await db.execute(q)).all()
+        if not receipts:
+            break
+        last_id = receipts[-1].id
+        names: Dict[int, List[str]] = {}
+        result = await db.execute(
+            select(ReceiptLineItem.receipt_id, ReceiptLineItem.name).where(
+                ReceiptLineItem.receipt_id.in_([r.id for r in receipts])
+            )
+        )
+        for receipt_id, name in result.all():
+            names.setdefault(receipt_id, []).append(name)
+        matched_count += await _replace_matches(
+            db,
+            [
+                (r.id, r.user_id, match_texts(matcher, [*names.get(r.id, []), r.store_name]))
+                for r in receipts
+            ],
+            campaign_ids,
+        )
+        scanned += len(receipts)
+        await db.commit()
+    return {"receipts": scanned, "matches": matched_count}
+
+
+async def list_buy_back_targets(db: AsyncSession, user_id: int) -> List[Tuple[Campaign, int]]:
+    """有効な買取キャンペーンと、ユーザーのレシートのうち一致した件数"""
+    campaigns = await list_campaigns(db, active_only=True, campaign_type=CampaignType.BUYBACK)
+    if not campaigns:
+        return []
+    result = await db.execute(
+        select(ReceiptBuyBackMatch.campaign_id, func.count())
+        .where(
+            ReceiptBuyBackMatch.user_id == user_id,
+            ReceiptBuyBackMatch.campaign_id.in_([c.id for c in campaigns]),
+        )
+        .group_by(ReceiptBuyBackMatch.campaign_id)
+    )
+    counts = dict(result.all())
+    return [(c, counts.get(c.id, 0)) for c in campaigns]
+
+
+async def list_buy_back_matches(
+    db: AsyncSession,
+    campaign_id: int,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+) -> List[ReceiptBuyBackMatch]:
+    """買取キャンペーンに一致したレシート（新しい順。before_id で続きを取得）"""
+    q = (
+        select(ReceiptBuyBackMatch)
+        .where(ReceiptBuyBackMatch.campaign_id == campaign_id)
+        .order_by(ReceiptBuyBackMatch.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        q = q.where(ReceiptBuyBackMatch.id < before_id)
+    result = await db.execute(q)
+    return list(result.scalars().all())
@@ -1,11 +1,62 @@
 """キャンペーンサービス"""
+import re
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 
+from app.core.aho_corasick import AhoCorasick
 from app.models.campaign import Campaign
+from app.services.receipt_item_service import normalize_item_name
+
+KEYWORD_SEPARATOR = re.compile(r"[\n,、]+")
+
+
+def active_campaign_filter(now: datetime) -> list:
+    """公開中・期間内のキャンペーンの条件"""
+    return [
+        Campaign.is_active == True,  # noqa: E712
+        or_(Campaign.start_at.is_(None), Campaign.start_at <= now),
+        or_(Campaign.end_at.is_(None), Campaign.end_at >= now),
+    ]
+
+
+def campaign_keywords(campaign: Campaign) -> List[str]:
+    """キャンペーンの対象キーワード（正規化済み。未設定ならタイトル）"""
+    keywords = [normalize_item_name(k) for k in KEYWORD_SEPARATOR.split(campaign.keywords or "")]
+    keywords = [k for k in keywords if k]
+    return keywords or [normalize_item_name(campaign.title)]
+
+
+@dataclass
+class _KeywordCatalog:
+    version: Tuple[Tuple[int, datetime], ...]
+    matcher: AhoCorasick[int]
+
+
+_keyword_catalogs: Dict[str, _KeywordCatalog] = {}
+
+
+async def get_keyword_matcher(db: AsyncSession, campaign_type: str) -> Tuple[AhoCorasick[int], List[int]]:
+    """
+    有効なキャンペーン（campaign_type）のキーワードのオートマトン（値はキャンペーンID）と、対象のキャンペーンID。
+    ワーカープロセス内に保持し、キャンペーンの追加・更新・期間の開始/終了があったときだけ作り直す
+    """
+    result = await db.execute(
+        select(Campaign.id, Campaign.updated_at)
+        .where(Campaign.campaign_type == campaign_type, *active_campaign_filter(datetime.utcnow()))
+        .order_by(Campaign.id)
+    )
+    version = tuple(tuple(row) for row in result.all())
+    catalog = _keyword_catalogs.get(campaign_type)
+    if catalog is None or catalog.version != version:
+        result = await db.execute(select(Campaign).where(Campaign.id.in_([cid for cid, _ in version])))
+        campaigns = result.scalars().all()
+        matcher = AhoCorasick((keyword, c.id) for c in campaigns for keyword in campaign_keywords(c))
+        catalog = _keyword_catalogs[campaign_type] = _KeywordCatalog(version, matcher)
+    return catalog.matcher, [cid for cid, _ in version]
 
 
 async def get_campaign_by_id(db: AsyncSession, campaign_id: int) -> Optional[Campaign]:
@@ -20,6 +71,8 @@ async def create_campaign(
     campaign_type: str = "general",
     description: Optional[str] = None,
     points: Optional[int] = None,
+    keywords: Optional[str] = None,
+    required_quantity: Optional[int] = None,
     start_at: Optional[datetime] = None,
     end_at: Optional[datetime] = None,
     is_active: bool = True,
@@ -30,6 +83,8 @@ async def create_campaign(
         campaign_type=campaign_type,
         description=description,
         points=points,
+        keywords=keywords,
+        required_quantity=required_quantity,
         start_at=start_at,
         end_at=end_at,
         is_active=is_active,
@@ -60,16 +115,13 @@ async def update_campaign(
 async def list_campaigns(
     db: AsyncSession,
     active_only: bool = True,
+    campaign_type: Optional[str] = None,
 ) -> List[Campaign]:
     """キャンペーン一覧"""
     q = select(Campaign).order_by(Campaign.start_at.desc().nullslast())
+    if campaign_type:
+        q = q.where(Campaign.campaign_type == campaign_type)
     if active_only:
-        q = q.where(Campaign.is_active == True)  # noqa: E712
-        now = datetime.utcnow()
-        q = q.where(
-            or_(Campaign.start_at.is_(None), Campaign.start_at <= now)
-        ).where(
-            or_(Campaign.end_at.is_(None), Campaign.end_at >= now)
-        )
+        q = q.where(*active_campaign_filter(datetime.utcnow()))
     result = await db.execute(q)
     return list(result.scalars().all())
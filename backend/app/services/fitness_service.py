@@ -1,17 +1,38 @@
 """フィットネス・歩数サービス"""
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete
 
+from app.database import dialect_insert
 from app.models.fitness_log import FitnessLog, BottleConsumption
-from app.models.point_transaction import PointTransaction
+from app.services.point_service import add_point_transaction, lock_user_balance
 
 STEPS_PER_BOTTLE = 10000
 POINTS_PER_BOTTLE = 10
 
 
+async def upsert_steps_bulk(db: AsyncSession, user_id: int, steps_by_date: Dict[date, int]) -> List[FitnessLog]:
+    """
+    複数日の歩数を登録（同日の既存レコードは更新）。
+    INSERT ... ON CONFLICT DO UPDATE 1回で保存し、保存した行を日付順に返す
+    """
+    if not steps_by_date:
+        return []
+    now = datetime.utcnow()
+    stmt = dialect_insert(FitnessLog).values([
+        {"user_id": user_id, "log_date": log_date, "steps": steps, "created_at": now, "updated_at": now}
+        for log_date, steps in sorted(steps_by_date.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "log_date"],
+        set_={"steps": stmt.excluded.steps, "updated_at": now},
+    ).returning(FitnessLog)
+    result = await db.scalars(stmt, execution_options={"populate_existing": True})
+    return sorted(result.all(), key=lambda log: log.log_date)
+
+
 async def upsert_steps(
     db: AsyncSession,
     user_id: int,
@@ -19,23 +40,8 @@ async def upsert_steps(
     target_date: Optional[date] = None,
 ) -> FitnessLog:
     """歩数を登録（同日の既存レコードは更新）"""
-    target_date = target_date or date.today()
-    result = await db.execute(
-        select(FitnessLog).where(
-            FitnessLog.user_id == user_id,
-            FitnessLog.log_date == target_date,
-        )
-    )
-    log = result.scalar_one_or_none()
-    if log:
-        log.steps = steps
-        log.updated_at = datetime.utcnow()
-    else:
-        log = FitnessLog(user_id=user_id, steps=steps, log_date=target_date)
-        db.add(log)
-    await db.flush()
-    await db.refresh(log)
-    return log
+    logs = await upsert_steps_bulk(db, user_id, {target_date or date.today(): steps})
+    return logs[0]
 
 
 async def get_total_steps(db: AsyncSession, user_id: int) -> int:
@@ -69,6 +75,7 @@ async def consume_bottles(
     ボトルを消費してポイント獲得。
     戻り値: (BottleConsumption, error_message)
     """
+    await lock_user_balance(db, user_id)
     total_steps = await get_total_steps(db, user_id)
     consumed = await get_consumed_bottles(db, user_id)
     available_bottles = total_steps // steps_per_bottle - consumed
@@ -86,15 +93,14 @@ async def consume_bottles(
     await db.flush()
 
     # ポイント付与
-    tx = PointTransaction(
-        user_id=user_id,
-        amount=points,
-        type="bottle",
+    await add_point_transaction(
+        db,
+        user_id,
+        points,
+        "bottle",
         description=f"ボトル{bottles}個消費",
         reference_id=consumption.id,
     )
-    db.add(tx)
-    await db.flush()
     await db.refresh(consumption)
     return consumption, None
 
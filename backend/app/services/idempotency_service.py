@@ -0,0 +1,59 @@
+"""冪等キーサービス"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+
+from app.models.idempotency_key import IdempotencyKey
+
+
+async def get_stored_response(db: AsyncSession, user_id: int, key: str) -> Optional[IdempotencyKey]:
+    """保存済みレスポンス（有効期限内のみ）"""
+    result = await db.execute(
+        select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+        )
+    )
+    record = result.scalar_one_or_none()
+    if record and record.expires_at <= datetime.utcnow():
+        # 期限切れは削除して新しいリクエストとして扱う
+        await db.delete(record)
+        await db.flush()
+        return None
+    return record
+
+
+async def save_response(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    endpoint: str,
+    status_code: int,
+    response_body: str,
+    expires_at: datetime,
+    request_hash: Optional[str] = None,
+) -> IdempotencyKey:
+    """レスポンスを保存（呼び出し元の処理と同じトランザクションでコミットする）"""
+    record = IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        endpoint=endpoint,
+        request_hash=request_hash,
+        status_code=status_code,
+        response_body=response_body,
+        expires_at=expires_at,
+    )
+    db.add(record)
+    await db.flush()
+    return record
+
+
+async def purge_expired_keys(db: AsyncSession) -> int:
+    """期限切れの冪等キーを削除"""
+    result = await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+    )
+    await db.commit()
+    return result.rowcount or 0
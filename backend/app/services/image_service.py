@@ -0,0 +1,128 @@
+"""レシート画像の正規化（プロセスプールで実行）
+
+スマートフォンの撮影画像を EXIF の向きで回転し、長辺を縮小して再圧縮する。
+あわせて審査画面用のサムネイルと、類似画像検索用の知覚ハッシュ（dHash）を作成する。
+Pillow の処理は CPU を使うためイベントループを止めないよう別プロセスで実行する。
+"""
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from app.config import get_settings
+
+settings = get_settings()
+
+THUMBNAIL_DIR = "thumbs"
+
+
+def image_filename(name: str) -> str:
+    """正規化後の画像ファイル名（サムネイルも同名で THUMBNAIL_DIR に置く）"""
+    fmt = settings.RECEIPT_IMAGE_FORMAT
+    return f"{name}.jpg" if fmt == "jpeg" else f"{name}.{fmt}"
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+    return _executor
+
+
+def shutdown_image_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _save(image: Image.Image, path: str, fmt: str, quality: int) -> None:
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"  # 同じ内容を並行して保存する場合に備えて一意にする
+    image.save(tmp_path, format=fmt.upper(), quality=quality, optimize=fmt == "jpeg")
+    os.replace(tmp_path, path)
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    64bit の差分ハッシュ（dHash）。縮小・再圧縮・多少のトリミングでは数ビットしか変わらない。
+    9x8 のグレースケールに縮小し、横に隣り合う画素の大小をビットにする
+    """
+    small = image.convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def image_file_dhash(path: str) -> int:
+    """画像ファイルの dHash（EXIF の向きを補正してから計算。ワーカープロセスで実行）"""
+    with Image.open(path) as original:
+        return dhash(ImageOps.exif_transpose(original))
+
+
+def normalize_image(
+    src_path: str,
+    dest_path: str,
+    thumbnail_path: str,
+    max_side: int,
+    thumbnail_side: int,
+    fmt: str,
+    quality: int,
+) -> int:
+    """
+    EXIF 回転・縮小・再圧縮した画像とサムネイルを書き出す（ワーカープロセスで実行）。
+    戻り値: 書き出した画像の dHash（保存済み画像から求める compute_image_dhash と同じ値になるよう、
+    サムネイルではなく書き出したファイルから計算する）
+    """
+    with Image.open(src_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        _save(image, dest_path, fmt, quality)
+        image.thumbnail((thumbnail_side, thumbnail_side), Image.LANCZOS)
+        _save(image, thumbnail_path, fmt, quality)
+    return image_file_dhash(dest_path)
+
+
+async def normalize_receipt_image(src_path: str, dest_path: str, thumbnail_path: str) -> Optional[int]:
+    """
+    src_path の画像を RECEIPT_IMAGE_FORMAT に変換して dest_path に、サムネイルを thumbnail_path に書き出す。
+    戻り値: dHash。Pillow で開けない形式（HEIC 等）は None
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _get_executor(),
+            normalize_image,
+            src_path,
+            dest_path,
+            thumbnail_path,
+            settings.RECEIPT_IMAGE_MAX_SIDE,
+            settings.RECEIPT_THUMBNAIL_SIDE,
+            settings.RECEIPT_IMAGE_FORMAT,
+            settings.RECEIPT_IMAGE_QUALITY,
+        )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+async def compute_image_dhash(path: str) -> Optional[int]:
+    """保存済み画像の dHash（Pillow で開けない形式は None）"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor(), image_file_dhash, path)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
@@ -0,0 +1,199 @@
+"""ポイント取引の月次パーティション・アーカイブ（PostgreSQL のみ）
+
+SQLite では point_transactions は通常の単一テーブルのままとし、各処理は何もしない。
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+from sqlalchemy import DateTime, Integer, case, cast, column, func, insert, literal, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import is_postgresql
+from app.models.point_transaction import PointTransactionRollup
+
+TABLE = "point_transactions"
+PARTITION_PREFIX = "point_transactions_p"  # point_transactions_p202604 等
+DEFAULT_PARTITION = "point_transactions_default"
+UNPARTITIONED_TABLE = "point_transactions_unpartitioned"
+EXPORT_CHUNK_SIZE = 10000
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(dt: datetime, months: int) -> datetime:
+    index = dt.year * 12 + dt.month - 1 + months
+    return dt.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    """point_transactions がパーティションテーブルか"""
+    if not is_postgresql():
+        return False
+    result = await db.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": TABLE},
+    )
+    return result.scalar_one_or_none() == "p"
+
+
+async def list_partitions(db: AsyncSession) -> List[Tuple[str, datetime]]:
+    """月次パーティション一覧 [(テーブル名, 対象月の1日)]（古い順）"""
+    result = await db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": TABLE},
+    )
+    partitions = []
+    for name in result.scalars().all():
+        if name.startswith(PARTITION_PREFIX):
+            partitions.append((name, datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m")))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+async def _create_partition(db: AsyncSession, month: datetime) -> None:
+    await db.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+        )
+    )
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = 3) -> None:
+    """当月から months_ahead か月先までのパーティションを作成"""
+    month = _month_start(datetime.utcnow())
+    for i in range(months_ahead + 1):
+        await _create_partition(db, _add_months(month, i))
+
+
+async def _convert_to_partitioned(db: AsyncSession, months_ahead: int) -> None:
+    """既存の point_transactions を月次パーティションテーブルに移行"""
+    await db.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+    await db.execute(text(f"UPDATE {TABLE} SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL"))
+    oldest = (await db.execute(text(f"SELECT min(created_at) FROM {TABLE}"))).scalar_one_or_none()
+
+    await db.execute(text(f"ALTER TABLE {TABLE} RENAME TO {UNPARTITIONED_TABLE}"))
+    sequence = (
+        await db.execute(text(f"SELECT pg_get_serial_sequence('{UNPARTITIONED_TABLE}', 'id')"))
+    ).scalar_one()
+    await db.execute(
+        text(
+            f"CREATE TABLE {TABLE} (LIKE {UNPARTITIONED_TABLE} INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+    )
+    await db.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN created_at SET NOT NULL"))
+    # 旧テーブル削除で採番シーケンスが消えないよう所有者を移す
+    await db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+
+    month = _month_start(oldest or datetime.utcnow())
+    last = _add_months(_month_start(datetime.utcnow()), months_ahead)
+    while month <= last:
+        await _create_partition(db, month)
+        month = _add_months(month, 1)
+    await db.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+    await db.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {UNPARTITIONED_TABLE}"))
+    await db.execute(text(f"DROP TABLE {UNPARTITIONED_TABLE}"))
+    # パーティションテーブルの主キーにはパーティションキーを含める必要がある
+    await db.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)"))
+    await db.execute(text(f"ALTER TABLE {TABLE} ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+    await db.execute(
+        text(f"CREATE INDEX ix_point_transactions_user_created ON {TABLE} (user_id, created_at, id)")
+    )
+
+
+async def partition_point_transactions(db: AsyncSession, months_ahead: int = 3) -> bool:
+    """
+    point_transactions を月次パーティション化し、先の月のパーティションを作成（毎月実行）。
+    戻り値: PostgreSQL 以外で何もしなかった場合 False
+    """
+    if not is_postgresql():
+        return False
+    if await is_partitioned(db):
+        await ensure_partitions(db, months_ahead)
+    else:
+        await _convert_to_partitioned(db, months_ahead)
+    await db.commit()
+    return True
+
+
+async def _export_partition(db: AsyncSession, name: str, path: Path) -> int:
+    """パーティションの全行を gzip 圧縮した NDJSON に書き出す"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    last_id = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        while True:
+            result = await db.execute(
+                text(f"SELECT * FROM {name} WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": EXPORT_CHUNK_SIZE},
+            )
+            rows = result.mappings().all()
+            if not rows:
+                break
+            for row in rows:
+                f.write(json.dumps(dict(row), ensure_ascii=False, default=str))
+                f.write("\n")
+            count += len(rows)
+            last_id = rows[-1]["id"]
+    os.replace(tmp_path, path)
+    return count
+
+
+async def archive_partitions(
+    db: AsyncSession,
+    older_than_months: int,
+    archive_dir: str,
+) -> List[Tuple[str, int, str]]:
+    """
+    older_than_months か月より前の月次パーティションを圧縮ファイルに書き出して切り離す。
+    削除する取引はユーザー・月ごとに point_transaction_rollups へ集計し、
+    残高・分析の集計結果が変わらないようにする。
+    戻り値: [(パーティション名, 行数, アーカイブファイルのパス)]
+    """
+    if not await is_partitioned(db):
+        return []
+    cutoff = _add_months(_month_start(datetime.utcnow()), -older_than_months)
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+
+    archived = []
+    for name, month in await list_partitions(db):
+        if _add_months(month, 1) > cutoff:
+            break
+        # 日時は型付きのバインド、合計は列の型（integer）にそろえる
+        partition = table(name, column("user_id"), column("amount"))
+        amount = partition.c.amount
+        rollup = select(
+            partition.c.user_id,
+            literal(month, DateTime),
+            cast(func.sum(amount), Integer),
+            cast(func.sum(case((amount > 0, amount), else_=0)), Integer),
+            func.count(),
+            literal(datetime.utcnow(), DateTime),
+        ).group_by(partition.c.user_id)
+        await db.execute(
+            insert(PointTransactionRollup).from_select(
+                ["user_id", "period_start", "amount_total", "granted_total", "transaction_count", "archived_at"],
+                rollup,
+            )
+        )
+        path = Path(archive_dir) / f"{name}.ndjson.gz"
+        count = await _export_partition(db, name, path)
+        await db.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+        archived.append((name, count, str(path)))
+    return archived
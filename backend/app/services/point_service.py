@@ -1,11 +1,16 @@
 """ポイント・交換サービス"""
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, update, bindparam, exists, literal, or_, DateTime
 
-from app.models.point_transaction import PointTransaction
+from app.config import get_settings
+from app.database import dialect_insert, is_postgresql
+from app.core.pagination import keyset_before
+from app.models.user import User
+from app.models.point_transaction import PointTransaction, PointTransactionRollup
+from app.models.point_balance import UserPointBalance, PointBalanceCheckpoint
 from app.models.exchange import Exchange, ExchangeStatus
 
 EXCHANGE_OPTIONS = [
@@ -15,14 +20,332 @@ EXCHANGE_OPTIONS = [
 ]
 
 
+REBUILD_CHUNK_SIZE = 1000
+CHECKPOINT_CHUNK_SIZE = 1000
+
+
+def _ledger_sum(user_id):
+    """台帳上の残高を求める式（point_transactions + アーカイブ済み月次集計）"""
+    live = (
+        select(func.coalesce(func.sum(PointTransaction.amount), 0))
+        .where(PointTransaction.user_id == user_id)
+        .scalar_subquery()
+    )
+    archived = (
+        select(func.coalesce(func.sum(PointTransactionRollup.amount_total), 0))
+        .where(PointTransactionRollup.user_id == user_id)
+        .scalar_subquery()
+    )
+    return live + archived
+
+
+async def get_ledger_balance(db: AsyncSession, user_id: int) -> int:
+    """台帳を全件集計したポイント残高"""
+    result = await db.execute(select(_ledger_sum(user_id)))
+    return int(result.scalar_one() or 0)
+
+
+async def get_checkpoint_balance(db: AsyncSession, user_id: int) -> int:
+    """最新チェックポイント + それ以降の取引から求めたポイント残高"""
+    result = await db.execute(
+        select(PointBalanceCheckpoint.as_of, PointBalanceCheckpoint.balance)
+        .where(PointBalanceCheckpoint.user_id == user_id)
+        .order_by(PointBalanceCheckpoint.as_of.desc())
+        .limit(1)
+    )
+    checkpoint = result.first()
+    if checkpoint is None:
+        return await get_ledger_balance(db, user_id)
+    live = (
+        select(func.coalesce(func.sum(PointTransaction.amount), 0))
+        .where(
+            PointTransaction.user_id == user_id,
+            PointTransaction.created_at >= checkpoint.as_of,
+        )
+        .scalar_subquery()
+    )
+    archived = (
+        select(func.coalesce(func.sum(PointTransactionRollup.amount_total), 0))
+        .where(
+            PointTransactionRollup.user_id == user_id,
+            PointTransactionRollup.period_start >= checkpoint.as_of,
+        )
+        .scalar_subquery()
+    )
+    result = await db.execute(select(live + archived))
+    return int(checkpoint.balance) + int(result.scalar_one() or 0)
+
+
 async def get_balance(db: AsyncSession, user_id: int) -> int:
     """ポイント残高"""
+    if get_settings().POINT_BALANCE_SOURCE == "checkpoint":
+        return await get_checkpoint_balance(db, user_id)
     result = await db.execute(
-        select(func.coalesce(func.sum(PointTransaction.amount), 0)).where(
-            PointTransaction.user_id == user_id
+        select(UserPointBalance.balance).where(UserPointBalance.user_id == user_id)
+    )
+    balance = result.scalar_one_or_none()
+    if balance is None:
+        # 集計行がまだ無いユーザー（rebuild-balances 実行前のデータ）は台帳から集計
+        return await get_ledger_balance(db, user_id)
+    return int(balance)
+
+
+async def ensure_balance_rows(db: AsyncSession, user_ids: Iterable[int]) -> int:
+    """
+    集計行が無いユーザーについて、台帳から残高を計算して作成。
+    戻り値: 作成した行数
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    rows = select(User.id, _ledger_sum(User.id), literal(datetime.utcnow(), DateTime)).where(
+        User.id.in_(user_ids),
+        ~exists().where(UserPointBalance.user_id == User.id),
+    )
+    stmt = (
+        dialect_insert(UserPointBalance)
+        .from_select(["user_id", "balance", "updated_at"], rows)
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    result = await db.execute(stmt)
+    return result.rowcount or 0
+
+
+async def apply_balance_delta(db: AsyncSession, user_id: int, delta: int) -> None:
+    """
+    集計済み残高に増減を反映。
+    PointTransaction を flush した後、同じトランザクション内で呼ぶこと。
+    """
+    stmt = (
+        update(UserPointBalance)
+        .where(UserPointBalance.user_id == user_id)
+        .values(balance=UserPointBalance.balance + delta, updated_at=datetime.utcnow())
+    )
+    result = await db.execute(stmt)
+    if result.rowcount:
+        return
+    # 集計行が無ければ台帳（flush 済みの今回分を含む）から作成。
+    # 並行リクエストが先に作成していた場合は改めて加算する
+    if not await ensure_balance_rows(db, [user_id]):
+        await db.execute(stmt)
+
+
+async def lock_user_balance(db: AsyncSession, user_id: int) -> None:
+    """
+    ユーザーの残高行をロックする（トランザクション終了まで保持）。
+    同一ユーザーの「残高確認 → 消費」を直列化し、他ユーザーの処理はブロックしない。
+    """
+    if is_postgresql():
+        stmt = (
+            select(UserPointBalance.user_id)
+            .where(UserPointBalance.user_id == user_id)
+            .with_for_update()
+        )
+    else:
+        # SQLite には行ロックが無いため、更新で書き込みロックを先に取得する
+        stmt = (
+            update(UserPointBalance)
+            .where(UserPointBalance.user_id == user_id)
+            .values(updated_at=datetime.utcnow())
         )
+
+    for _ in range(2):
+        result = await db.execute(stmt)
+        locked = result.first() is not None if is_postgresql() else bool(result.rowcount)
+        if locked:
+            return
+        # 集計行が無ければ作成してからロックし直す
+        await ensure_balance_rows(db, [user_id])
+
+
+async def add_point_transaction(
+    db: AsyncSession,
+    user_id: int,
+    amount: int,
+    type: str,
+    description: Optional[str] = None,
+    reference_id: Optional[int] = None,
+) -> PointTransaction:
+    """ポイント取引を記録し、集計済み残高を更新"""
+    tx = PointTransaction(
+        user_id=user_id,
+        amount=amount,
+        type=type,
+        description=description,
+        reference_id=reference_id,
     )
-    return int(result.scalar_one() or 0)
+    db.add(tx)
+    await db.flush()
+    await apply_balance_delta(db, user_id, amount)
+    return tx
+
+
+async def add_point_transactions(db: AsyncSession, rows: List[dict]) -> None:
+    """
+    ポイント取引をまとめて記録し、集計済み残高を更新（一括処理用。複数行 INSERT + ユーザーごとの UPDATE）。
+    rows: user_id・amount・type・description・reference_id（任意）の dict
+    """
+    if not rows:
+        return
+    # 集計行が無いユーザーは今回の取引を含めない台帳の合計で先に作成しておく
+    await ensure_balance_rows(db, {row["user_id"] for row in rows})
+    now = datetime.utcnow()
+    await db.execute(
+        insert(PointTransaction.__table__),
+        [
+            {
+                "user_id": row["user_id"],
+                "amount": row["amount"],
+                "type": row["type"],
+                "description": row.get("description"),
+                "reference_id": row.get("reference_id"),
+                "created_at": now,
+            }
+            for row in rows
+        ],
+    )
+    deltas: Dict[int, int] = {}
+    for row in rows:
+        deltas[row["user_id"]] = deltas.get(row["user_id"], 0) + row["amount"]
+    balances = UserPointBalance.__table__
+    await db.execute(
+        update(balances)
+        .where(balances.c.user_id == bindparam("uid"))
+        .values(balance=balances.c.balance + bindparam("delta"), updated_at=now),
+        [{"uid": user_id, "delta": delta} for user_id, delta in deltas.items()],
+    )
+
+
+async def rebuild_balances(db: AsyncSession, chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """
+    全ユーザーの集計済み残高を台帳から再計算（チャンクごとにコミット）。
+    戻り値: 処理したユーザー数
+    """
+    total = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        )
+        user_ids = list(result.scalars().all())
+        if not user_ids:
+            break
+        rows = select(User.id, _ledger_sum(User.id), literal(datetime.utcnow(), DateTime)).where(
+            User.id.in_(user_ids)
+        )
+        stmt = dialect_insert(UserPointBalance).from_select(
+            ["user_id", "balance", "updated_at"], rows
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"balance": stmt.excluded.balance, "updated_at": stmt.excluded.updated_at},
+        )
+        await db.execute(stmt)
+        await db.commit()
+        total += len(user_ids)
+        last_id = user_ids[-1]
+    return total
+
+
+def default_checkpoint_as_of(now: Optional[datetime] = None) -> datetime:
+    """既定のチェックポイント時刻（当月1日 0時 UTC）"""
+    now = now or datetime.utcnow()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+async def _create_checkpoint_chunk(db: AsyncSession, user_ids: List[int], as_of: datetime) -> int:
+    """指定ユーザーのチェックポイントを前回チェックポイントからの差分で作成"""
+    latest = (
+        select(
+            PointBalanceCheckpoint.user_id,
+            func.max(PointBalanceCheckpoint.as_of).label("as_of"),
+        )
+        .where(
+            PointBalanceCheckpoint.user_id.in_(user_ids),
+            PointBalanceCheckpoint.as_of < as_of,
+        )
+        .group_by(PointBalanceCheckpoint.user_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(PointBalanceCheckpoint.user_id, PointBalanceCheckpoint.balance).join(
+            latest,
+            (PointBalanceCheckpoint.user_id == latest.c.user_id)
+            & (PointBalanceCheckpoint.as_of == latest.c.as_of),
+        )
+    )
+    balances: Dict[int, int] = {row.user_id: int(row.balance) for row in result}
+
+    # 前回チェックポイント以降、as_of より前の取引を集計
+    result = await db.execute(
+        select(PointTransaction.user_id, func.sum(PointTransaction.amount))
+        .outerjoin(latest, latest.c.user_id == PointTransaction.user_id)
+        .where(
+            PointTransaction.user_id.in_(user_ids),
+            PointTransaction.created_at < as_of,
+            or_(latest.c.as_of.is_(None), PointTransaction.created_at >= latest.c.as_of),
+        )
+        .group_by(PointTransaction.user_id)
+    )
+    for user_id, delta in result.all():
+        balances[user_id] = balances.get(user_id, 0) + int(delta or 0)
+
+    # 同じ期間のうちアーカイブ済みの月次集計
+    result = await db.execute(
+        select(PointTransactionRollup.user_id, func.sum(PointTransactionRollup.amount_total))
+        .outerjoin(latest, latest.c.user_id == PointTransactionRollup.user_id)
+        .where(
+            PointTransactionRollup.user_id.in_(user_ids),
+            PointTransactionRollup.period_start < as_of,
+            or_(latest.c.as_of.is_(None), PointTransactionRollup.period_start >= latest.c.as_of),
+        )
+        .group_by(PointTransactionRollup.user_id)
+    )
+    for user_id, delta in result.all():
+        balances[user_id] = balances.get(user_id, 0) + int(delta or 0)
+
+    if not balances:
+        return 0
+    now = datetime.utcnow()
+    stmt = (
+        dialect_insert(PointBalanceCheckpoint)
+        .values([
+            {"user_id": user_id, "as_of": as_of, "balance": balance, "created_at": now}
+            for user_id, balance in balances.items()
+        ])
+        .on_conflict_do_nothing(index_elements=["user_id", "as_of"])
+    )
+    result = await db.execute(stmt)
+    return result.rowcount or 0
+
+
+async def create_checkpoints(
+    db: AsyncSession,
+    as_of: Optional[datetime] = None,
+    chunk_size: int = CHECKPOINT_CHUNK_SIZE,
+) -> int:
+    """
+    全ユーザーの残高チェックポイントを作成（チャンクごとにコミット）。
+    as_of には書き込み中の取引が残らない過去の月初（既定: 当月1日）を指定する（月の途中は ValueError）。
+    戻り値: 作成したチェックポイント数
+    """
+    as_of = as_of or default_checkpoint_as_of()
+    if as_of != default_checkpoint_as_of(as_of):
+        # アーカイブ済みの取引は月単位の集計しか残らないため、月の途中で区切ると残高が合わなくなる
+        raise ValueError("チェックポイントの時刻は月初（1日 0時 UTC）を指定してください")
+    total = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        )
+        user_ids = list(result.scalars().all())
+        if not user_ids:
+            break
+        total += await _create_checkpoint_chunk(db, user_ids, as_of)
+        await db.commit()
+        last_id = user_ids[-1]
+    return total
 
 
 async def get_point_history(
@@ -30,15 +353,20 @@ async def get_point_history(
     user_id: int,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[tuple[datetime, int]] = None,
 ) -> List[PointTransaction]:
-    """ポイント履歴"""
-    result = await db.execute(
+    """ポイント履歴（cursor 指定時は skip を使わずその位置から取得）"""
+    q = (
         select(PointTransaction)
         .where(PointTransaction.user_id == user_id)
-        .order_by(PointTransaction.created_at.desc())
-        .offset(skip)
+        .order_by(PointTransaction.created_at.desc(), PointTransaction.id.desc())
         .limit(limit)
     )
+    if cursor:
+        q = q.where(keyset_before(PointTransaction.created_at, PointTransaction.id, cursor))
+    else:
+        q = q.offset(skip)
+    result = await db.execute(q)
     return list(result.scalars().all())
 
 
@@ -53,6 +381,8 @@ async def create_exchange(
     ポイント交換申請。
     戻り値: (Exchange, error_message)
     """
+    # 同一ユーザーの並行申請で残高チェックをすり抜けないようにロックしてから確認
+    await lock_user_balance(db, user_id)
     balance = await get_balance(db, user_id)
     if amount > balance:
         return None, "残高が不足しています"
@@ -74,15 +404,14 @@ async def create_exchange(
     await db.flush()
 
     # ポイント控除
-    tx = PointTransaction(
-        user_id=user_id,
-        amount=-amount,
-        type="exchange",
+    await add_point_transaction(
+        db,
+        user_id,
+        -amount,
+        "exchange",
         description=f"交換申請: {destination}",
         reference_id=exchange.id,
     )
-    db.add(tx)
-    await db.flush()
     await db.refresh(exchange)
     return exchange, None
 
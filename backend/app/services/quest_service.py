@@ -0,0 +1,107 @@
+"""クエスト（特定商品の購入でポイント付与）の進捗
+
+レシートが審査待ちから承認されたときに、そのレシートの商品明細（receipt_items）だけを
+有効なクエストのキーワードのオートマトン（campaign_service.get_keyword_matcher）で照合し、
+ユーザーごとの進捗（quest_progress）に購入数を加算する（過去のレシートは読み直さない）。
+購入数が必要数に達したら completed_at を条件付きで更新し、更新できた行にだけポイントを付与する（1回のみ）。
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.models.campaign import Campaign, CampaignType, QuestProgress
+from app.models.receipt import ReceiptLineItem
+from app.services.campaign_service import get_keyword_matcher, list_campaigns
+from app.services.point_service import add_point_transactions
+
+
+async def apply_approved_receipts(db: AsyncSession, receipt_ids: Iterable[int]) -> int:
+    """
+    承認したレシートの購入数をクエストの進捗に加算し、達成したクエストのポイントを付与する。
+    審査待ちから承認したレシートについて1回だけ呼ぶこと（レシートの審査処理から呼ぶ）。
+    戻り値: 達成したクエスト数
+    """
+    receipt_ids = list(receipt_ids)
+    if not receipt_ids:
+        return 0
+    matcher, campaign_ids = await get_keyword_matcher(db, CampaignType.QUEST)
+    if not campaign_ids:
+        return 0
+    result = await db.execute(
+        select(ReceiptLineItem.user_id, ReceiptLineItem.normalized_name, ReceiptLineItem.quantity).where(
+            ReceiptLineItem.receipt_id.in_(receipt_ids)
+        )
+    )
+    deltas: Counter = Counter()
+    for user_id, normalized_name, quantity in result.all():
+        for campaign_id in matcher.find(normalized_name):
+            deltas[(campaign_id, user_id)] += max(quantity, 1)
+    if not deltas:
+        return 0
+
+    # 進捗の加算（達成済みの行は更新しない）。同時に承認しても行ロックで直列に加算される
+    now = datetime.utcnow()
+    stmt = dialect_insert(QuestProgress).values([
+        {"campaign_id": campaign_id, "user_id": user_id, "quantity": quantity, "created_at": now, "updated_at": now}
+        for (campaign_id, user_id), quantity in sorted(deltas.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["campaign_id", "user_id"],
+        set_={"quantity": QuestProgress.quantity + stmt.excluded.quantity, "updated_at": now},
+        where=QuestProgress.completed_at.is_(None),
+    ).returning(QuestProgress.id, QuestProgress.campaign_id, QuestProgress.quantity)
+    progress = (await db.execute(stmt)).all()
+
+    result = await db.execute(
+        select(Campaign.id, Campaign.title, Campaign.points, Campaign.required_quantity).where(
+            Campaign.id.in_({campaign_id for _, campaign_id, _ in progress})
+        )
+    )
+    campaigns = {row.id: row for row in result.all()}
+    reached = [
+        progress_id
+        for progress_id, campaign_id, quantity in progress
+        if quantity >= (campaigns[campaign_id].required_quantity or 1)
+    ]
+    if not reached:
+        return 0
+    # 未達成の行だけを達成にする（RETURNING で返った行にだけ付与するため、付与は1回のみ）
+    result = await db.execute(
+        update(QuestProgress)
+        .where(QuestProgress.id.in_(reached), QuestProgress.completed_at.is_(None))
+        .values(completed_at=now)
+        .returning(QuestProgress.id, QuestProgress.campaign_id, QuestProgress.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    completed = result.all()
+    await add_point_transactions(db, [
+        {
+            "user_id": user_id,
+            "amount": campaigns[campaign_id].points,
+            "type": "quest",
+            "description": f"クエスト達成「{campaigns[campaign_id].title}」",
+            "reference_id": progress_id,
+        }
+        for progress_id, campaign_id, user_id in completed
+        if campaigns[campaign_id].points and campaigns[campaign_id].points > 0
+    ])
+    return len(completed)
+
+
+async def list_user_quests(db: AsyncSession, user_id: int) -> List[Tuple[Campaign, int, Optional[datetime]]]:
+    """有効なクエストと、ユーザーの進捗（購入数・達成日時）"""
+    campaigns = await list_campaigns(db, active_only=True, campaign_type=CampaignType.QUEST)
+    if not campaigns:
+        return []
+    result = await db.execute(
+        select(QuestProgress.campaign_id, QuestProgress.quantity, QuestProgress.completed_at).where(
+            QuestProgress.user_id == user_id,
+            QuestProgress.campaign_id.in_([c.id for c in campaigns]),
+        )
+    )
+    progress = {campaign_id: (quantity, completed_at) for campaign_id, quantity, completed_at in result.all()}
+    return [(c, *progress.get(c.id, (0, None))) for c in campaigns]
@@ -0,0 +1,240 @@
+"""審査待ちレシートの自動審査（ルールに合うものを一括で承認・却下する）
+
+ルールは JSON（RECEIPT_AUTO_REVIEW_RULES_FILE）で宣言し、compile_rules で一度だけ検証・変換する。
+審査待ちのレシートをチャンクごとに取得し、ユーザーの審査履歴・当日の承認件数は
+チャンク内のユーザーをまとめた集計クエリ（各1回）で求めてから、1件ずつメモリ上で判定する。
+承認・却下は bulk_review_receipts と同じ経路で行い、ポイントは審査待ちからの承認時のみ付与する。
+ルールで判断できないレシートは審査待ちのまま残し、管理者が審査する。
+"""
+import json
+from collections import Counter
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.receipt import Receipt, ReceiptStatus
+from app.services.receipt_item_service import normalize_item_name
+from app.services.receipt_service import ReviewRow, bulk_review_receipts
+
+AUTO_REVIEW_BATCH_SIZE = 2000
+
+# 審査待ちのまま残す理由
+HOLD_STORE = "store"  # 許可リストにない店舗
+HOLD_AMOUNT = "amount"  # 金額が範囲外
+HOLD_NEAR_DUPLICATE = "near_duplicate"  # 見た目が近い画像のレシートがある
+HOLD_TRUST = "trust"  # ユーザーの信頼スコアが足りない
+HOLD_DAILY_LIMIT = "daily_limit"  # 当日の承認件数の上限
+
+
+@dataclass(frozen=True)
+class AutoReviewRules:
+    """
+    自動審査のルール（compile_rules で作る）。
+    信頼スコア = 承認済みレシート数 - 却下されたレシート数 × rejection_weight
+    """
+    store_allowlist: Optional[Tuple[str, ...]] = None  # 正規化済みの店舗名（前方一致）。None なら店舗を問わない
+    min_amount: int = 1
+    max_amount: Optional[int] = None
+    reject_duplicates: bool = True  # 同じ画像のレシートが登録済みなら却下
+    hold_near_duplicates: bool = True  # 見た目が近い画像のレシートがあれば管理者の審査に回す
+    min_user_trust: Optional[int] = None
+    rejection_weight: int = 3
+    max_daily_approvals: Optional[int] = None  # ユーザーごと・登録日（UTC）ごとの承認件数の上限
+    points: int = 0  # 承認時の付与ポイント（固定分）
+    points_rate_percent: float = 0.0  # 承認時の付与ポイント（金額に対する割合。端数切り捨て）
+
+    def points_for(self, amount: int) -> int:
+        return self.points + int(amount * self.points_rate_percent / 100)
+
+
+def compile_rules(config: dict) -> AutoReviewRules:
+    """JSON のルールを検証して AutoReviewRules にする（不正な内容は ValueError）"""
+    if not isinstance(config, dict):
+        raise ValueError("ルールは JSON オブジェクトで指定してください")
+    names = {f.name for f in fields(AutoReviewRules)}
+    unknown = set(config) - names
+    if unknown:
+        raise ValueError(f"不明なルールです: {', '.join(sorted(unknown))}")
+    values = dict(config)
+    if values.get("store_allowlist") is not None:
+        stores = values["store_allowlist"]
+        if not isinstance(stores, list) or not all(isinstance(s, str) for s in stores):
+            raise ValueError("store_allowlist は店舗名の配列で指定してください")
+        values["store_allowlist"] = tuple(sorted({normalize_item_name(s) for s in stores} - {""}))
+    for name in ("min_amount", "max_amount", "min_user_trust", "rejection_weight", "max_daily_approvals", "points"):
+        value = values.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            raise ValueError(f"{name} は整数で指定してください")
+    for name in ("reject_duplicates", "hold_near_duplicates"):
+        if name in values and not isinstance(values[name], bool):
+            raise ValueError(f"{name} は true / false で指定してください")
+    rate = values.get("points_rate_percent", 0.0)
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate < 0:
+        raise ValueError("points_rate_percent は 0 以上の数値で指定してください")
+    rules = AutoReviewRules(**values)
+    if rules.points_for(0) < 0:
+        raise ValueError("points は 0 以上で指定してください")
+    return rules
+
+
+def load_rules(path: str) -> AutoReviewRules:
+    """ルールファイル（JSON）を読み込む"""
+    with open(path, encoding="utf-8") as f:
+        return compile_rules(json.load(f))
+
+
+def _day_key(value) -> str:
+    """登録日（SQLite の date() は文字列、PostgreSQL は date 型を返すため文字列にそろえる）"""
+    return value.isoformat()[:10] if hasattr(value, "isoformat") else str(value)[:10]
+
+
+async def _user_trust_scores(db: AsyncSession, user_ids: List[int], rules: AutoReviewRules) -> Dict[int, int]:
+    """ユーザーごとの信頼スコア（集計クエリ1回）"""
+    result = await db.execute(
+        select(
+            Receipt.user_id,
+            func.sum(case((Receipt.status == ReceiptStatus.APPROVED.value, 1), else_=0)),
+            func.sum(case((Receipt.status == ReceiptStatus.REJECTED.value, 1), else_=0)),
+        )
+        .where(Receipt.user_id.in_(user_ids))
+        .group_by(Receipt.user_id)
+    )
+    return {
+        user_id: int(approved or 0) - int(rejected or 0) * rules.rejection_weight
+        for user_id, approved, rejected in result.all()
+    }
+
+
+async def _daily_approvals(db: AsyncSession, user_ids: List[int], since: datetime) -> Counter:
+    """(ユーザーID, 登録日) ごとの承認済みレシート数（集計クエリ1回）"""
+    day = func.date(Receipt.created_at)
+    result = await db.execute(
+        select(Receipt.user_id, day, func.count())
+        .where(
+            Receipt.user_id.in_(user_ids),
+            Receipt.status == ReceiptStatus.APPROVED.value,
+            Receipt.created_at >= since,
+        )
+        .group_by(Receipt.user_id, day)
+    )
+    return Counter({(user_id, _day_key(d)): count for user_id, d, count in result.all()})
+
+
+def _decide(rules: AutoReviewRules, receipt, trust: int, approved_today: int) -> Tuple[Optional[str], str]:
+    """1件の判定。戻り値: (status。None は審査待ちのまま, 却下理由 / 保留理由)"""
+    if receipt.duplicate_of_id is not None and rules.reject_duplicates:
+        return ReceiptStatus.REJECTED.value, f"同じ画像のレシートが登録済みです（#{receipt.duplicate_of_id}）"
+    if receipt.near_duplicate_of_id is not None and rules.hold_near_duplicates:
+        return None, HOLD_NEAR_DUPLICATE
+    if rules.store_allowlist is not None and not normalize_item_name(receipt.store_name or "").startswith(
+        rules.store_allowlist
+    ):
+        return None, HOLD_STORE
+    if receipt.amount < rules.min_amount or (rules.max_amount is not None and receipt.amount > rules.max_amount):
+        return None, HOLD_AMOUNT
+    if rules.min_user_trust is not None and trust < rules.min_user_trust:
+        return None, HOLD_TRUST
+    if rules.max_daily_approvals is not None and approved_today >= rules.max_daily_approvals:
+        return None, HOLD_DAILY_LIMIT
+    return ReceiptStatus.APPROVED.value, ""
+
+
+async def auto_review_receipts(
+    db: AsyncSession,
+    rules: AutoReviewRules,
+    batch_size: int = AUTO_REVIEW_BATCH_SIZE,
+    dry_run: bool = False,
+) -> dict:
+    """
+    処理済み（processed_at あり）の審査待ちレシートをルールで自動審査する（チャンクごとにコミット）。
+    管理者が担当中のレシートは除く。PostgreSQL では取得した行をロックし、同時に審査中の行は飛ばす。
+    承認・却下の件数は実際に審査した件数で、判定後に審査済みになっていたレシートは errors に含める。
+    dry_run: 判定だけ行い、審査はしない
+    """
+    now = datetime.utcnow()
+    approved = 0
+    rejected = 0
+    awarded_points = 0
+    held: Counter = Counter()
+    errors: List[dict] = []
+    scanned = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(
+                Receipt.id,
+                Receipt.user_id,
+                Receipt.store_name,
+                Receipt.amount,
+                Receipt.duplicate_of_id,
+                Receipt.near_duplicate_of_id,
+                Receipt.created_at,
+            )
+            .where(
+                Receipt.id > last_id,
+                Receipt.status == ReceiptStatus.PENDING.value,
+                Receipt.processed_at.is_not(None),
+                or_(Receipt.review_claimed_until.is_(None), Receipt.review_claimed_until < now),
+            )
+            .order_by(Receipt.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        receipts = result.all()
+        if not receipts:
+            break
+        last_id = receipts[-1].id
+        scanned += len(receipts)
+
+        user_ids = list({r.user_id for r in receipts})
+        trust = await _user_trust_scores(db, user_ids, rules) if rules.min_user_trust is not None else {}
+        daily: Counter = Counter()
+        if rules.max_daily_approvals is not None:
+            since = min(r.created_at for r in receipts).replace(hour=0, minute=0, second=0, microsecond=0)
+            daily = await _daily_approvals(db, user_ids, since)
+
+        rows: List[ReviewRow] = []
+        chunk_points = 0
+        for receipt in receipts:
+            day = (receipt.user_id, _day_key(receipt.created_at))
+            status, reason = _decide(rules, receipt, trust.get(receipt.user_id, 0), daily[day])
+            if status is None:
+                held[reason] += 1
+            elif status == ReceiptStatus.APPROVED.value:
+                daily[day] += 1
+                points = rules.points_for(receipt.amount)
+                rows.append((len(rows), receipt.id, status, points, None))
+                chunk_points += points
+            else:
+                rows.append((len(rows), receipt.id, status, None, reason))
+        if dry_run or not rows:
+            await db.rollback()
+            approved += sum(1 for _, _, status, _, _ in rows if status == ReceiptStatus.APPROVED.value)
+            rejected += sum(1 for _, _, status, _, _ in rows if status == ReceiptStatus.REJECTED.value)
+            awarded_points += chunk_points
+            continue
+        # 1チャンクとして審査・コミットし、取得時のロックを解放する（判定後に審査済みになった行は更新しない）
+        reviewed = await bulk_review_receipts(db, rows, chunk_size=len(rows), pending_only=True)
+        failed = {e["receipt_id"] for e in reviewed["errors"]}
+        for _, receipt_id, status, _, _ in rows:
+            if receipt_id in failed:
+                continue
+            if status == ReceiptStatus.APPROVED.value:
+                approved += 1
+            else:
+                rejected += 1
+        errors.extend({"receipt_id": e["receipt_id"], "detail": e["detail"]} for e in reviewed["errors"])
+        awarded_points += reviewed["awarded_points"]
+    return {
+        "scanned": scanned,
+        "approved": approved,
+        "rejected": rejected,
+        "held": sum(held.values()),
+        "held_reasons": dict(held),
+        "awarded_points": awarded_points,
+        "error_count": len(errors),
+        "errors": errors,
+    }
@@ -0,0 +1,128 @@
+"""レシートの商品明細（receipt_items）
+
+登録時に receipts.items（JSON）と同じ内容を receipt_items に1商品1行で保存し、
+正規化した商品名のインデックスで「ある商品を買ったユーザー」を引けるようにする。
+導入前のレシートは backfill_receipt_items（manage backfill-receipt-items）で移行する。
+"""
+import json
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+from sqlalchemy import exists, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.receipt import Receipt, ReceiptLineItem, ReceiptStatus
+
+ITEM_NAME_MAX_LENGTH = 200
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_item_name(name: str) -> str:
+    """商品名の表記ゆれを吸収（全角/半角・大文字/小文字・連続する空白）"""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", name).casefold()).strip()[:ITEM_NAME_MAX_LENGTH]
+
+
+def _item_rows(receipt_id: int, user_id: int, items: Iterable[dict]) -> List[dict]:
+    rows = []
+    for item in items:
+        name = str(item.get("name") or "").strip()[:ITEM_NAME_MAX_LENGTH]
+        if not name:
+            continue
+        rows.append({
+            "receipt_id": receipt_id,
+            "user_id": user_id,
+            "name": name,
+            "normalized_name": normalize_item_name(name),
+            "price": int(item.get("price") or 0),
+            "quantity": int(item.get("quantity") or 1),
+        })
+    return rows
+
+
+async def add_receipt_items(db: AsyncSession, receipt_id: int, user_id: int, items: Iterable[dict]) -> int:
+    """商品明細を保存（複数行 INSERT）。戻り値: 保存した行数"""
+    rows = _item_rows(receipt_id, user_id, items)
+    if rows:
+        await db.execute(insert(ReceiptLineItem), rows)
+    return len(rows)
+
+
+async def backfill_receipt_items(db: AsyncSession, batch_size: int = 1000) -> dict:
+    """
+    receipts.items の JSON を receipt_items に移行（明細が未作成のレシートのみ。チャンクごとにコミット）。
+    JSON として読めないレシートは数えて飛ばす
+    """
+    migrated = 0
+    item_count = 0
+    invalid = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Receipt.id, Receipt.user_id, Receipt.items)
+            .where(
+                Receipt.id > last_id,
+                Receipt.items.is_not(None),
+                ~exists().where(ReceiptLineItem.receipt_id == Receipt.id),
+            )
+            .order_by(Receipt.id)
+            .limit(batch_size)
+        )
+        receipts = result.all()
+        if not receipts:
+            break
+        rows = []
+        for receipt_id, user_id, items in receipts:
+            last_id = receipt_id
+            try:
+                parsed = json.loads(items)
+                if not isinstance(parsed, list):
+                    raise ValueError("商品リストではありません")
+                receipt_rows = _item_rows(receipt_id, user_id, (i for i in parsed if isinstance(i, dict)))
+            except (TypeError, ValueError):
+                invalid += 1
+                continue
+            rows.extend(receipt_rows)
+            migrated += 1
+        if rows:
+            await db.execute(insert(ReceiptLineItem), rows)
+        item_count += len(rows)
+        await db.commit()
+    return {"receipts": migrated, "items": item_count, "invalid": invalid}
+
+
+async def find_item_buyers(
+    db: AsyncSession,
+    name: str,
+    approved_only: bool = False,
+    after_user_id: Optional[int] = None,
+    limit: int = 100,
+) -> List[dict]:
+    """
+    商品名（正規化して完全一致）を購入したユーザーをユーザーID順に返す。
+    approved_only: 承認済みのレシートのみ（receipts と結合する）
+    after_user_id: 前ページの最後のユーザーID（続きから取得）
+    """
+    q = (
+        select(
+            ReceiptLineItem.user_id,
+            func.count().label("purchase_count"),
+            func.sum(ReceiptLineItem.quantity).label("quantity"),
+        )
+        .where(ReceiptLineItem.normalized_name == normalize_item_name(name))
+        .group_by(ReceiptLineItem.user_id)
+        .order_by(ReceiptLineItem.user_id)
+        .limit(limit)
+    )
+    if approved_only:
+        q = q.join(Receipt, Receipt.id == ReceiptLineItem.receipt_id).where(
+            Receipt.status == ReceiptStatus.APPROVED.value
+        )
+    if after_user_id is not None:
+        q = q.where(ReceiptLineItem.user_id > after_user_id)
+    result = await db.execute(q)
+    return [
+        {"user_id": user_id, "purchase_count": count, "quantity": int(quantity or 0)}
+        for user_id, count, quantity in result.all()
+    ]
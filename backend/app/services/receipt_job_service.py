@@ -0,0 +1,201 @@
+"""レシート処理ジョブ（アップロード後の処理をバックグラウンドで実行）
+
+レシート登録と同じトランザクションで receipt_jobs にジョブを登録し、ワーカーが
+画像の正規化（dHash の計算を含む）・文字読み取り・買取対象の照合・重複チェックを順に実行する。
+失敗したジョブは待ち時間を延ばしながら RECEIPT_JOB_MAX_ATTEMPTS 回まで再試行する。
+
+ジョブの取得は 1 つの UPDATE ... RETURNING で行う。PostgreSQL では FOR UPDATE SKIP LOCKED で
+複数のワーカー・プロセスが同じジョブを取らずに並行して取得できる。SQLite では書き込みが
+直列化されるため、同じ文がそのままジョブの取り合いを防ぐ（SKIP LOCKED は付かない）。
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.storage import storage_ref
+from app.database import AsyncSessionLocal
+from app.models.receipt import Receipt
+from app.models.receipt_job import ReceiptJob, ReceiptJobStatus
+from app.services.buy_back_service import match_receipt_buy_back
+from app.services.receipt_service import flag_duplicates, normalize_saved_image, ORIGINAL_DIR
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+
+
+async def _normalize_image(db: AsyncSession, receipt: Receipt, state: dict) -> None:
+    """元画像を EXIF 回転・縮小・再圧縮し、サムネイルと dHash を作成"""
+    if not receipt.image_sha256 or not receipt.image_url.startswith(storage_ref(f"{ORIGINAL_DIR}/")):
+        return
+    saved = await normalize_saved_image(receipt.image_url, receipt.image_sha256)
+    receipt.image_url = saved.image_url
+    receipt.thumbnail_url = saved.thumbnail_url
+    state["phash"] = saved.phash
+
+
+async def _read_text(db: AsyncSession, receipt: Receipt, state: dict) -> None:
+    """レシートの文字読み取り（OCR 導入までは入力された店舗名・金額をそのまま使う）"""
+
+
+async def _match_buy_back(db: AsyncSession, receipt: Receipt, state: dict) -> None:
+    """商品名・店舗名を買取対象と照合"""
+    await match_receipt_buy_back(db, receipt)
+
+
+async def _check_duplicates(db: AsyncSession, receipt: Receipt, state: dict) -> None:
+    """同じ画像・見た目が近い画像のレシートを記録"""
+    await flag_duplicates(db, receipt, state.get("phash"))
+
+
+# 順に実行する処理。再試行時は最初からやり直すため、各処理は繰り返し実行できるようにする
+RECEIPT_JOB_STAGES: List[Tuple[str, Callable[[AsyncSession, Receipt, dict], Awaitable[None]]]] = [
+    ("normalize", _normalize_image),
+    ("ocr", _read_text),
+    ("buy_back", _match_buy_back),
+    ("duplicates", _check_duplicates),
+]
+
+
+async def claim_receipt_jobs(db: AsyncSession, limit: int) -> List[Tuple[int, int, int]]:
+    """
+    実行可能なジョブを取得して実行中にする（リース期限切れの実行中ジョブも再取得）。
+    戻り値: [(ジョブID, レシートID, 試行回数), ...]
+    """
+    now = datetime.utcnow()
+    ready = (
+        select(ReceiptJob.id)
+        .where(
+            or_(
+                and_(ReceiptJob.status == ReceiptJobStatus.QUEUED.value, ReceiptJob.run_after <= now),
+                and_(ReceiptJob.status == ReceiptJobStatus.RUNNING.value, ReceiptJob.locked_until < now),
+            )
+        )
+        .order_by(ReceiptJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(ReceiptJob)
+        .where(ReceiptJob.id.in_(ready.scalar_subquery()))
+        .values(
+            status=ReceiptJobStatus.RUNNING.value,
+            attempts=ReceiptJob.attempts + 1,
+            locked_until=now + timedelta(seconds=settings.RECEIPT_JOB_LEASE_SECONDS),
+            updated_at=now,
+        )
+        .returning(ReceiptJob.id, ReceiptJob.receipt_id, ReceiptJob.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    jobs = sorted(tuple(row) for row in result.all())
+    await db.commit()
+    return jobs
+
+
+async def _finish_job(db: AsyncSession, job_id: int, status: str, error: Optional[str] = None, **values) -> None:
+    await db.execute(
+        update(ReceiptJob)
+        .where(ReceiptJob.id == job_id)
+        .values(status=status, locked_until=None, last_error=error, updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def run_receipt_job(job_id: int, receipt_id: int, attempts: int) -> bool:
+    """ジョブを実行。失敗時は再試行を予約（上限に達したら failed）。戻り値: 成功したか"""
+    if attempts > settings.RECEIPT_JOB_MAX_ATTEMPTS:
+        # 実行中のワーカー停止（リース切れ）を繰り返したジョブ
+        async with AsyncSessionLocal() as db:
+            await _finish_job(db, job_id, ReceiptJobStatus.FAILED.value, "再試行の上限に達しました")
+            await db.commit()
+        return False
+
+    stage_name = ""
+    async with AsyncSessionLocal() as db:
+        try:
+            receipt = await db.get(Receipt, receipt_id)
+            if receipt is not None:
+                state: dict = {}
+                for stage_name, stage in RECEIPT_JOB_STAGES:
+                    await stage(db, receipt, state)
+                receipt.processed_at = datetime.utcnow()
+            await _finish_job(db, job_id, ReceiptJobStatus.DONE.value)
+            await db.commit()
+            return True
+        except Exception as e:
+            await db.rollback()
+            error = f"{stage_name}: {e!r}"[:1000]
+            logger.warning("レシート処理ジョブ %s（receipt=%s）が失敗しました: %s", job_id, receipt_id, error)
+
+    async with AsyncSessionLocal() as db:
+        if attempts >= settings.RECEIPT_JOB_MAX_ATTEMPTS:
+            await _finish_job(db, job_id, ReceiptJobStatus.FAILED.value, error)
+        else:
+            delay = settings.RECEIPT_JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+            await _finish_job(
+                db,
+                job_id,
+                ReceiptJobStatus.QUEUED.value,
+                error,
+                run_after=datetime.utcnow() + timedelta(seconds=delay),
+            )
+        await db.commit()
+    return False
+
+
+async def process_receipt_jobs(limit: Optional[int] = None) -> int:
+    """実行可能なジョブを取得して処理。戻り値: 処理したジョブ数"""
+    async with AsyncSessionLocal() as db:
+        jobs = await claim_receipt_jobs(db, limit or settings.RECEIPT_JOB_BATCH_SIZE)
+    for job in jobs:
+        await run_receipt_job(*job)
+    return len(jobs)
+
+
+async def _worker_loop(wakeup: asyncio.Event) -> None:
+    while True:
+        try:
+            processed = await process_receipt_jobs()
+        except Exception:
+            logger.exception("レシート処理ジョブの取得に失敗しました")
+            processed = 0
+        if processed:
+            continue
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=settings.RECEIPT_JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def wake_receipt_workers() -> None:
+    """ジョブを登録したトランザクションのコミット後に呼ぶ（同じプロセスのワーカーをすぐ起こす）"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def start_receipt_workers(count: Optional[int] = None) -> None:
+    """ワーカーを起動（既定は RECEIPT_JOB_WORKERS 個）"""
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    for _ in range(settings.RECEIPT_JOB_WORKERS if count is None else count):
+        _workers.append(asyncio.create_task(_worker_loop(_wakeup)))
+
+
+async def stop_receipt_workers() -> None:
+    """ワーカーを停止（実行中のジョブはリース期限後に再実行される）"""
+    global _wakeup
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _wakeup = None
@@ -1,28 +1,150 @@
 """レシートサービス"""
+import asyncio
 import json
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import os
-import uuid
-from datetime import datetime
-from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, text, update, bindparam, or_, Integer, String
 
+from app.config import get_settings
+from app.core.pagination import keyset_before
+from app.core.storage import get_storage, storage_key, storage_ref, work_path
+from app.database import is_postgresql
 from app.models.receipt import Receipt, ReceiptStatus
-from app.models.point_transaction import PointTransaction
+from app.models.receipt_job import ReceiptJob
+from app.services.point_service import add_point_transaction, add_point_transactions
+from app.services.image_service import THUMBNAIL_DIR, compute_image_dhash, image_filename, normalize_receipt_image
+from app.services.quest_service import apply_approved_receipts
+from app.services.receipt_item_service import add_receipt_items
+from app.services.receipt_similarity_service import (
+    SIMILAR_CANDIDATE_LIMIT,
+    find_near_duplicate_id,
+    find_similar_receipts,
+    index_receipt_phash,
+    to_signed64,
+)
+from app.core.uploads import ReceivedUpload
 from app.schemas.receipt import ReceiptCreate, ReceiptItem
 
+settings = get_settings()
 
-def save_upload_file(file_content: bytes, filename: str, upload_dir: str) -> str:
-    """アップロードファイルを保存し、相対パスを返す"""
-    Path(upload_dir).mkdir(parents=True, exist_ok=True)
-    ext = Path(filename).suffix or ".jpg"
-    unique_name = f"{uuid.uuid4()}{ext}"
-    file_path = os.path.join(upload_dir, unique_name)
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    return f"/uploads/{unique_name}"
+ORIGINAL_DIR = "originals"  # 正規化前の元画像（正規化後に削除。変換できない形式はそのまま使う）
+DUPLICATE_CHECK_LOCK_KEY = 7_120_016  # 重複チェックを直列化するアドバイザリロックのキー
+BULK_REVIEW_CHUNK_SIZE = 500
+
+# (行番号, receipt_id, status, points_awarded, rejection_reason)
+ReviewRow = Tuple[int, int, str, Optional[int], Optional[str]]
+
+
+@dataclass
+class SavedImage:
+    """正規化したレシート画像"""
+    image_url: str
+    thumbnail_url: Optional[str] = None
+    phash: Optional[int] = None  # dHash（変換できない形式は None）
+
+
+async def save_upload_file(upload: ReceivedUpload) -> str:
+    """
+    受信済みの一時ファイルを元画像として保存先に保存（正規化は処理ジョブで行う）。
+    キーは内容の SHA-256 とし、同じ画像が保存済みなら一時ファイルを破棄する。
+    戻り値: 元画像の参照（/uploads/originals/<SHA-256>.<拡張子>）
+    """
+    storage = get_storage()
+    key = f"{ORIGINAL_DIR}/{upload.sha256}{upload.ext}"
+    if await storage.exists(key):
+        await asyncio.to_thread(os.unlink, upload.path)
+    else:
+        await storage.put_file(upload.path, key)
+    return storage_ref(key)
+
+
+def _unlink_if_exists(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def normalize_saved_image(image_url: str, image_sha256: str) -> SavedImage:
+    """
+    保存済みの元画像を正規化（処理ジョブから呼ぶ）。
+    同じ画像の正規化済みファイルがあれば変換を省き、変換できない形式（HEIC 等）は元画像のまま
+    """
+    storage = get_storage()
+    image_key = image_filename(image_sha256)
+    thumbnail_key = f"{THUMBNAIL_DIR}/{image_key}"
+    src_key = storage_key(image_url)
+    if all(await asyncio.gather(storage.exists(image_key), storage.exists(thumbnail_key))):
+        async with storage.open_local(image_key) as path:
+            phash = await compute_image_dhash(path)
+        # 正規化済みの画像を再アップロードした場合も、今回保存した元画像は不要になる
+        if src_key is not None and src_key.startswith(f"{ORIGINAL_DIR}/"):
+            await storage.delete(src_key)
+        return SavedImage(storage_ref(image_key), storage_ref(thumbnail_key), phash)
+    if src_key is None:
+        raise FileNotFoundError(f"元画像がありません: {image_url}")
+
+    suffix = os.path.splitext(image_key)[1]
+    dest, thumbnail = await asyncio.gather(
+        asyncio.to_thread(work_path, suffix), asyncio.to_thread(work_path, suffix)
+    )
+    try:
+        async with storage.open_local(src_key) as src:
+            phash = await normalize_receipt_image(src, dest, thumbnail)
+        if phash is None:
+            return SavedImage(image_url)
+        # サムネイルを先に置く（本体があればサムネイルもある状態を保つ）
+        await storage.put_file(thumbnail, thumbnail_key)
+        await storage.put_file(dest, image_key)
+    finally:
+        await asyncio.gather(
+            asyncio.to_thread(_unlink_if_exists, dest), asyncio.to_thread(_unlink_if_exists, thumbnail)
+        )
+    if src_key.startswith(f"{ORIGINAL_DIR}/"):
+        await storage.delete(src_key)
+    return SavedImage(storage_ref(image_key), storage_ref(thumbnail_key), phash)
+
+
+async def flag_duplicates(db: AsyncSession, receipt: Receipt, image_phash: Optional[int]) -> None:
+    """
+    先に登録された同じ画像のレシートを duplicate_of_id に、見た目が近い画像（撮り直し・トリミング）の
+    レシートを near_duplicate_of_id に記録し、dHash を類似検索の索引に登録。
+    元のレシートは常に先に登録された方とし、後に登録された見た目が近いレシートの処理が先に終わっていた場合は
+    そちらに near_duplicate_of_id を記録する。
+    並行して処理中のレシート同士も見落とさないよう、索引への登録から検索までを直列化する
+    （PostgreSQL はコミットまで有効なアドバイザリロック、SQLite は索引への書き込みのロック）
+    """
+    if receipt.image_sha256:
+        result = await db.execute(
+            select(Receipt.id)
+            .where(Receipt.image_sha256 == receipt.image_sha256, Receipt.id < receipt.id)
+            .order_by(Receipt.id)
+            .limit(1)
+        )
+        receipt.duplicate_of_id = result.scalar_one_or_none()
+    if image_phash is None:
+        return
+    if is_postgresql():
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": DUPLICATE_CHECK_LOCK_KEY})
+    receipt.image_phash = to_signed64(image_phash)
+    await db.flush()
+    await index_receipt_phash(db, receipt.id, image_phash)
+    if receipt.duplicate_of_id is None:
+        receipt.near_duplicate_of_id = await find_near_duplicate_id(
+            db, image_phash, image_sha256=receipt.image_sha256, before_id=receipt.id
+        )
+    # 後に登録されたレシートの処理が先に終わっていた場合、そちらを元のレシートとせず複製として記録する
+    later = await find_similar_receipts(
+        db, image_phash, exclude_sha256=receipt.image_sha256, after_id=receipt.id, limit=SIMILAR_CANDIDATE_LIMIT
+    )
+    for other, _ in later:
+        if other.duplicate_of_id is None and other.near_duplicate_of_id is None:
+            other.near_duplicate_of_id = receipt.id
+    await db.flush()
 
 
 def items_to_json(items: Optional[List[ReceiptItem]]) -> Optional[str]:
@@ -36,11 +158,16 @@ async def create_receipt(
     user_id: int,
     image_path: str,
     data: ReceiptCreate,
+    image_sha256: Optional[str] = None,
 ) -> Receipt:
-    """レシート登録"""
+    """
+    レシート登録（商品明細は receipt_items にも保存。
+    画像の正規化・重複チェックは同じトランザクションで登録する処理ジョブで行う）
+    """
     receipt = Receipt(
         user_id=user_id,
         image_url=image_path,
+        image_sha256=image_sha256,
         store_name=data.store_name,
         amount=data.amount,
         items=items_to_json(data.items),
@@ -49,6 +176,10 @@ async def create_receipt(
     )
     db.add(receipt)
     await db.flush()
+    if data.items:
+        await add_receipt_items(db, receipt.id, user_id, [item.model_dump() for item in data.items])
+    db.add(ReceiptJob(receipt_id=receipt.id))
+    await db.flush()
     await db.refresh(receipt)
     return receipt
 
@@ -58,15 +189,20 @@ async def get_user_receipts(
     user_id: int,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[tuple[datetime, int]] = None,
 ) -> List[Receipt]:
-    """ユーザーのレシート一覧"""
-    result = await db.execute(
+    """ユーザーのレシート一覧（cursor 指定時は skip を使わずその位置から取得）"""
+    q = (
         select(Receipt)
         .where(Receipt.user_id == user_id)
-        .order_by(Receipt.created_at.desc())
-        .offset(skip)
+        .order_by(Receipt.created_at.desc(), Receipt.id.desc())
         .limit(limit)
     )
+    if cursor:
+        q = q.where(keyset_before(Receipt.created_at, Receipt.id, cursor))
+    else:
+        q = q.offset(skip)
+    result = await db.execute(q)
     return list(result.scalars().all())
 
 
@@ -84,47 +220,264 @@ async def get_receipt_by_id_any(db: AsyncSession, receipt_id: int) -> Optional[R
     return result.scalar_one_or_none()
 
 
+def _claimable_by(reviewer_id: int, now: datetime):
+    """担当者が扱えるレシートの条件（未確保・期限切れ・自分が確保中）"""
+    return or_(
+        Receipt.review_claimed_until.is_(None),
+        Receipt.review_claimed_until < now,
+        Receipt.review_claimed_by == reviewer_id,
+    )
+
+
+def _is_claimed_by_other(claimed_by: Optional[int], claimed_until: Optional[datetime], reviewer_id: int) -> bool:
+    """_claimable_by の逆（読み込んだ行の判定）"""
+    return (
+        claimed_until is not None
+        and claimed_until >= datetime.utcnow()
+        and claimed_by != reviewer_id
+    )
+
+
 async def get_all_receipts(
     db: AsyncSession,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
+    exclude_claimed_for: Optional[int] = None,
 ) -> list[Receipt]:
-    """全レシート一覧（管理者用）"""
+    """
+    全レシート一覧（管理者用）
+    exclude_claimed_for: 指定した担当者以外が確保中のレシートを除く
+    """
     q = select(Receipt).order_by(Receipt.created_at.desc()).offset(skip).limit(limit)
     if status:
         q = q.where(Receipt.status == status)
+    if exclude_claimed_for is not None:
+        q = q.where(_claimable_by(exclude_claimed_for, datetime.utcnow()))
     result = await db.execute(q)
     return list(result.scalars().all())
 
 
+async def claim_pending_receipts(db: AsyncSession, reviewer_id: int, limit: int) -> List[Receipt]:
+    """
+    審査待ちのレシートを古い順に最大 limit 件取得し、担当者として RECEIPT_REVIEW_LEASE_SECONDS の間確保する。
+    他の担当者が確保中のレシートは除き、自分が確保済みのレシートは期限を延長して含める。
+    PostgreSQL では FOR UPDATE SKIP LOCKED で、同時に取得した担当者同士も同じレシートを取らない
+    """
+    now = datetime.utcnow()
+    claimable = (
+        select(Receipt.id)
+        .where(
+            Receipt.status == ReceiptStatus.PENDING.value,
+            _claimable_by(reviewer_id, now),
+        )
+        .order_by(Receipt.created_at, Receipt.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Receipt)
+        .where(Receipt.id.in_(claimable.scalar_subquery()))
+        .values(
+            review_claimed_by=reviewer_id,
+            review_claimed_until=now + timedelta(seconds=settings.RECEIPT_REVIEW_LEASE_SECONDS),
+        )
+        .returning(Receipt.id)
+        .execution_options(synchronize_session=False)
+    )
+    receipt_ids = list(result.scalars().all())
+    if not receipt_ids:
+        return []
+    result = await db.execute(
+        select(Receipt)
+        .where(Receipt.id.in_(receipt_ids))
+        .order_by(Receipt.created_at, Receipt.id)
+        .execution_options(populate_existing=True)
+    )
+    return list(result.scalars().all())
+
+
+async def release_receipt_claims(
+    db: AsyncSession, reviewer_id: int, receipt_ids: Optional[List[int]] = None
+) -> int:
+    """担当者が確保中のレシートを解放（receipt_ids 省略時はすべて）。戻り値: 解放した件数"""
+    q = (
+        update(Receipt)
+        .where(Receipt.review_claimed_by == reviewer_id)
+        .values(review_claimed_by=None, review_claimed_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    if receipt_ids is not None:
+        q = q.where(Receipt.id.in_(receipt_ids))
+    result = await db.execute(q)
+    return result.rowcount or 0
+
+
 async def update_receipt_status(
     db: AsyncSession,
     receipt_id: int,
     status: str,
     points_awarded: Optional[int] = None,
     rejection_reason: Optional[str] = None,
+    reviewer_id: Optional[int] = None,
 ) -> Optional[Receipt]:
-    """レシート審査（承認/却下）"""
-    receipt = await get_receipt_by_id_any(db, receipt_id)
+    """
+    レシート審査（承認/却下）。
+    行をロックして読み込むため、同時に審査しても審査待ちからの承認（ポイント付与）は1回のみ。
+    reviewer_id: 審査する担当者。他の担当者が確保中のレシートは ValueError
+    """
+    result = await db.execute(
+        select(Receipt)
+        .where(Receipt.id == receipt_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    receipt = result.scalar_one_or_none()
     if not receipt:
         return None
+    if reviewer_id is not None and _is_claimed_by_other(
+        receipt.review_claimed_by, receipt.review_claimed_until, reviewer_id
+    ):
+        raise ValueError("他の管理者が担当中のレシートです")
     was_pending = receipt.status == ReceiptStatus.PENDING.value
     receipt.status = status
     if points_awarded is not None:
         receipt.points_awarded = points_awarded
     if rejection_reason is not None:
         receipt.rejection_reason = rejection_reason
+    receipt.review_claimed_by = None
+    receipt.review_claimed_until = None
+    await db.flush()
     if status == ReceiptStatus.APPROVED.value and points_awarded and points_awarded > 0 and was_pending:
-        from app.models.point_transaction import PointTransaction
-        tx = PointTransaction(
-            user_id=receipt.user_id,
-            amount=points_awarded,
-            type="receipt",
+        await add_point_transaction(
+            db,
+            receipt.user_id,
+            points_awarded,
+            "receipt",
             description=f"レシート承認 #{receipt_id}",
             reference_id=receipt_id,
         )
-        db.add(tx)
-    await db.flush()
+    if status == ReceiptStatus.APPROVED.value and was_pending:
+        await apply_approved_receipts(db, [receipt_id])
     await db.refresh(receipt)
     return receipt
+
+
+async def _review_chunk(
+    db: AsyncSession, chunk: List[ReviewRow], reviewer_id: Optional[int] = None, pending_only: bool = False
+) -> Tuple[int, int, int, List[dict]]:
+    """1チャンク分を審査（レシート取得1回・UPDATE 1回・ポイント取引の複数行 INSERT）"""
+    receipts = Receipt.__table__
+    result = await db.execute(
+        select(
+            receipts.c.id,
+            receipts.c.user_id,
+            receipts.c.status,
+            receipts.c.review_claimed_by,
+            receipts.c.review_claimed_until,
+        )
+        .where(receipts.c.id.in_({receipt_id for _, receipt_id, _, _, _ in chunk}))
+        .order_by(receipts.c.id)
+        .with_for_update()
+    )
+    current = {row.id: row for row in result.all()}
+    statuses = {s.value for s in ReceiptStatus}
+
+    errors = []
+    reviews = []
+    awards = []
+    approved_ids = []
+    seen = set()
+    for row, receipt_id, status, points_awarded, rejection_reason in chunk:
+        receipt = current.get(receipt_id)
+        if receipt is None:
+            errors.append({"row": row, "receipt_id": receipt_id, "detail": "レシートが見つかりません"})
+            continue
+        if receipt_id in seen:
+            errors.append({"row": row, "receipt_id": receipt_id, "detail": "同じレシートが複数回指定されています"})
+            continue
+        if status not in statuses:
+            errors.append({"row": row, "receipt_id": receipt_id, "detail": f"status が不正です: {status}"})
+            continue
+        if reviewer_id is not None and _is_claimed_by_other(
+            receipt.review_claimed_by, receipt.review_claimed_until, reviewer_id
+        ):
+            errors.append({"row": row, "receipt_id": receipt_id, "detail": "他の管理者が担当中のレシートです"})
+            continue
+        if pending_only and receipt.status != ReceiptStatus.PENDING.value:
+            errors.append({"row": row, "receipt_id": receipt_id, "detail": "審査待ちではありません"})
+            continue
+        seen.add(receipt_id)
+        reviews.append({
+            "rid": receipt_id,
+            "new_status": status,
+            "new_points": points_awarded,
+            "new_reason": rejection_reason,
+        })
+        # 承認時のポイント付与は審査待ちからの承認のみ（update_receipt_status と同じ）
+        was_pending = receipt.status == ReceiptStatus.PENDING.value
+        if status == ReceiptStatus.APPROVED.value and was_pending:
+            approved_ids.append(receipt_id)
+        if status == ReceiptStatus.APPROVED.value and points_awarded and points_awarded > 0 and was_pending:
+            awards.append({
+                "user_id": receipt.user_id,
+                "amount": points_awarded,
+                "type": "receipt",
+                "description": f"レシート承認 #{receipt_id}",
+                "reference_id": receipt_id,
+            })
+    if not reviews:
+        return 0, 0, 0, errors
+
+    # points_awarded・rejection_reason は指定がなければ元の値のまま
+    await db.execute(
+        update(receipts)
+        .where(receipts.c.id == bindparam("rid"))
+        .values(
+            status=bindparam("new_status"),
+            points_awarded=func.coalesce(bindparam("new_points", type_=Integer), receipts.c.points_awarded),
+            rejection_reason=func.coalesce(bindparam("new_reason", type_=String), receipts.c.rejection_reason),
+            review_claimed_by=None,
+            review_claimed_until=None,
+        ),
+        reviews,
+    )
+    await add_point_transactions(db, awards)
+    await apply_approved_receipts(db, approved_ids)
+    return len(reviews), len(awards), sum(a["amount"] for a in awards), errors
+
+
+async def bulk_review_receipts(
+    db: AsyncSession,
+    rows: List[ReviewRow],
+    chunk_size: int = BULK_REVIEW_CHUNK_SIZE,
+    reviewer_id: Optional[int] = None,
+    pending_only: bool = False,
+) -> dict:
+    """
+    レシートを一括審査（チャンクごとにコミット）。
+    途中で失敗した場合もコミット済みのチャンクは審査済みとなる。
+    reviewer_id: 審査する担当者。他の担当者が確保中のレシートはエラー行とする
+    pending_only: 審査待ちでない（審査済みの）レシートはエラー行とする
+    """
+    reviewed = 0
+    awarded = 0
+    awarded_points = 0
+    errors: List[dict] = []
+    for start in range(0, len(rows), chunk_size):
+        count, award_count, points, chunk_errors = await _review_chunk(
+            db, rows[start:start + chunk_size], reviewer_id=reviewer_id, pending_only=pending_only
+        )
+        await db.commit()
+        reviewed += count
+        awarded += award_count
+        awarded_points += points
+        errors.extend(chunk_errors)
+    return {
+        "total_rows": len(rows),
+        "reviewed_count": reviewed,
+        "awarded_count": awarded,
+        "awarded_points": awarded_points,
+        "error_count": len(errors),
+        "errors": errors,
+    }
@@ -0,0 +1,194 @@
+"""レシート画像の類似検索（撮り直し・トリミングした同じレシートの検出）
+
+画像の dHash（64bit）を 16bit ずつ 4 つの区間に分けて receipt_image_hash_bands に索引する
+（マルチインデックスハッシュ）。ハミング距離 d 以内の画像は、少なくとも 1 つの区間で
+距離 d // 4 以内に収まるため、各区間でその範囲の値だけを索引から引き、
+候補のハッシュ全体の距離を計算して絞り込む（インデックスのみで完結し、receipts は一致分だけ読む）。
+"""
+from itertools import combinations
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.storage import get_storage, storage_key
+from app.models.receipt import Receipt, ReceiptImageHashBand
+from app.services.image_service import compute_image_dhash
+
+settings = get_settings()
+
+HASH_BITS = 64
+BAND_COUNT = 4
+BAND_BITS = HASH_BITS // BAND_COUNT
+BAND_MASK = (1 << BAND_BITS) - 1
+SIMILAR_CANDIDATE_LIMIT = 10000  # 候補が極端に多い（真っ白な画像など）場合の上限
+
+
+def to_signed64(value: int) -> int:
+    """DB（BIGINT）に保存するため符号付き 64bit に変換"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned64(value: int) -> int:
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (to_unsigned64(a) ^ to_unsigned64(b)).bit_count()
+
+
+def hash_bands(phash: int) -> List[int]:
+    """dHash を上位ビットから 16bit ずつに分割"""
+    value = to_unsigned64(phash)
+    return [
+        (value >> (BAND_BITS * (BAND_COUNT - 1 - band))) & BAND_MASK
+        for band in range(BAND_COUNT)
+    ]
+
+
+def _probe_values(value: int, radius: int) -> List[int]:
+    """value からハミング距離 radius 以内の 16bit 値"""
+    values = [value]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), r):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+async def index_receipt_phash(db: AsyncSession, receipt_id: int, phash: int) -> None:
+    """レシートの dHash を索引に登録（登録済みなら置き換え）"""
+    await db.execute(delete(ReceiptImageHashBand).where(ReceiptImageHashBand.receipt_id == receipt_id))
+    await db.execute(
+        insert(ReceiptImageHashBand),
+        [
+            {"receipt_id": receipt_id, "band": band, "value": value, "phash": to_signed64(phash)}
+            for band, value in enumerate(hash_bands(phash))
+        ],
+    )
+
+
+async def find_similar_receipts(
+    db: AsyncSession,
+    phash: int,
+    max_distance: Optional[int] = None,
+    exclude_ids: Iterable[int] = (),
+    exclude_sha256: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = 20,
+    after_id: Optional[int] = None,
+) -> List[Tuple[Receipt, int]]:
+    """
+    dHash がハミング距離 max_distance 以内のレシートを距離の近い順に返す。
+    exclude_sha256: 同じ内容（完全一致）のレシートを除く。before_id / after_id: それより前 / 後に登録されたレシートのみ
+    """
+    if max_distance is None:
+        max_distance = settings.RECEIPT_NEAR_DUPLICATE_DISTANCE
+    radius = max_distance // BAND_COUNT
+    # 区間ごとに (band, value) のインデックスのみで引けるよう UNION ALL にする
+    band_queries = []
+    for band, value in enumerate(hash_bands(phash)):
+        bq = select(ReceiptImageHashBand.receipt_id, ReceiptImageHashBand.phash).where(
+            ReceiptImageHashBand.band == band,
+            ReceiptImageHashBand.value.in_(_probe_values(value, radius)),
+        )
+        if before_id is not None:
+            bq = bq.where(ReceiptImageHashBand.receipt_id < before_id)
+        if after_id is not None:
+            bq = bq.where(ReceiptImageHashBand.receipt_id > after_id)
+        band_queries.append(bq)
+    q = union_all(*band_queries).limit(SIMILAR_CANDIDATE_LIMIT)
+    exclude = set(exclude_ids)
+    distances = {}
+    for receipt_id, candidate in (await db.execute(q)).all():
+        if receipt_id in exclude or receipt_id in distances:
+            continue
+        distance = hamming_distance(phash, candidate)
+        if distance <= max_distance:
+            distances[receipt_id] = distance
+    if not distances:
+        return []
+    result = await db.execute(select(Receipt).where(Receipt.id.in_(list(distances))))
+    matches = sorted(
+        (
+            (distances[r.id], r.id, r)
+            for r in result.scalars().all()
+            if not (exclude_sha256 and r.image_sha256 == exclude_sha256)
+        ),
+        key=lambda m: m[:2],
+    )
+    return [(r, distance) for distance, _, r in matches[:limit]]
+
+
+async def find_near_duplicate_id(
+    db: AsyncSession,
+    phash: int,
+    image_sha256: Optional[str] = None,
+    before_id: Optional[int] = None,
+    exclude_id: Optional[int] = None,
+) -> Optional[int]:
+    """見た目が近い（完全一致を除く）レシートのうち最も近いもの"""
+    matches = await find_similar_receipts(
+        db,
+        phash,
+        exclude_ids=[exclude_id] if exclude_id is not None else (),
+        exclude_sha256=image_sha256,
+        before_id=before_id,
+        limit=1,
+    )
+    return matches[0][0].id if matches else None
+
+
+async def _compute_stored_image_dhash(image_url: str) -> Optional[int]:
+    """保存済み画像の dHash（保存先に無い・読めない画像は None）"""
+    key = storage_key(image_url)
+    if key is None:
+        return None
+    try:
+        async with get_storage().open_local(key) as path:
+            return await compute_image_dhash(path)
+    except FileNotFoundError:
+        return None
+
+
+async def index_missing_receipt_images(db: AsyncSession, batch_size: int = 500) -> dict:
+    """
+    dHash 未計算のレシート画像を計算して索引に登録（導入前のレシート用）。
+    登録順に処理し、先に登録されたレシートと似ていれば near_duplicate_of_id を記録する
+    （完全一致の重複が記録済みのレシートを除く）
+    """
+    indexed = 0
+    skipped = 0
+    near_duplicates = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Receipt)
+            .where(Receipt.image_phash.is_(None), Receipt.id > last_id)
+            .order_by(Receipt.id)
+            .limit(batch_size)
+        )
+        receipts = list(result.scalars().all())
+        if not receipts:
+            break
+        for receipt in receipts:
+            last_id = receipt.id
+            phash = await _compute_stored_image_dhash(receipt.image_url)
+            if phash is None:
+                skipped += 1
+                continue
+            receipt.image_phash = to_signed64(phash)
+            await db.flush()
+            await index_receipt_phash(db, receipt.id, phash)
+            if receipt.duplicate_of_id is None and receipt.near_duplicate_of_id is None:
+                receipt.near_duplicate_of_id = await find_near_duplicate_id(
+                    db, phash, image_sha256=receipt.image_sha256, before_id=receipt.id
+                )
+                if receipt.near_duplicate_of_id is not None:
+                    near_duplicates += 1
+            indexed += 1
+        await db.commit()
+    return {"indexed": indexed, "skipped": skipped, "near_duplicates": near_duplicates}
@@ -0,0 +1,280 @@
+"""ポイント台帳の整合性チェック（夜間バッチ）
+
+台帳を (user_id, created_at, id) 順にチャンクで読み出して NumPy 配列に変換し、
+ユーザーごとの累積和をベクトル演算で求める。メモリ使用量はチャンクサイズ
+（と1ユーザー分の取引件数）で抑えられる。
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.point_transaction import PointTransaction, PointTransactionRollup
+from app.models.point_balance import UserPointBalance, PointBalanceCheckpoint
+from app.models.exchange import Exchange
+from app.models.receipt import Receipt
+from app.models.survey import SurveyAnswer
+from app.models.fitness_log import BottleConsumption
+from app.models.referral import Referral
+from app.models.campaign import QuestProgress
+
+RECONCILE_CHUNK_SIZE = 200_000
+SAMPLE_LIMIT = 100
+
+# 取引種別ごとの reference_id の参照先
+REFERENCE_TARGETS = {
+    "exchange": Exchange,
+    "receipt": Receipt,
+    "survey": SurveyAnswer,
+    "bottle": BottleConsumption,
+    "referral": Referral,
+    "referral_bonus": Referral,
+    "quest": QuestProgress,
+}
+
+
+class _Report:
+    def __init__(self) -> None:
+        self.rows_scanned = 0
+        self.users_checked = 0
+        self.negative_balances: List[dict] = []
+        self.negative_balance_count = 0
+        self.balance_mismatches: List[dict] = []
+        self.balance_mismatch_count = 0
+        self.checkpoint_mismatches: List[dict] = []
+        self.checkpoint_mismatch_count = 0
+        self.missing_balance_rows = 0
+        self.dangling_references: Dict[str, dict] = {}
+
+    def add_samples(self, samples: List[dict], items: List[dict]) -> None:
+        samples.extend(items[: max(0, SAMPLE_LIMIT - len(samples))])
+
+    def as_dict(self) -> dict:
+        ok = not (
+            self.negative_balance_count
+            or self.balance_mismatch_count
+            or self.checkpoint_mismatch_count
+            or any(d["count"] for d in self.dangling_references.values())
+        )
+        return {
+            "ok": ok,
+            "rows_scanned": self.rows_scanned,
+            "users_checked": self.users_checked,
+            "negative_balance_count": self.negative_balance_count,
+            "negative_balances": self.negative_balances,
+            "balance_mismatch_count": self.balance_mismatch_count,
+            "balance_mismatches": self.balance_mismatches,
+            "checkpoint_mismatch_count": self.checkpoint_mismatch_count,
+            "checkpoint_mismatches": self.checkpoint_mismatches,
+            "missing_balance_rows": self.missing_balance_rows,
+            "dangling_references": self.dangling_references,
+        }
+
+
+def _user_range(column, lo: Optional[int], hi: Optional[int]):
+    conditions = []
+    if lo is not None:
+        conditions.append(column > lo)
+    if hi is not None:
+        conditions.append(column <= hi)
+    return conditions
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, query: np.ndarray, default: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """ソート済み keys から query を引き、(値, 見つかったか) を返す"""
+    if len(keys) == 0:
+        return np.full(len(query), default, dtype=np.int64), np.zeros(len(query), dtype=bool)
+    pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    found = keys[pos] == query
+    return np.where(found, values[pos], default), found
+
+
+async def _check_users(
+    db: AsyncSession,
+    report: _Report,
+    uid: np.ndarray,
+    ts: np.ndarray,
+    tid: np.ndarray,
+    amt: np.ndarray,
+    lo: Optional[int],
+    hi: Optional[int],
+) -> None:
+    """user_id が (lo, hi] の範囲のユーザーを検証（台帳行はこの範囲の全件）"""
+    # アーカイブ済み月次集計（期首残高として扱う）
+    result = await db.execute(
+        select(
+            PointTransactionRollup.user_id,
+            PointTransactionRollup.period_start,
+            PointTransactionRollup.amount_total,
+        )
+        .where(*_user_range(PointTransactionRollup.user_id, lo, hi))
+        .order_by(PointTransactionRollup.user_id)
+    )
+    rollups = result.all()
+    rollup_rows: Dict[int, List[Tuple[datetime, int]]] = {}
+    for r in rollups:
+        rollup_rows.setdefault(r.user_id, []).append((r.period_start, int(r.amount_total)))
+    rollup_users = np.array(sorted(rollup_rows), dtype=np.int64)
+    rollup_totals = np.array([sum(a for _, a in rollup_rows[u]) for u in rollup_users.tolist()], dtype=np.int64)
+
+    # ユーザーごとの累積和（ベクトル演算）
+    n = len(uid)
+    if n:
+        starts = np.flatnonzero(np.r_[True, uid[1:] != uid[:-1]])
+        ends = np.r_[starts[1:], n]
+        group_users = uid[starts]
+        group_of_row = np.repeat(np.arange(len(starts)), ends - starts)
+        base, _ = _lookup(rollup_users, rollup_totals, group_users)
+        csum = np.cumsum(amt)
+        before_group = np.r_[0, csum[starts[1:] - 1]]
+        running = csum - before_group[group_of_row] + base[group_of_row]
+        finals = running[ends - 1]
+
+        negative = np.flatnonzero(running < 0)
+        if len(negative):
+            # ユーザーごとに最初にマイナスになった取引
+            _, first = np.unique(group_of_row[negative], return_index=True)
+            rows = negative[first]
+            report.negative_balance_count += len(rows)
+            report.add_samples(report.negative_balances, [
+                {"user_id": int(uid[i]), "transaction_id": int(tid[i]), "balance": int(running[i])}
+                for i in rows[:SAMPLE_LIMIT]
+            ])
+    else:
+        starts = ends = np.zeros(0, dtype=np.int64)
+        group_users = finals = running = np.zeros(0, dtype=np.int64)
+
+    # 集計済み残高との照合
+    result = await db.execute(
+        select(UserPointBalance.user_id, UserPointBalance.balance)
+        .where(*_user_range(UserPointBalance.user_id, lo, hi))
+        .order_by(UserPointBalance.user_id)
+    )
+    materialized = np.array(result.all(), dtype=np.int64).reshape(-1, 2)
+    m_users, m_balances = materialized[:, 0], materialized[:, 1]
+    expected, in_ledger = _lookup(group_users, finals, m_users)
+    rollup_only, _ = _lookup(rollup_users, rollup_totals, m_users)
+    expected = np.where(in_ledger, expected, rollup_only)
+    mismatch = np.flatnonzero(expected != m_balances)
+    report.balance_mismatch_count += len(mismatch)
+    report.add_samples(report.balance_mismatches, [
+        {"user_id": int(m_users[i]), "materialized": int(m_balances[i]), "ledger": int(expected[i])}
+        for i in mismatch[:SAMPLE_LIMIT]
+    ])
+    ledger_users = np.union1d(group_users, rollup_users)
+    report.missing_balance_rows += int(np.count_nonzero(~np.isin(ledger_users, m_users)))
+    report.users_checked += len(np.union1d(ledger_users, m_users))
+
+    # チェックポイントとの照合（as_of より前の取引の合計）
+    result = await db.execute(
+        select(PointBalanceCheckpoint.user_id, PointBalanceCheckpoint.as_of, PointBalanceCheckpoint.balance)
+        .where(*_user_range(PointBalanceCheckpoint.user_id, lo, hi))
+    )
+    checkpoints = result.all()
+    if not checkpoints:
+        return
+    c_users = np.array([c.user_id for c in checkpoints], dtype=np.int64)
+    c_as_of = np.array([c.as_of for c in checkpoints], dtype="datetime64[us]")
+    # (user_id, created_at) 順に並んだ台帳上で as_of より前の最後の行を二分探索で求める
+    g_start, _ = _lookup(group_users, starts, c_users, default=-1)
+    g_end, _ = _lookup(group_users, ends, c_users, default=-1)
+    c_base, _ = _lookup(rollup_users, rollup_totals, c_users)
+    for i, c in enumerate(checkpoints):
+        archived = sum(a for period, a in rollup_rows.get(c.user_id, []) if period < c.as_of)
+        s, e = int(g_start[i]), int(g_end[i])
+        live = 0
+        if s >= 0:
+            k = s + int(np.searchsorted(ts[s:e], c_as_of[i], side="left"))
+            if k > s:
+                live = int(running[k - 1] - c_base[i])
+        ledger = archived + live
+        if ledger != c.balance:
+            report.checkpoint_mismatch_count += 1
+            report.add_samples(report.checkpoint_mismatches, [
+                {"user_id": c.user_id, "as_of": c.as_of.isoformat(), "checkpoint": c.balance, "ledger": ledger}
+            ])
+
+
+def _to_arrays(rows) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    uid = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    ts = np.array([r[1] for r in rows], dtype="datetime64[us]")
+    tid = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+    amt = np.fromiter((r[3] for r in rows), dtype=np.int64, count=len(rows))
+    return uid, ts, tid, amt
+
+
+async def _check_balances(db: AsyncSession, report: _Report, chunk_size: int) -> None:
+    empty = (
+        np.zeros(0, dtype=np.int64),
+        np.zeros(0, dtype="datetime64[us]"),
+        np.zeros(0, dtype=np.int64),
+        np.zeros(0, dtype=np.int64),
+    )
+    leftover = empty
+    position = None
+    done_upto: Optional[int] = None
+    while True:
+        q = (
+            select(
+                PointTransaction.user_id,
+                PointTransaction.created_at,
+                PointTransaction.id,
+                PointTransaction.amount,
+            )
+            .order_by(PointTransaction.user_id, PointTransaction.created_at, PointTransaction.id)
+            .limit(chunk_size)
+        )
+        if position is not None:
+            q = q.where(
+                tuple_(PointTransaction.user_id, PointTransaction.created_at, PointTransaction.id)
+                > tuple_(*position)
+            )
+        rows = (await db.execute(q)).all()
+        report.rows_scanned += len(rows)
+        is_last = len(rows) < chunk_size
+        if rows:
+            position = tuple(rows[-1][:3])
+        arrays = tuple(np.concatenate([a, b]) for a, b in zip(leftover, _to_arrays(rows)))
+        uid = arrays[0]
+
+        if is_last:
+            await _check_users(db, report, *arrays, lo=done_upto, hi=None)
+            return
+        # 最後のユーザーは次のチャンクに続く可能性があるため持ち越す
+        split = int(np.searchsorted(uid, uid[-1], side="left"))
+        leftover = tuple(a[split:] for a in arrays)
+        if split == 0:
+            continue
+        hi = int(uid[split - 1])
+        await _check_users(db, report, *(a[:split] for a in arrays), lo=done_upto, hi=hi)
+        done_upto = hi
+
+
+async def _check_references(db: AsyncSession, report: _Report) -> None:
+    """reference_id の参照先が存在するか（種別ごとに集合演算で確認）"""
+    for tx_type, model in REFERENCE_TARGETS.items():
+        dangling = (
+            select(PointTransaction.id)
+            .outerjoin(model, model.id == PointTransaction.reference_id)
+            .where(PointTransaction.type == tx_type, model.id.is_(None))
+        )
+        count = (await db.execute(select(func.count()).select_from(dangling.subquery()))).scalar_one()
+        sample = []
+        if count:
+            sample = list((await db.execute(dangling.order_by(PointTransaction.id).limit(SAMPLE_LIMIT))).scalars())
+        report.dangling_references[tx_type] = {"count": count, "transaction_ids": sample}
+
+
+async def reconcile_ledger(db: AsyncSession, chunk_size: int = RECONCILE_CHUNK_SIZE) -> dict:
+    """
+    全ユーザーのポイント台帳を検証。
+    - 時系列で残高がマイナスにならないこと
+    - exchange / receipt / survey / bottle / 紹介の reference_id の参照先が存在すること
+    - 集計済み残高・チェックポイントが台帳と一致すること
+    """
+    report = _Report()
+    await _check_balances(db, report, chunk_size)
+    await _check_references(db, report)
+    return report.as_dict()
@@ -7,7 +7,7 @@ from sqlalchemy import select
 
 from app.models.user import User
 from app.models.referral import Referral
-from app.models.point_transaction import PointTransaction
+from app.services.point_service import add_point_transaction
 
 REFERRER_POINTS = 100  # 紹介者へのポイント
 REFERRED_POINTS = 50   # 被紹介者へのポイント（オプション）
@@ -75,24 +75,24 @@ async def process_referral_on_register(
     await db.flush()
 
     # 紹介者にポイント付与
-    tx_referrer = PointTransaction(
-        user_id=referrer.id,
-        amount=REFERRER_POINTS,
-        type="referral",
+    await add_point_transaction(
+        db,
+        referrer.id,
+        REFERRER_POINTS,
+        "referral",
         description="友達紹介ボーナス",
         reference_id=referral.id,
     )
-    db.add(tx_referrer)
 
     # 被紹介者にもポイント付与（ウェルカムボーナス）
-    tx_referred = PointTransaction(
-        user_id=new_user_id,
-        amount=REFERRED_POINTS,
-        type="referral_bonus",
+    await add_point_transaction(
+        db,
+        new_user_id,
+        REFERRED_POINTS,
+        "referral_bonus",
         description="紹介で登録した方へのボーナス",
         reference_id=referral.id,
     )
-    db.add(tx_referred)
 
 
 async def get_referral_history(db: AsyncSession, user_id: int) -> List[Referral]:
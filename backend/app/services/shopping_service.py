@@ -1,9 +1,11 @@
 """ショッピング・EC購入トラッキングサービス"""
+from datetime import datetime
 from typing import List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.core.pagination import keyset_before
 from app.models.shopping_track import ShoppingTrack
 
 
@@ -32,12 +34,16 @@ async def get_track_history(
     db: AsyncSession,
     user_id: int,
     limit: int = 50,
+    cursor: Optional[tuple[datetime, int]] = None,
 ) -> List[ShoppingTrack]:
     """トラッキング履歴"""
-    result = await db.execute(
+    q = (
         select(ShoppingTrack)
         .where(ShoppingTrack.user_id == user_id)
-        .order_by(ShoppingTrack.tracked_at.desc())
+        .order_by(ShoppingTrack.tracked_at.desc(), ShoppingTrack.id.desc())
         .limit(limit)
     )
+    if cursor:
+        q = q.where(keyset_before(ShoppingTrack.tracked_at, ShoppingTrack.id, cursor))
+    result = await db.execute(q)
     return list(result.scalars().all())
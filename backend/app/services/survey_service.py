@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 
 from app.models.survey import Survey, SurveyAnswer
-from app.models.point_transaction import PointTransaction
+from app.services.point_service import add_point_transaction
 
 
 async def get_active_surveys(
@@ -143,14 +143,13 @@ async def submit_answer(
     await db.flush()
 
     # ポイント付与
-    tx = PointTransaction(
-        user_id=user_id,
-        amount=survey.points,
-        type="survey",
+    await add_point_transaction(
+        db,
+        user_id,
+        survey.points,
+        "survey",
         description=f"アンケート: {survey.title}",
         reference_id=answer.id,
     )
-    db.add(tx)
-    await db.flush()
     await db.refresh(answer)
     return answer, None
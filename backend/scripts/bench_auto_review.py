@@ -0,0 +1,113 @@
+"""レシート自動審査（auto_review_receipts）のベンチマーク
+
+審査待ちのレシートを N 件（重複画像・許可リスト外の店舗・高額を一定割合で含む）登録して自動審査し、
+1秒あたりの判定件数と、承認件数とポイント付与件数が一致すること（1件1回の付与）を確認する。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/bench_auto_review.py                      # 一時 SQLite で実行
+    python scripts/bench_auto_review.py --database-url postgresql+asyncpg://... --receipts 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="接続先（既定: 一時 SQLite）")
+    parser.add_argument("--receipts", type=int, default=20000, help="登録する審査待ちレシート数")
+    parser.add_argument("--users", type=int, default=2000, help="レシートを登録するユーザー数")
+    parser.add_argument("--batch-size", type=int, default=2000, help="1トランザクションで審査するレシート数")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    from sqlalchemy import func, insert, select
+
+    from app.database import AsyncSessionLocal, engine, init_db
+    from app.models.point_transaction import PointTransaction
+    from app.models.receipt import Receipt, ReceiptStatus
+    from app.models.user import User
+    from app.services.receipt_auto_review_service import auto_review_receipts, compile_rules
+
+    await init_db()
+    rules = compile_rules({
+        "store_allowlist": ["セブン-イレブン", "ローソン"],
+        "min_amount": 100,
+        "max_amount": 20000,
+        "max_daily_approvals": 5,
+        "points": 1,
+        "points_rate_percent": 0.5,
+    })
+    rng = random.Random(0)
+    suffix = int(time.time() * 1000)
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            insert(User).returning(User.id),
+            [
+                {"email": f"auto-review-{suffix}-{i}@example.com", "password_hash": "-", "name": "bench"}
+                for i in range(args.users)
+            ],
+        )
+        user_ids = list(result.scalars().all())
+        rows = []
+        for i in range(args.receipts):
+            roll = rng.random()
+            rows.append({
+                "user_id": rng.choice(user_ids),
+                "image_url": "/uploads/bench",
+                "store_name": "ファミマ" if roll < 0.1 else rng.choice(["セブン-イレブン 新宿店", "ローソン 渋谷店"]),
+                "amount": 50_000 if 0.1 <= roll < 0.15 else rng.randint(100, 5000),
+                "status": ReceiptStatus.PENDING.value,
+                "processed_at": now,
+                "created_at": now,
+            })
+        result = await db.execute(insert(Receipt).returning(Receipt.id), rows)
+        receipt_ids = list(result.scalars().all())
+        # 5% は同じ画像のレシートとして先のレシートを参照させる
+        for receipt_id in rng.sample(receipt_ids[1:], len(receipt_ids) // 20):
+            await db.execute(
+                Receipt.__table__.update().where(Receipt.id == receipt_id).values(duplicate_of_id=receipt_ids[0])
+            )
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        report = await auto_review_receipts(db, rules, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        awards = (
+            await db.execute(
+                select(func.count(PointTransaction.id)).where(
+                    PointTransaction.type == "receipt",
+                    PointTransaction.reference_id.in_(receipt_ids),
+                )
+            )
+        ).scalar_one()
+    await engine.dispose()
+
+    ok = awards == report["approved"]
+    print(
+        f"{report['scanned']}件 / {elapsed:.2f}s = {report['scanned'] / elapsed:.0f}件/s"
+        f"（承認 {report['approved']} / 却下 {report['rejected']} / 審査待ち {report['held']} {report['held_reasons']}）"
+    )
+    print(f"ポイント付与 {awards}件 {'OK' if ok else 'NG'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif "DATABASE_URL" not in os.environ:
+        tmp = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/bench.db"
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,110 @@
+"""レシート画像の類似検索（dHash の索引）のベンチマーク
+
+ランダムな dHash を持つレシートを登録し、登録済みのハッシュから数ビット変えた値で
+find_similar_receipts を実行したときの 1 回あたりの所要時間を測る。
+DATABASE_URL の DB にデータを登録するため、開発用の DB で実行すること（終了時に削除）。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/bench_phash_lookup.py
+    python scripts/bench_phash_lookup.py --receipts 1000000 --queries 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+BENCH_EMAIL = "phash-bench@example.com"
+INSERT_BATCH = 10000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=200000, help="登録するレシート数")
+    parser.add_argument("--queries", type=int, default=1000, help="検索回数")
+    parser.add_argument("--max-flips", type=int, default=6, help="検索に使うハッシュで変えるビット数の上限")
+    parser.add_argument("--keep", action="store_true", help="終了時に登録したデータを削除しない")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    from sqlalchemy import delete, insert, select, text
+
+    from app.database import AsyncSessionLocal, engine, init_db, is_postgresql
+    from app.models.receipt import Receipt, ReceiptImageHashBand
+    from app.models.user import User
+    from app.services.receipt_similarity_service import (
+        find_similar_receipts,
+        hash_bands,
+        to_signed64,
+    )
+
+    await init_db()
+    rnd = random.Random(42)
+    hashes = [rnd.getrandbits(64) for _ in range(args.receipts)]
+
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(select(User.id).where(User.email == BENCH_EMAIL))).scalar_one_or_none()
+        if user_id is None:
+            user = User(email=BENCH_EMAIL, password_hash="-", is_active=False)
+            db.add(user)
+            await db.flush()
+            user_id = user.id
+        started = time.perf_counter()
+        for offset in range(0, len(hashes), INSERT_BATCH):
+            batch = hashes[offset:offset + INSERT_BATCH]
+            result = await db.execute(
+                insert(Receipt).returning(Receipt.id),
+                [
+                    {"user_id": user_id, "image_url": "/uploads/bench", "amount": 0, "image_phash": to_signed64(h)}
+                    for h in batch
+                ],
+            )
+            ids = list(result.scalars().all())
+            await db.execute(
+                insert(ReceiptImageHashBand),
+                [
+                    {"receipt_id": rid, "band": band, "value": value, "phash": to_signed64(h)}
+                    for rid, h in zip(ids, batch)
+                    for band, value in enumerate(hash_bands(h))
+                ],
+            )
+        await db.commit()
+        if is_postgresql():
+            # インデックスのみのスキャンには visibility map が必要
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text("VACUUM ANALYZE receipts"))
+                await conn.execute(text("VACUUM ANALYZE receipt_image_hash_bands"))
+        print(f"{len(hashes)}件を登録しました（{time.perf_counter() - started:.1f}秒）")
+
+        timings = []
+        found = 0
+        for _ in range(args.queries):
+            query = rnd.choice(hashes)
+            for bit in rnd.sample(range(64), rnd.randint(0, args.max_flips)):
+                query ^= 1 << bit
+            started = time.perf_counter()
+            matches = await find_similar_receipts(db, query, max_distance=args.max_flips, limit=5)
+            timings.append((time.perf_counter() - started) * 1000)
+            found += bool(matches)
+
+        timings.sort()
+        print(f"検索 {args.queries}回: 中央値 {statistics.median(timings):.2f}ms"
+              f" / p99 {timings[int(len(timings) * 0.99) - 1]:.2f}ms（一致あり {found}回）")
+
+        if not args.keep:
+            bench_ids = select(Receipt.id).where(Receipt.user_id == user_id).scalar_subquery()
+            await db.execute(delete(ReceiptImageHashBand).where(ReceiptImageHashBand.receipt_id.in_(bench_ids)))
+            await db.execute(delete(Receipt).where(Receipt.user_id == user_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+    return 0 if found == args.queries else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
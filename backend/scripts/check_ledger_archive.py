@@ -0,0 +1,110 @@
+"""ポイント取引の月次パーティション化・アーカイブの確認（PostgreSQL）
+
+過去数か月分のポイント取引を登録し、partition-point-transactions → archive-point-transactions →
+reconcile-ledger と同じ処理を実行して、アーカイブ後も残高・集計が変わらないことと、
+台帳の整合性チェックが通ることを確認する。point_transactions を作り替えるため、専用のデータベースで実行すること。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/check_ledger_archive.py --database-url postgresql+asyncpg://... --months 6 --archive-months 3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="接続先（PostgreSQL）")
+    parser.add_argument("--users", type=int, default=200, help="取引を登録するユーザー数")
+    parser.add_argument("--transactions", type=int, default=20000, help="登録する取引数")
+    parser.add_argument("--months", type=int, default=6, help="何か月前から取引を登録するか")
+    parser.add_argument("--archive-months", type=int, default=3, help="何か月より前をアーカイブするか")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    from sqlalchemy import func, insert, select
+
+    from app.database import AsyncSessionLocal, engine, init_db, is_postgresql
+    from app.models.point_balance import UserPointBalance
+    from app.models.point_transaction import PointTransaction, PointTransactionRollup
+    from app.models.user import User
+    from app.services.ledger_archive_service import archive_partitions, partition_point_transactions
+    from app.services.point_service import rebuild_balances
+    from app.services.reconciliation_service import reconcile_ledger
+
+    if not is_postgresql():
+        print("PostgreSQL の接続先を指定してください")
+        return 1
+    await init_db()
+    rng = random.Random(0)
+    suffix = int(time.time() * 1000)
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            insert(User).returning(User.id),
+            [
+                {"email": f"ledger-archive-{suffix}-{i}@example.com", "password_hash": "-", "name": "check"}
+                for i in range(args.users)
+            ],
+        )
+        user_ids = list(result.scalars().all())
+        # 付与を先に、消費を後に登録して残高がマイナスにならないようにする
+        span = args.months * 31 * 86400
+        rows = []
+        for i in range(args.transactions):
+            created_at = now - timedelta(seconds=span * (1 - i / args.transactions))
+            rows.append({
+                "user_id": rng.choice(user_ids),
+                "amount": rng.randint(1, 500) if i % 4 else -rng.randint(1, 5),
+                "type": "bonus",
+                "created_at": created_at,
+            })
+        await db.execute(insert(PointTransaction), rows)
+        await db.commit()
+        await rebuild_balances(db)
+        await db.commit()
+
+    async def balances() -> dict:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(UserPointBalance.user_id, UserPointBalance.balance))
+            return dict(result.all())
+
+    before = await balances()
+    async with AsyncSessionLocal() as db:
+        await partition_point_transactions(db)
+    with tempfile.TemporaryDirectory() as archive_dir:
+        async with AsyncSessionLocal() as db:
+            archived = await archive_partitions(db, older_than_months=args.archive_months, archive_dir=archive_dir)
+        for name, count, path in archived:
+            print(f"{name}: {count}件 -> {Path(path).name}（{os.path.getsize(path)} bytes）")
+    async with AsyncSessionLocal() as db:
+        live = (await db.execute(select(func.count(PointTransaction.id)))).scalar_one()
+        rolled = (await db.execute(select(func.coalesce(func.sum(PointTransactionRollup.transaction_count), 0)))).scalar_one()
+        report = await reconcile_ledger(db)
+    after = await balances()
+    await engine.dispose()
+
+    ok = bool(archived) and live + rolled == args.transactions and before == after and report["ok"]
+    print(f"アーカイブ {len(archived)}パーティション / 集計済み {rolled}件 / 残り {live}件")
+    print(f"残高の変化 {sum(before.get(u) != after.get(u) for u in set(before) | set(after))}人")
+    print(
+        f"reconcile-ledger: 残高マイナス {report['negative_balance_count']} / "
+        f"残高の不一致 {report['balance_mismatch_count']} / チェックポイントの不一致 {report['checkpoint_mismatch_count']}"
+    )
+    print("OK" if ok else "NG")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.exit(asyncio.run(main(args)))
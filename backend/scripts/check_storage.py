@@ -0,0 +1,69 @@
+"""画像の保存先（STORAGE_BACKEND）の動作確認
+
+設定した保存先にテスト用のファイルを保存し、存在確認・読み出し・配信 URL の取得・削除を行う。
+s3 では配信 URL（署名付き URL 等）から実際に取得できることも確認する。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/check_storage.py
+    STORAGE_BACKEND=s3 S3_BUCKET=poi-app-receipts S3_ENDPOINT_URL=http://localhost:9000 python scripts/check_storage.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import urllib.request
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    from app.config import get_settings
+    from app.core.storage import get_storage, public_url, storage_ref, work_path
+
+    settings = get_settings()
+    storage = get_storage()
+    key = f"storage-check/{uuid.uuid4().hex}.txt"
+    content = b"storage check\n"
+    print(f"保存先: {settings.STORAGE_BACKEND}（{type(storage).__name__}）")
+
+    path = work_path(".txt")
+    with open(path, "wb") as f:
+        f.write(content)
+    try:
+        await storage.put_file(path, key)
+        if not await storage.exists(key):
+            print("保存したファイルが見つかりません")
+            return 1
+        async with storage.open_local(key) as local:
+            with open(local, "rb") as f:
+                if f.read() != content:
+                    print("読み出した内容が一致しません")
+                    return 1
+        url = public_url(storage_ref(key))
+        print(f"配信 URL: {url}")
+        if url.startswith("http"):
+            with urllib.request.urlopen(url, timeout=10) as resp:
+                if resp.read() != content:
+                    print("配信 URL から取得した内容が一致しません")
+                    return 1
+    finally:
+        await storage.delete(key)
+        if os.path.exists(path):
+            os.unlink(path)
+
+    if await storage.exists(key):
+        print("削除したファイルが残っています")
+        return 1
+    print("OK: 保存・存在確認・読み出し・配信 URL・削除")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
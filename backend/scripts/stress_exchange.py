@@ -0,0 +1,107 @@
+"""ポイント交換の同時実行ストレステスト
+
+同一ユーザーへの並行交換申請で残高がマイナスにならないこと、
+集計済み残高と台帳が一致することを確認する。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/stress_exchange.py                    # 一時 SQLite で実行
+    python scripts/stress_exchange.py --database-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="接続先（既定: 一時 SQLite）")
+    parser.add_argument("--users", type=int, default=5, help="ユーザー数")
+    parser.add_argument("--requests", type=int, default=20, help="ユーザーごとの同時申請数")
+    parser.add_argument("--balance", type=int, default=1000, help="初期残高")
+    parser.add_argument("--amount", type=int, default=300, help="1回の交換ポイント")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    from sqlalchemy import select, func
+
+    from app.database import AsyncSessionLocal, engine, init_db
+    from app.models.user import User
+    from app.models.point_transaction import PointTransaction
+    from app.models.point_balance import UserPointBalance
+    from app.services.admin_service import grant_points
+    from app.services.point_service import create_exchange
+
+    await init_db()
+
+    suffix = int(time.time() * 1000)
+    user_ids = []
+    async with AsyncSessionLocal() as db:
+        for i in range(args.users):
+            user = User(email=f"stress-{suffix}-{i}@example.com", password_hash="-", name="stress")
+            db.add(user)
+            await db.flush()
+            db.add(UserPointBalance(user_id=user.id, balance=0))
+            await db.flush()
+            await grant_points(db, user.id, args.balance, "ストレステスト")
+            user_ids.append(user.id)
+        await db.commit()
+
+    async def request_exchange(user_id: int) -> bool:
+        async with AsyncSessionLocal() as db:
+            exchange, error = await create_exchange(db, user_id, args.amount, "paypay")
+            if error:
+                await db.rollback()
+                return False
+            await db.commit()
+            return True
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *[request_exchange(uid) for uid in user_ids for _ in range(args.requests)],
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    succeeded = sum(1 for r in results if r is True)
+    expected_per_user = min(args.requests, args.balance // args.amount)
+
+    failed = False
+    async with AsyncSessionLocal() as db:
+        for uid in user_ids:
+            ledger = (
+                await db.execute(
+                    select(func.coalesce(func.sum(PointTransaction.amount), 0)).where(
+                        PointTransaction.user_id == uid
+                    )
+                )
+            ).scalar_one()
+            materialized = (
+                await db.execute(select(UserPointBalance.balance).where(UserPointBalance.user_id == uid))
+            ).scalar_one()
+            ok = ledger >= 0 and ledger == materialized and ledger == args.balance - expected_per_user * args.amount
+            failed |= not ok
+            print(f"user={uid} ledger={ledger} materialized={materialized} {'OK' if ok else 'NG'}")
+    await engine.dispose()
+
+    print(f"申請 {len(results)} 件 / 成功 {succeeded} 件 / 例外 {len(errors)} 件 / {elapsed:.2f}s")
+    for e in errors[:5]:
+        print(f"  {type(e).__name__}: {e}")
+    return 1 if failed or errors else 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif "DATABASE_URL" not in os.environ:
+        tmp = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/stress.db"
+    sys.exit(asyncio.run(main(args)))
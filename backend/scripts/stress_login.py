@@ -0,0 +1,84 @@
+"""ログイン集中時のイベントループ遅延の測定
+
+同時ログイン中に他のリクエスト（残高取得など）が待たされないこと、
+つまり bcrypt の処理中もイベントループが止まらないことを確認する。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/stress_login.py                    # 一時 SQLite で実行
+    python scripts/stress_login.py --logins 200 --max-lag-ms 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="接続先（既定: 一時 SQLite）")
+    parser.add_argument("--logins", type=int, default=50, help="同時ログイン数")
+    parser.add_argument("--max-lag-ms", type=float, default=50, help="許容するイベントループ遅延（ミリ秒）")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    from app.database import AsyncSessionLocal, engine, init_db
+    from app.schemas.auth import UserRegister
+    from app.services.auth_service import register_user, authenticate_user
+    from app.core.security import password_hash_stats
+
+    await init_db()
+
+    email = f"stress-login-{int(time.time() * 1000)}@example.com"
+    async with AsyncSessionLocal() as db:
+        await register_user(db, UserRegister(email=email, password="password123"))
+        await db.commit()
+
+    lags = []
+    max_queued = 0
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        # 10ms ごとに起床し、予定より遅れた時間を記録する
+        nonlocal max_queued
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append((time.perf_counter() - started - 0.01) * 1000)
+            max_queued = max(max_queued, password_hash_stats()["queued"])
+
+    async def login() -> bool:
+        async with AsyncSessionLocal() as db:
+            return await authenticate_user(db, email, "password123") is not None
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    results = await asyncio.gather(*[login() for _ in range(args.logins)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    await engine.dispose()
+
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    worst = lags[-1] if lags else 0.0
+    print(f"ログイン {len(results)} 件 / 成功 {sum(results)} 件 / {elapsed:.2f}s")
+    print(f"イベントループ遅延 p99={p99:.1f}ms max={worst:.1f}ms / 最大待ち行列 {max_queued}")
+    ok = all(results) and worst <= args.max_lag_ms
+    print("OK" if ok else "NG")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif "DATABASE_URL" not in os.environ:
+        tmp = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/stress.db"
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,123 @@
+"""レシート審査の担当（claim_pending_receipts）の同時実行ストレステスト
+
+審査待ちのレシートを登録し、複数の担当者が並行して「取得 → 審査」を繰り返したときに
+同じレシートを二重に取得しないこと（ポイント付与が1件1回）と、担当者数に対する処理件数を確認する。
+1件ごとの審査には --review-ms の時間がかかるものとする（画像の確認などの作業時間）。
+
+使い方（backend ディレクトリで実行）:
+    python scripts/stress_review_claims.py                    # 一時 SQLite で実行
+    python scripts/stress_review_claims.py --database-url postgresql+asyncpg://... --reviewers 1,2,4,8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="接続先（既定: 一時 SQLite）")
+    parser.add_argument("--receipts", type=int, default=320, help="担当者数ごとに登録する審査待ちレシート数")
+    parser.add_argument("--reviewers", default="1,2,4,8", help="同時に審査する担当者数（カンマ区切りで複数回実行）")
+    parser.add_argument("--batch", type=int, default=10, help="1回に取得するレシート数")
+    parser.add_argument("--review-ms", type=float, default=50.0, help="1件あたりの審査時間（ミリ秒）")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    from sqlalchemy import insert, select, func
+
+    from app.database import AsyncSessionLocal, engine, init_db
+    from app.models.user import User
+    from app.models.receipt import Receipt, ReceiptStatus
+    from app.models.point_transaction import PointTransaction
+    from app.services.receipt_service import claim_pending_receipts, update_receipt_status
+
+    await init_db()
+
+    counts = [int(x) for x in args.reviewers.split(",") if x.strip()]
+    suffix = int(time.time() * 1000)
+    async with AsyncSessionLocal() as db:
+        users = [
+            User(email=f"review-stress-{suffix}-{i}@example.com", password_hash="-", name="stress", is_admin=i > 0)
+            for i in range(max(counts) + 1)
+        ]
+        db.add_all(users)
+        await db.flush()
+        owner_id = users[0].id
+        reviewer_ids = [u.id for u in users[1:]]
+        await db.commit()
+
+    async def review_loop(reviewer_id: int, reviewed: list) -> None:
+        while True:
+            async with AsyncSessionLocal() as db:
+                receipts = await claim_pending_receipts(db, reviewer_id, args.batch)
+                await db.commit()
+            if not receipts:
+                return
+            for receipt in receipts:
+                await asyncio.sleep(args.review_ms / 1000)
+                async with AsyncSessionLocal() as db:
+                    await update_receipt_status(
+                        db, receipt.id, ReceiptStatus.APPROVED.value, points_awarded=1, reviewer_id=reviewer_id
+                    )
+                    await db.commit()
+                reviewed.append(receipt.id)
+
+    failed = False
+    base_rate = None
+    for count in counts:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                insert(Receipt).returning(Receipt.id),
+                [
+                    {"user_id": owner_id, "image_url": "/uploads/stress", "amount": 100,
+                     "status": ReceiptStatus.PENDING.value}
+                    for _ in range(args.receipts)
+                ],
+            )
+            receipt_ids = set(result.scalars().all())
+            await db.commit()
+
+        reviewed_by = [[] for _ in range(count)]
+        started = time.perf_counter()
+        await asyncio.gather(*[review_loop(reviewer_ids[i], reviewed_by[i]) for i in range(count)])
+        elapsed = time.perf_counter() - started
+
+        reviewed = [rid for ids in reviewed_by for rid in ids]
+        async with AsyncSessionLocal() as db:
+            awards = (
+                await db.execute(
+                    select(func.count(PointTransaction.id)).where(
+                        PointTransaction.type == "receipt",
+                        PointTransaction.reference_id.in_(receipt_ids),
+                    )
+                )
+            ).scalar_one()
+        ok = len(reviewed) == len(set(reviewed)) == len(receipt_ids) and set(reviewed) == receipt_ids
+        ok &= awards == len(receipt_ids)
+        failed |= not ok
+        rate = len(reviewed) / elapsed
+        base_rate = base_rate or rate / count
+        print(
+            f"担当者 {count}人: {len(reviewed)}件 / {elapsed:.2f}s = {rate:.0f}件/s"
+            f"（1人あたりの {rate / base_rate / count:.0%}）"
+            f" 重複取得 {len(reviewed) - len(set(reviewed))}件 / 付与 {awards}件 {'OK' if ok else 'NG'}"
+        )
+    await engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif "DATABASE_URL" not in os.environ:
+        tmp = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/stress.db"
+    sys.exit(asyncio.run(main(args)))
@@ -25,6 +25,8 @@ export default function AdminCampaignsPage() {
     campaign_type: "general",
     description: "",
     points: "",
+    keywords: "",
+    required_quantity: "",
     is_active: true,
   });
 
@@ -48,9 +50,11 @@ export default function AdminCampaignsPage() {
         campaign_type: form.campaign_type,
         description: form.description || undefined,
         points: form.points ? parseInt(form.points, 10) : undefined,
+        keywords: form.keywords || undefined,
+        required_quantity: form.required_quantity ? parseInt(form.required_quantity, 10) : undefined,
         is_active: form.is_active,
       });
-      setForm({ title: "", campaign_type: "general", description: "", points: "", is_active: true });
+      setForm({ title: "", campaign_type: "general", description: "", points: "", keywords: "", required_quantity: "", is_active: true });
       setCreating(false);
       load();
     } catch (e) {
@@ -66,6 +70,8 @@ export default function AdminCampaignsPage() {
         campaign_type: form.campaign_type,
         description: form.description || undefined,
         points: form.points ? parseInt(form.points, 10) : undefined,
+        keywords: form.keywords || undefined,
+        required_quantity: form.required_quantity ? parseInt(form.required_quantity, 10) : undefined,
         is_active: form.is_active,
       });
       setEditing(null);
@@ -105,6 +111,8 @@ export default function AdminCampaignsPage() {
                     campaign_type: c.campaign_type,
                     description: c.description || "",
                     points: c.points?.toString() || "",
+                    keywords: c.keywords || "",
+                    required_quantity: c.required_quantity?.toString() || "",
                     is_active: c.is_active,
                   });
                 }}
@@ -160,6 +168,30 @@ export default function AdminCampaignsPage() {
                   className="w-full px-4 py-2 border-2 border-slate-200 rounded-lg focus:border-emerald-500 outline-none"
                 />
               </div>
+              {(form.campaign_type === "buyback" || form.campaign_type === "quest") && (
+                <div>
+                  <label className="block text-sm font-semibold text-slate-700 mb-1">対象キーワード（カンマ区切り）</label>
+                  <input
+                    value={form.keywords}
+                    onChange={(e) => setForm({ ...form, keywords: e.target.value })}
+                    placeholder="未入力ならタイトルで照合"
+                    className="w-full px-4 py-2 border-2 border-slate-200 rounded-lg focus:border-emerald-500 outline-none"
+                  />
+                </div>
+              )}
+              {form.campaign_type === "quest" && (
+                <div>
+                  <label className="block text-sm font-semibold text-slate-700 mb-1">達成に必要な購入数</label>
+                  <input
+                    type="number"
+                    min={1}
+                    value={form.required_quantity}
+                    onChange={(e) => setForm({ ...form, required_quantity: e.target.value })}
+                    placeholder="1"
+                    className="w-full px-4 py-2 border-2 border-slate-200 rounded-lg focus:border-emerald-500 outline-none"
+                  />
+                </div>
+              )}
               <div className="flex items-center gap-2">
                 <input
                   type="checkbox"
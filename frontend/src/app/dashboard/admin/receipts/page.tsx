@@ -6,31 +6,88 @@ import Link from "next/link";
 import {
   getAdminReceipts,
   getAdminReceipt,
+  getSimilarReceipts,
   reviewReceipt,
+  bulkReviewReceipts,
+  claimReceipts,
+  releaseReceiptClaims,
   type Receipt,
+  type SimilarReceipt,
 } from "@/lib/api";
 
+const UPLOADS_BASE = (process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1").replace("/api/v1", "");
+// S3 等の保存先では API が配信用の URL（http...）を返す
+const imageSrc = (url: string) => (url.startsWith("http") ? url : `${UPLOADS_BASE}${url}`);
+
 export default function AdminReceiptsPage() {
   const searchParams = useSearchParams();
   const statusFilter = searchParams.get("status") || "";
   const [receipts, setReceipts] = useState<Receipt[]>([]);
   const [detail, setDetail] = useState<Receipt | null>(null);
+  const [similar, setSimilar] = useState<SimilarReceipt[]>([]);
   const [loading, setLoading] = useState(true);
   const [points, setPoints] = useState("");
   const [reason, setReason] = useState("");
+  const [selected, setSelected] = useState<Set<number>>(new Set());
+  const [bulkPoints, setBulkPoints] = useState("");
+  const [claimed, setClaimed] = useState(false);
 
   const load = () => {
     setLoading(true);
-    getAdminReceipts(statusFilter || undefined)
+    // 担当中は読み込みのたびに取得し直す（担当分の期限を延長し、審査した分は次のレシートで補充）
+    (claimed ? claimReceipts() : getAdminReceipts(statusFilter || undefined))
       .then(setReceipts)
       .catch(console.error)
       .finally(() => setLoading(false));
   };
 
-  useEffect(() => load(), [statusFilter]);
+  useEffect(() => load(), [statusFilter, claimed]);
+
+  const handleRelease = async () => {
+    try {
+      await releaseReceiptClaims();
+      setClaimed(false);
+    } catch (e) {
+      alert(e instanceof Error ? e.message : "処理に失敗しました");
+    }
+  };
+  useEffect(() => setSelected(new Set()), [receipts]);
+
+  const pendingIds = receipts.filter((r) => r.status === "pending").map((r) => r.id);
+
+  const toggleSelected = (id: number) => {
+    setSelected((prev) => {
+      const next = new Set(prev);
+      if (next.has(id)) next.delete(id);
+      else next.add(id);
+      return next;
+    });
+  };
+
+  const handleBulkReview = async (status: "approved" | "rejected") => {
+    const pts = parseInt(bulkPoints, 10) || 0;
+    try {
+      const result = await bulkReviewReceipts(
+        Array.from(selected).map((id) => ({
+          receipt_id: id,
+          status,
+          points_awarded: status === "approved" && pts > 0 ? pts : undefined,
+        }))
+      );
+      if (result.error_count > 0) {
+        alert(result.errors.map((e) => `#${e.receipt_id}: ${e.detail}`).join("\n"));
+      }
+      setBulkPoints("");
+      load();
+    } catch (e) {
+      alert(e instanceof Error ? e.message : "処理に失敗しました");
+    }
+  };
 
   const openDetail = (id: number) => {
+    setSimilar([]);
     getAdminReceipt(id).then(setDetail);
+    getSimilarReceipts(id).then(setSimilar).catch(console.error);
   };
 
   const handleApprove = async () => {
@@ -121,7 +178,46 @@ export default function AdminReceiptsPage() {
         >
           却下
         </Link>
+        {claimed ? (
+          <button
+            onClick={handleRelease}
+            className="ml-auto px-4 py-2 rounded-lg font-medium bg-white text-slate-600 border-2 border-slate-200 hover:bg-slate-50"
+          >
+            担当を解除
+          </button>
+        ) : (
+          <button
+            onClick={() => setClaimed(true)}
+            className="ml-auto px-4 py-2 rounded-lg font-medium bg-slate-800 text-white shadow-md hover:bg-slate-700"
+          >
+            次の10件を担当
+          </button>
+        )}
       </div>
+      {selected.size > 0 && (
+        <div className="mb-4 flex gap-3 items-center flex-wrap bg-white rounded-xl border border-slate-200 px-4 py-3 shadow">
+          <span className="font-medium text-slate-700">{selected.size}件を選択中</span>
+          <input
+            type="number"
+            placeholder="付与ポイント"
+            value={bulkPoints}
+            onChange={(e) => setBulkPoints(e.target.value)}
+            className="w-32 px-3 py-1.5 border-2 border-slate-200 rounded-lg"
+          />
+          <button
+            onClick={() => handleBulkReview("approved")}
+            className="px-3 py-1.5 bg-emerald-500 text-white text-sm font-medium rounded-lg hover:bg-emerald-600 transition-colors"
+          >
+            一括承認
+          </button>
+          <button
+            onClick={() => handleBulkReview("rejected")}
+            className="px-3 py-1.5 bg-rose-500 text-white text-sm font-medium rounded-lg hover:bg-rose-600 transition-colors"
+          >
+            一括却下
+          </button>
+        </div>
+      )}
       {loading ? (
         <p className="text-slate-600 font-medium">読み込み中...</p>
       ) : (
@@ -129,7 +225,16 @@ export default function AdminReceiptsPage() {
           <table className="w-full">
             <thead>
               <tr className="bg-slate-800 text-white">
+                <th className="px-3 py-4">
+                  <input
+                    type="checkbox"
+                    aria-label="審査待ちをすべて選択"
+                    checked={pendingIds.length > 0 && pendingIds.every((id) => selected.has(id))}
+                    onChange={(e) => setSelected(new Set(e.target.checked ? pendingIds : []))}
+                  />
+                </th>
                 <th className="px-5 py-4 text-left font-semibold">ID</th>
+                <th className="px-5 py-4 text-left font-semibold">画像</th>
                 <th className="px-5 py-4 text-left font-semibold">ユーザーID</th>
                 <th className="px-5 py-4 text-left font-semibold">店舗</th>
                 <th className="px-5 py-4 text-left font-semibold">金額</th>
@@ -145,7 +250,24 @@ export default function AdminReceiptsPage() {
                     i % 2 === 1 ? "bg-slate-50/50" : ""
                   }`}
                 >
+                  <td className="px-3 py-4 text-center">
+                    {r.status === "pending" && (
+                      <input
+                        type="checkbox"
+                        aria-label={`#${r.id} を選択`}
+                        checked={selected.has(r.id)}
+                        onChange={() => toggleSelected(r.id)}
+                      />
+                    )}
+                  </td>
                   <td className="px-5 py-4 font-mono text-slate-700">{r.id}</td>
+                  <td className="px-5 py-2">
+                    {r.thumbnail_url ? (
+                      <img src={imageSrc(r.thumbnail_url)} alt="" loading="lazy" className="h-12 w-12 object-cover rounded" />
+                    ) : (
+                      <span className="text-slate-400">-</span>
+                    )}
+                  </td>
                   <td className="px-5 py-4 text-slate-700">{r.user_id}</td>
                   <td className="px-5 py-4 font-medium text-slate-800">{r.store_name || "-"}</td>
                   <td className="px-5 py-4 font-semibold text-emerald-700">
@@ -153,6 +275,16 @@ export default function AdminReceiptsPage() {
                   </td>
                   <td className="px-5 py-4">
                     <StatusBadge status={r.status} />
+                    {r.duplicate_of_id && (
+                      <span className="ml-2 px-2 py-0.5 text-xs font-semibold rounded bg-amber-100 text-amber-800">
+                        重複 #{r.duplicate_of_id}
+                      </span>
+                    )}
+                    {r.near_duplicate_of_id && (
+                      <span className="ml-2 px-2 py-0.5 text-xs font-semibold rounded bg-orange-100 text-orange-800">
+                        類似 #{r.near_duplicate_of_id}
+                      </span>
+                    )}
                   </td>
                   <td className="px-5 py-4">
                     <button
@@ -178,11 +310,32 @@ export default function AdminReceiptsPage() {
               <p className="text-slate-700"><span className="font-semibold text-slate-500">状態:</span> <StatusBadge status={detail.status} /></p>
             </div>
             {detail.image_url && (
-              <img
-                src={`${(process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1").replace("/api/v1", "")}${detail.image_url}`}
-                alt="レシート"
-                className="mt-2 max-h-48 object-contain"
-              />
+              <a href={imageSrc(detail.image_url)} target="_blank" rel="noopener noreferrer">
+                <img
+                  src={imageSrc(detail.thumbnail_url || detail.image_url)}
+                  alt="レシート"
+                  className="mt-2 max-h-48 object-contain"
+                />
+              </a>
+            )}
+            {similar.length > 0 && (
+              <div className="mt-4">
+                <p className="text-sm font-semibold text-orange-700 mb-2">見た目が近いレシート</p>
+                <div className="flex gap-3 flex-wrap">
+                  {similar.map(({ receipt: s, distance }) => (
+                    <button key={s.id} onClick={() => openDetail(s.id)} className="text-left">
+                      {s.thumbnail_url ? (
+                        <img src={imageSrc(s.thumbnail_url)} alt="" loading="lazy" className="h-16 w-16 object-cover rounded" />
+                      ) : (
+                        <span className="block h-16 w-16 rounded bg-slate-100" />
+                      )}
+                      <span className="block text-xs text-slate-600">
+                        #{s.id}（距離 {distance}）
+                      </span>
+                    </button>
+                  ))}
+                </div>
+              </div>
             )}
             {detail.status === "pending" && (
               <div className="mt-4 p-4 bg-slate-50 rounded-xl space-y-3 border border-slate-200">
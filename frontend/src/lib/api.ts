@@ -21,6 +21,9 @@ export interface Receipt {
   id: number;
   user_id: number;
   image_url: string;
+  thumbnail_url: string | null;
+  duplicate_of_id: number | null;
+  near_duplicate_of_id: number | null;
   store_name: string;
   amount: number;
   items: string | null;
@@ -28,6 +31,9 @@ export interface Receipt {
   status: string;
   points_awarded: number | null;
   rejection_reason: string | null;
+  review_claimed_by: number | null;
+  review_claimed_until: string | null;
+  processed_at: string | null;
   created_at: string;
 }
 
@@ -63,6 +69,8 @@ export interface Campaign {
   campaign_type: string;
   description: string | null;
   points: number | null;
+  keywords: string | null;
+  required_quantity: number | null;
   start_at: string | null;
   end_at: string | null;
   is_active: boolean;
@@ -280,6 +288,15 @@ export async function getAdminReceipt(id: number): Promise<Receipt> {
   return api<Receipt>(`/admin/receipts/${id}`);
 }
 
+export interface SimilarReceipt {
+  receipt: Receipt;
+  distance: number;
+}
+
+export async function getSimilarReceipts(id: number): Promise<SimilarReceipt[]> {
+  return api<SimilarReceipt[]>(`/admin/receipts/${id}/similar`);
+}
+
 export async function reviewReceipt(
   id: number,
   status: string,
@@ -296,6 +313,40 @@ export async function reviewReceipt(
   });
 }
 
+export async function claimReceipts(limit = 10): Promise<Receipt[]> {
+  return api<Receipt[]>(`/admin/receipts/claim?limit=${limit}`, { method: "POST" });
+}
+
+export async function releaseReceiptClaims(receiptIds?: number[]): Promise<{ released: number }> {
+  return api<{ released: number }>("/admin/receipts/claim/release", {
+    method: "POST",
+    body: JSON.stringify({ receipt_ids: receiptIds }),
+  });
+}
+
+export interface BulkReceiptReviewItem {
+  receipt_id: number;
+  status: string;
+  points_awarded?: number;
+  rejection_reason?: string;
+}
+
+export interface BulkReceiptReviewResult {
+  total_rows: number;
+  reviewed_count: number;
+  awarded_count: number;
+  awarded_points: number;
+  error_count: number;
+  errors: { row: number; receipt_id: number; detail: string }[];
+}
+
+export async function bulkReviewReceipts(items: BulkReceiptReviewItem[]): Promise<BulkReceiptReviewResult> {
+  return api<BulkReceiptReviewResult>("/admin/receipts/review/bulk", {
+    method: "POST",
+    body: JSON.stringify({ items }),
+  });
+}
+
 export async function getAdminCampaigns(): Promise<Campaign[]> {
   return api<Campaign[]>("/admin/campaigns");
 }
@@ -305,6 +356,8 @@ export async function createCampaign(data: {
   campaign_type?: string;
   description?: string;
   points?: number;
+  keywords?: string;
+  required_quantity?: number;
   is_active?: boolean;
 }): Promise<Campaign> {
   return api<Campaign>("/admin/campaigns", {
@@ -63,6 +63,27 @@ class FitnessService {
     }
   }
 
+  /// 複数日の歩数をまとめて登録（stepsByDate: 'YYYY-MM-DD' → 歩数。最大90日分）
+  static Future<void> registerStepsBulk(Map<String, int> stepsByDate) async {
+    final token = await _getToken();
+    if (token == null) throw Exception('ログインが必要です');
+
+    final res = await http.post(
+      Uri.parse('${Config.apiBaseUrl}/fitness/steps/bulk'),
+      headers: {
+        'Authorization': 'Bearer $token',
+        'Content-Type': 'application/json',
+      },
+      body: jsonEncode({
+        'items': stepsByDate.entries.map((e) => {'date': e.key, 'steps': e.value}).toList(),
+      }),
+    );
+    if (res.statusCode != 200) {
+      final err = jsonDecode(res.body);
+      throw Exception(err['detail'] ?? '歩数の登録に失敗しました');
+    }
+  }
+
   static Future<FitnessPointsModel> getPoints() async {
     final token = await _getToken();
     if (token == null) throw Exception('ログインが必要です');